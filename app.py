@@ -1,6 +1,11 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response, stream_with_context
 from model.db_interface import DBInterface
+from model.snapshot import SnapshotReader, SNAPSHOT_FILE
+from status_stream import StatusWatcher, event_stream
+import metrics
+import math
 import os
+import threading
 import time
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,22 +15,159 @@ IMG_PATH = os.path.join(BASE_DIR, 'static', 'images')
 import logging
 logging.basicConfig(filename='flask.log', level=logging.DEBUG)
 
-# List of tickers
+# List of tickers, cached briefly so every /predict doesn't rescan the model table
+TICKER_CACHE_TTL = 30   # seconds
 tickers = {}
+_tickers_lock = threading.Lock()
 
 app = Flask(__name__)
 
+# DBInterface opens a connection per call, so one instance can serve every request thread
+_dbi = None
+
+#--- Function: Get the shared DBInterface ---#
+def get_dbi():
+    global _dbi
+    if _dbi is None:
+        _dbi = DBInterface(os.path.join(BASE_DIR, 'static', 'models'))
+    return _dbi
+#--------------------------------------------#
+
+# Model rows and charts are read from the updater's published snapshot, never the working DB
+_snapshot = None
+
+#--- Function: Get the snapshot reader ---#
+def get_snapshot():
+    global _snapshot
+    if _snapshot is None:
+        dbi = get_dbi()
+        _snapshot = SnapshotReader(dbi.snapshot_path(), fallback=dbi)
+    return _snapshot
+#-----------------------------------------#
+
+# One change-detection loop per process pushes status flips to every subscriber
+status_watcher = StatusWatcher(os.path.join(BASE_DIR, 'static', 'models', SNAPSHOT_FILE))
+metrics.REGISTRY.register(metrics.Gauge(
+    'futurestock_status_subscribers',
+    'Open Server-Sent Events subscriptions for model status.',
+    func=status_watcher.subscriber_count))
+
+# Add-ticker job queue, created on first use; the jobs run in the updater daemon (model/jobs.py)
+_training_queue = None
+_training_queue_lock = threading.Lock()
+
+#--- Function: Get the training queue ---#
+def get_training_queue():
+    global _training_queue
+    with _training_queue_lock:
+        if _training_queue is None:
+            from model.jobs import TrainingQueue
+            _training_queue = TrainingQueue(os.path.join(BASE_DIR, 'static', 'models'))
+    return _training_queue
+#----------------------------------------#
+
+#--- Function: Get the cached ticker list ---#
+def get_tickers(dbi):
+    now = time.monotonic()
+    with _tickers_lock:
+        cached = tickers.get('list')
+        if cached is not None and now - tickers['loaded_at'] < TICKER_CACHE_TTL:
+            metrics.record_cache('tickers', True)
+            return cached
+    metrics.record_cache('tickers', False)
+    with metrics.DB_QUERY_LATENCY.time(operation='get_tickers'):
+        fresh = dbi.get_tickers()
+    with _tickers_lock:
+        tickers['list'] = fresh
+        tickers['loaded_at'] = now
+    return fresh
+#--------------------------------------------#
+
+# Time every request for /metrics
+@app.before_request
+def start_timer():
+    g.start_time = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    start = g.pop('start_time', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start,
+            route=route, method=request.method, status=response.status_code)
+    return response
+
+# Prometheus scrape endpoint
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
 # Show /index.html
 @app.route('/')
 @app.route('/stocks')
 def home():
-    return render_template('index.html')
+    try:
+        ticker_options = get_tickers(get_snapshot())
+    except Exception as e:
+        print(f"Couldn't load tickers for the dropdown: {e}")
+        ticker_options = []
+    return render_template('index.html', tickers=ticker_options)
 
 # White paper download
 @app.route('/docs/<path:filename>')
 def download_file(filename):
     return send_from_directory('docs', filename)
 
+#--- Function: Build the front-end response for one model row ---#
+def build_prediction(row):
+    """Turn a model table row into the result text and chart URLs shown to users."""
+    ticker = row['ticker']
+    result = row['result']
+    status = row['status']
+
+    # Possible states are new, in_progress, completed
+    #   |   STATUS      |     FRONT END     |     BACK END      |
+    #   | new           |   No Image Lookup |  Nothing          |
+    #   | in_progress   |   Not affected    |  Updating         |
+    #   | completed     |   Refreshed       |  Update finished  |
+
+    prediction = {
+        'status': status,
+        'last_update': row['last_update'],
+        'mape': row['mape'],
+        'buy_acc': row['buy_acc'],
+        'balance': row['balance'],
+    }
+
+    if status == 'new':
+        prediction['result'] = 'The AI will be trained on this ticker during the next update<br>(within 24 hours).'
+        return prediction
+
+    # Create text recommendation if it's stil a number
+    if isinstance(result, float):
+        recommendation = f"The AI recommends to <b>{'BUY' if result > 0 else 'SELL'}</b> {ticker}.<br>"
+        recommendation += f"Predicted change: {result:.2f}%"
+    else:
+        recommendation = "Sorry, something went wrong and the recommendation came back empty."
+
+    if status == 'in_progress':
+        # If the model is in progress, we return the last recommendation
+        if result is None:
+            prediction['result'] = 'The AI is currently being trained on this ticker.<br>Please try again later.'
+            return prediction
+        recommendation = '<i>Model is currently being updated, but here is the last recommendation:</i><br><br>' + recommendation
+
+    elif status != 'completed':
+        raise ValueError(f"Unknown status: {status}")
+
+    # Snapshots point at version-stamped copies of the charts; otherwise bust the cache by version
+    version = row['version'] or 0
+    prediction['result'] = recommendation
+    prediction['img1_path'] = row.get('img1_path') or f"static/images/{ticker}pred.png?v={version}"
+    prediction['img2_path'] = row.get('img2_path') or f"static/images/{ticker}mirr.png?v={version}"
+    return prediction
+#----------------------------------------------------------------#
+
 # 'Predict' button clicked
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -39,115 +181,249 @@ def predict():
     ticker = data['stock_symbol']
     print(f"\nPredict button clicked for ticker: {ticker}")
 
+    label = 'unknown'   # Metric label: only tickers in the DB get their own series
     try:
-        # Load the ticker information from the database
-        dbi = DBInterface(os.path.join(BASE_DIR, 'static', 'models'))
-        if ticker not in dbi.get_tickers():
+        # Load the ticker information from the published snapshot
+        snapshot = get_snapshot()
+        not_found = {'error': f'Ticker {ticker} not found in database. Please add it first.'}
+        if ticker not in get_tickers(snapshot):
             # TODO 0.8 handle new ticker entry
-            return jsonify({'error': f'Ticker {ticker} not found in database. Please add it first.'}), 400
-        model, result, last_update, status = dbi.load_model(ticker)
-        print(f"Model loaded for {ticker}: result={result}, last_update={last_update}, status={status}")
-
-        # Possible states are new, in_progress, completed
-        #   |   STATUS      |     FRONT END     |     BACK END      |
-        #   | new           |   No Image Lookup |  Nothing          |
-        #   | in_progress   |   Not affected    |  Updating         |
-        #   | completed     |   Refreshed       |  Update finished  |
-
-        if status == 'new':
-            recommendation = 'The AI will be trained on this ticker during the next update<br>(within 24 hours).'
-            response = jsonify({
-                'result': recommendation,
-            })
-            response.headers['Cache-Control'] = 'no-store'
-            return response
-        
-        # Create text recommendation if it's stil a number
-        if isinstance(result, float):
-            recommendation = f"The AI recommends to <b>{'BUY' if result > 0 else 'SELL'}</b> {ticker}.<br>"
-            recommendation += f"Predicted change: {result:.2f}%"
-        else:
-            recommendation = "Sorry, something went wrong and the recommendation came back empty."
-
-        if status == 'in_progress':
-            print('Model is currently being updated')
-            # If the model is in progress, we return the last recommendation
-            if result is None:
-                recommendation = 'The AI is currently being trained on this ticker.<br>Please try again later.'
-                response = jsonify({
-                    'result': recommendation,
-                })
-                response.headers['Cache-Control'] = 'no-store'
-                return response
-            else:
-                recommendation = '<i>Model is currently being updated, but here is the last recommendation:</i><br><br>' + recommendation
-        
-        elif status == 'completed':
-            print(f'Model is up-to-date.')
-
-        else: raise ValueError(f"Unknown status: {status}")
-        
-        # Prepare image paths
-        img1_path = 'static/images/' + ticker + 'pred.png'
-        img1_path = img1_path.replace('\\', '/')
-        img2_path = 'static/images/' + ticker + 'mirr.png'
-        img2_path = img2_path.replace('\\', '/')
-
-        # Return the recommendation and image paths
-        response = jsonify({
-            'result': recommendation,
-            'img1_path': f"{img1_path}?t={int(time.time())}",
-            'img2_path': f"{img2_path}?t={int(time.time())}"
-        })
+            metrics.PREDICT_STATUS.inc(ticker=label, status='error')
+            return jsonify(not_found), 400
+        with metrics.DB_QUERY_LATENCY.time(operation='get_model_rows'):
+            row = snapshot.get_model_rows([ticker]).get(ticker)
+        if row is None:
+            # The ticker cache can briefly list a ticker the current snapshot no longer has
+            metrics.PREDICT_STATUS.inc(ticker=label, status='error')
+            return jsonify(not_found), 400
+        label = ticker
+        print(f"Model loaded for {ticker}: result={row['result']}, last_update={row['last_update']}, status={row['status']}")
+        metrics.PREDICT_STATUS.inc(ticker=label, status=row['status'])
+
+        prediction = build_prediction(row)
+        prediction['version'] = row['version']
+        response = jsonify({key: prediction[key] for key in ('result', 'status', 'version', 'img1_path', 'img2_path') if key in prediction})
         response.headers['Cache-Control'] = 'no-store'
         return response
     
     except ConnectionError as e:
+        metrics.PREDICT_STATUS.inc(ticker=label, status='error')
         return jsonify({'result': 'Connection error occurred, likely issue with yfinance.'})
     except Exception as e:
+        metrics.PREDICT_STATUS.inc(ticker=label, status='error')
         msg = 'An unknown error occurred: ' + str(e)
         return jsonify({'result': msg})
 
-# TODO 0.8 front end not set up for this yet but the method may be useful
-# @app.route('/add_ticker', methods=['POST'])
-# def add_ticker():
-#     stock_symbol = request.form.get('requested_stock_symbol', '').strip().upper()
-#     if not stock_symbol:
-#         return jsonify({'error': 'No stock symbol provided'}), 400
-
-#     print(f"Adding ticker: {stock_symbol}")
-#     try:
-#         # Check if the model already exists
-#         if stock_symbol in models:
-#             return jsonify({'message': f'Model for {stock_symbol} already exists.'}), 200
-        
-#         # Create a new model and add it to the models dictionary
-#         models[stock_symbol] = Model(stock_symbol, MODELS_PATH, IMG_PATH)
-#         return jsonify({'message': f'Model for {stock_symbol} added successfully. It will be trained in 24 hours.'}), 200
-    
-#     except Exception as e:
-#         return jsonify({'error': str(e)}), 500
+# Every ticker (or a chosen list) in one round trip
+@app.route('/predict_batch', methods=['GET', 'POST'])
+def predict_batch():
+    # Accept {"tickers": [...]} / {"tickers": "all"} as JSON or ?tickers=AAPL,META / ?tickers=all
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        wanted = data.get('tickers', 'all')
+    else:
+        wanted = request.args.get('tickers', 'all')
+        if wanted != 'all':
+            wanted = [t for t in wanted.split(',') if t]
+    if wanted != 'all' and not isinstance(wanted, list):
+        return jsonify({'error': 'tickers must be a list of symbols or "all"'}), 400
 
-#--- First Boot ---#
-if __name__ == '__main__':
-    print('Starting Flask app...')
+    snapshot = get_snapshot()
+    with metrics.DB_QUERY_LATENCY.time(operation='get_model_rows'):
+        rows = snapshot.get_model_rows(None if wanted == 'all' else wanted)
+
+    results = {}
+    for ticker, row in rows.items():
+        try:
+            results[ticker] = build_prediction(row)
+        except ValueError as e:
+            results[ticker] = {'status': row['status'], 'error': str(e)}
+        metrics.PREDICT_STATUS.inc(ticker=ticker, status=row['status'])  # Rows only exist for DB tickers
+    missing = [] if wanted == 'all' else [t for t in wanted if t not in rows]
+
+    response = jsonify({
+        'tickers': list(rows.keys()) if wanted == 'all' else get_tickers(snapshot),
+        'results': results,
+        'missing': missing,
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# Push status/version changes for a ticker instead of having clients re-POST /predict
+@app.route('/events/<ticker>')
+def status_events(ticker):
+    if ticker not in get_tickers(get_snapshot()):
+        return jsonify({'error': f'Ticker {ticker} not found in database.'}), 404
+    response = Response(stream_with_context(event_stream(status_watcher, ticker)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'   # don't let a proxy buffer the stream
+    return response
+
+# Ticker list for the dropdown and dashboards
+@app.route('/tickers')
+def ticker_list():
+    return jsonify({'tickers': get_tickers(get_snapshot())})
+
+# Add a ticker: validated and trained in the background, progress at /jobs/<job_id>
+@app.route('/add_ticker', methods=['POST'])
+def add_ticker():
+    data = request.get_json(silent=True) or request.form
+    stock_symbol = (data.get('requested_stock_symbol') or data.get('stock_symbol') or '').strip().upper()
+    if not stock_symbol:
+        return jsonify({'error': 'No stock symbol provided'}), 400
+    if len(stock_symbol) > 10 or not all(c.isalnum() or c in '.-^=' for c in stock_symbol):
+        return jsonify({'error': f'{stock_symbol} is not a valid stock symbol'}), 400
+
+    print(f"Adding ticker: {stock_symbol}")
+    if stock_symbol in get_tickers(get_snapshot()):
+        return jsonify({'message': f'Model for {stock_symbol} already exists.'}), 200
+    try:
+        job_id, created = get_training_queue().add_ticker(stock_symbol)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    message = f'{stock_symbol} queued for training.' if created else f'{stock_symbol} is already being added.'
+    return jsonify({'message': message, 'job_id': job_id, 'job_url': f'/jobs/{job_id}'}), 202
+
+# Progress of a background job
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = get_dbi().get_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    response = jsonify(job)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+HISTORY_PAGE = 500
+HISTORY_MAX_PAGE = 5000
+
+# A ticker's predictions vs actuals, a page at a time: ?start=&end=&limit=&cursor=<from_day>:<for_day>
+@app.route('/history/<ticker>')
+def prediction_history(ticker):
+    if ticker not in get_tickers(get_snapshot()):
+        return jsonify({'error': f'Ticker {ticker} not found in database.'}), 404
+    try:
+        start = request.args.get('start', type=int)
+        end = request.args.get('end', type=int)
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE)), 1), HISTORY_MAX_PAGE)
+        after = request.args.get('cursor')
+        after = tuple(int(part) for part in after.split(':', 1)) if after else None
+        if after is not None and len(after) != 2:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'limit must be a number and cursor must look like <from_day>:<for_day>'}), 400
+
+    # Predictions aren't in the snapshot; a primary-key seek on the working DB
+    with metrics.DB_QUERY_LATENCY.time(operation='get_prediction_history'):
+        rows, next_cursor, archived_through = get_dbi().get_prediction_history(ticker, start, end, after, limit)
+    # Columnar keeps repeated keys out of large pages
+    columns = list(zip(*rows)) or [(), (), (), (), ()]
+    rounded = lambda values: [None if v is None else round(v, 4) for v in values]
+    return jsonify({
+        'ticker': ticker,
+        'from_day': list(columns[0]),
+        'for_day': list(columns[1]),
+        'predicted': rounded(columns[2]),
+        'actual': rounded(columns[3]),
+        'ape': rounded(columns[4]),
+        'archived_through': archived_through,    # Older predictions were compacted away
+        'next': f'{next_cursor[0]}:{next_cursor[1]}' if next_cursor else None,
+    })
+
+# Backtests only change when the updater publishes, so cache them per snapshot
+_backtest_cache = {}
+_backtest_lock = threading.Lock()
+
+# Largest grid /backtest will run: positions are [thresholds, sizings, tickers, days] per horizon
+BACKTEST_MAX_THRESHOLDS = 20
+BACKTEST_MAX_TOP = 200
+
+# Strategy backtest over the stored predictions: ?tickers=AAPL,META&thresholds=0,0.5,1&horizons=1,5&cost_bps=5&top=10
+@app.route('/backtest')
+def backtest():
+    try:
+        # Sorted and deduplicated, so equivalent queries share a cache entry
+        symbols = tuple(sorted({t for t in request.args.get('tickers', '').split(',') if t})) or None
+        thresholds = tuple(sorted({float(t) for t in request.args.get('thresholds', '').split(',') if t})) or None
+        horizons = tuple(sorted({int(h) for h in request.args.get('horizons', '').split(',') if h})) or None
+        cost_bps = float(request.args.get('cost_bps', 0))
+        top = min(max(int(request.args.get('top', 20)), 1), BACKTEST_MAX_TOP)
+    except ValueError:
+        return jsonify({'error': 'thresholds, horizons, cost_bps and top must be numbers'}), 400
+    if horizons and not all(1 <= h <= 5 for h in horizons):
+        return jsonify({'error': 'horizons must be between 1 and 5'}), 400
+    if thresholds and len(thresholds) > BACKTEST_MAX_THRESHOLDS:
+        return jsonify({'error': f'at most {BACKTEST_MAX_THRESHOLDS} thresholds per backtest'}), 400
+    if not all(math.isfinite(v) for v in (thresholds or ()) + (cost_bps,)):
+        return jsonify({'error': 'thresholds and cost_bps must be finite'}), 400
+
+    dbi = get_dbi()
+    try:
+        published = os.stat(dbi.snapshot_path()).st_mtime_ns
+    except FileNotFoundError:
+        published = None
+    key = (symbols, thresholds, horizons, cost_bps, top)
+    with _backtest_lock:
+        cached = _backtest_cache.get(key)
+    if cached is None or cached[0] != published:
+        # Predictions aren't in the snapshot; this is a read-only scan of the working DB
+        with metrics.DB_QUERY_LATENCY.time(operation='backtest'):
+            report = dbi.backtest(symbols, thresholds, horizons, cost_bps, top)
+        with _backtest_lock:
+            if len(_backtest_cache) > 64:
+                _backtest_cache.clear()
+            _backtest_cache[key] = (published, report)
+    else:
+        report = cached[1]
+    return jsonify(report)
+
+#--- Function: Once-per-deploy initialization ---#
+def init_app():
+    """Create dirs and apply version updates. Run once before serving (or forking workers)."""
     # Create dirs
-    img_dir = 'static/images'
+    img_dir = IMG_PATH
     if not os.path.exists(img_dir):
         os.makedirs(img_dir)
 
-    mdl_dir = 'static/models/'
+    mdl_dir = os.path.join(BASE_DIR, 'static', 'models')
     if not os.path.exists(mdl_dir):
         os.makedirs(mdl_dir)
-    
+
     # Check for version updates
     print("Checking for version updates...")
-    if os.path.exists('fs_version_update.py'):
+    if os.path.exists(os.path.join(BASE_DIR, 'fs_version_update.py')):
         import fs_version_update
         result = fs_version_update.update_fs()
         if not result:
-            print("Update failed, exiting app.")
-            exit(1)
+            return False
+
+    # Make sure there is a snapshot for the web tier to read
+    try:
+        get_dbi().publish_snapshot(IMG_PATH)
+    except Exception as e:
+        print(f"Couldn't publish a snapshot, reading the working database until the next update: {e}")
+    return True
+#------------------------------------------------#
+
+#--- Function: Load read-only state so forked workers share it ---#
+def warm_state():
+    """Fill caches and compile templates; called in the server master before forking."""
+    tickers.clear()
+    try:
+        get_tickers(get_snapshot())
+    except Exception as e:
+        print(f"Couldn't preload tickers: {e}")
+    app.jinja_env.get_template('index.html')
+#-----------------------------------------------------------------#
+
+#--- First Boot ---#
+if __name__ == '__main__':
+    print('Starting Flask app...')
+    if not init_app():
+        print("Update failed, exiting app.")
+        exit(1)
     
-    app.run(debug=True, use_reloader=False) # set to False for production
-#---------------------#
\ No newline at end of file
+    # Development server only; production runs through wsgi.py (see gunicorn.conf.py)
+    app.run(debug=os.environ.get('FS_DEBUG', '1') == '1', use_reloader=False, threaded=True)
+#---------------------#
@@ -0,0 +1,114 @@
+"""
+Per-ticker LSTMs vs. one global LSTM with a ticker embedding, on fixture data.
+
+Each fixture ticker is a synthetic random walk with its own drift and volatility (no network).
+Both approaches get the same epochs; the last --holdout days of every ticker are never trained
+on and are scored with one-step-ahead MAPE. Reports total training time, inference throughput
+(windows/s) and holdout MAPE.
+
+    python benchmarks/bench_global_model.py --tickers 20 --days 1500 --epochs 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')   # CPU numbers
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+
+import numpy as np
+from model.lstm_model import LSTMModel
+from model.global_model import GlobalLSTMModel
+
+
+#--- Function: Fixture price series, one per ticker ---#
+def fixture_prices(tickers, days, seed=0):
+    rng = np.random.default_rng(seed)
+    series = {}
+    for ticker_id in range(1, tickers + 1):
+        drift = rng.normal(0.0003, 0.0005)
+        vol = rng.uniform(0.01, 0.03)
+        series[ticker_id] = (rng.uniform(20, 300) * np.exp(np.cumsum(rng.normal(drift, vol, days)))).astype(np.float32)
+    return series
+#------------------------------------------------------#
+
+#--- Function: Scaled windows, split into train and holdout ---#
+def split_windows(prices, time_step, holdout):
+    train_prices = prices[:-holdout]
+    low, high = train_prices.min(), train_prices.max()    # Scaler sees training data only
+    scaled = (prices - low) / (high - low)
+    n = len(scaled) - time_step
+    X = np.lib.stride_tricks.sliding_window_view(scaled, time_step)[:n][..., None]
+    y = scaled[time_step:time_step + n]
+    split = n - holdout
+    return (X[:split], y[:split]), (X[split:], y[split:]), (low, high)
+#--------------------------------------------------------------#
+
+#--- Function: MAPE of scaled predictions in price space ---#
+def mape(pred, y, scale):
+    low, high = scale
+    pred = pred.reshape(-1) * (high - low) + low
+    actual = y * (high - low) + low
+    return float(np.mean(np.abs((actual - pred) / actual)) * 100)
+#-----------------------------------------------------------#
+
+#--- Function: One network per ticker ---#
+def run_per_ticker(data, epochs):
+    train_time, infer_time, windows, apes = 0.0, 0.0, 0, []
+    for ticker_id, (train, test, scale) in data.items():
+        model = LSTMModel(f'BENCH{ticker_id}')._model
+        start = time.perf_counter()
+        model.fit(train[0], train[1], epochs=epochs, batch_size=LSTMModel._batch_size, verbose=0)
+        train_time += time.perf_counter() - start
+        start = time.perf_counter()
+        pred = model.predict(test[0], batch_size=1024, verbose=0)
+        infer_time += time.perf_counter() - start
+        windows += len(test[0])
+        apes.append(mape(pred, test[1], scale))
+    return train_time, windows / infer_time, float(np.mean(apes))
+#----------------------------------------#
+
+#--- Function: One shared network for every ticker ---#
+def run_global(data, epochs):
+    with tempfile.TemporaryDirectory() as save_path:
+        model = GlobalLSTMModel(save_path)
+    X = np.concatenate([train[0] for train, _, _ in data.values()])
+    y = np.concatenate([train[1] for train, _, _ in data.values()])
+    ids = np.concatenate([np.full((len(train[0]), 1), t, dtype=np.int32) for t, (train, _, _) in data.items()])
+    order = np.random.default_rng(0).permutation(len(X))
+    start = time.perf_counter()
+    model._network.fit([X[order], ids[order]], y[order], epochs=epochs, batch_size=model._batch_size, verbose=0)
+    train_time = time.perf_counter() - start
+
+    infer_time, windows, apes = 0.0, 0, []
+    for ticker_id, (_, test, scale) in data.items():
+        start = time.perf_counter()
+        pred = model.view(ticker_id).predict(test[0])
+        infer_time += time.perf_counter() - start
+        windows += len(test[0])
+        apes.append(mape(pred, test[1], scale))
+    return train_time, windows / infer_time, float(np.mean(apes))
+#-----------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=20)
+    parser.add_argument('--days', type=int, default=1500, help='length of each fixture price history')
+    parser.add_argument('--holdout', type=int, default=60, help='trailing days scored, never trained on')
+    parser.add_argument('--epochs', type=int, default=5)
+    args = parser.parse_args()
+
+    time_step = GlobalLSTMModel.time_step
+    data = {t: split_windows(p, time_step, args.holdout)
+            for t, p in fixture_prices(args.tickers, args.days).items()}
+    print(f"{args.tickers} tickers x {args.days} days, {args.epochs} epochs, {args.holdout}-day holdout\n")
+
+    results = {'per-ticker': run_per_ticker(data, args.epochs), 'global': run_global(data, args.epochs)}
+    print(f"{'':12s} {'train':>9s} {'infer':>14s} {'holdout MAPE':>13s}")
+    for name, (train_time, throughput, holdout_mape) in results.items():
+        print(f"{name:12s} {train_time:8.1f}s {throughput:10.0f} w/s {holdout_mape:12.2f}%")
+    print(f"\nglobal training speed-up: {results['per-ticker'][0] / results['global'][0]:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Price ingestion time and memory for a large universe, against the stand-in price server.
+
+Starts benchmarks/price_server.py in-process (with optional latency, 503s and a request-rate
+limit), ingests N symbols through YFInterface's chunked, concurrent path and reports wall time,
+failures and RSS. Symbols named BAD* have no data, to exercise per-ticker isolation.
+
+    python benchmarks/bench_ingestion.py --tickers 2000 --latency 0.3 --fail-rate 0.05 --workers 1 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+
+from model import rss
+from model.yf_interface import YFInterface, HTTPSource
+from price_server import start_in_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=1000)
+    parser.add_argument('--bad', type=int, default=5, help='symbols with no data')
+    parser.add_argument('--chunk', type=int, default=50)
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 4, 8])
+    parser.add_argument('--rate', type=float, default=20.0, help='client requests/second')
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--fail-rate', type=float, default=0.05)
+    parser.add_argument('--max-rate', type=float, default=0.0, help='server 429 threshold')
+    args = parser.parse_args()
+
+    server, url = start_in_thread(latency=args.latency, fail_rate=args.fail_rate, max_rate=args.max_rate)
+    tickers = [f'T{i:05d}' for i in range(args.tickers)] + [f'BAD{i}' for i in range(args.bad)]
+    print(f"{len(tickers)} symbols, chunks of {args.chunk}, {args.latency}s latency, "
+          f"{args.fail_rate:.0%} 503s\n")
+    print(f"{'workers':>7s} {'seconds':>8s} {'fetched':>8s} {'failed':>7s} {'RSS MiB':>8s}")
+    for workers in args.workers:
+        yf = None   # Each run starts from an empty cache; drop the last run's prices before measuring
+        rss.reset_peak_rss()
+        start = time.perf_counter()
+        yf = YFInterface(tickers, '2017-01-01', source=HTTPSource(url), chunk_size=args.chunk,
+                         max_workers=workers, rate_limit=args.rate)
+        seconds = time.perf_counter() - start
+        print(f"{workers:7d} {seconds:8.1f} {sum(yf.series(t) is not None for t in tickers):8d} {len(yf.failed):7d} "
+              f"{rss.process_peak_rss_bytes() / 2**20:8.0f}")
+    print(f"\nServer: {server.stats}")
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Size and range-scan time of the prediction/daily_accuracy tables, before and after the
+normalized layout (migration 11: integer ticker ids, WITHOUT ROWID, clustered keys).
+
+Builds a synthetic multi-year, multi-hundred-ticker database in the old layout, copies it,
+migrates the copy, VACUUMs both and compares them. Only needs the standard library.
+
+    python benchmarks/bench_storage.py --tickers 300 --days 1250
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+
+from model import migrations
+
+HORIZON = 5
+
+
+#--- Function: Old-layout database with synthetic history ---#
+def build_old_layout(path, tickers, days, seed=0):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('''
+        CREATE TABLE schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+    for version, name, step in migrations.MIGRATIONS:
+        if version >= 11:
+            break
+        step(conn)
+        conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+
+    names = [f'T{i:04d}' for i in range(tickers)]
+    conn.execute('BEGIN')
+    conn.executemany('INSERT OR IGNORE INTO model (ticker, status) VALUES (?, ?)', [(t, 'completed') for t in names])
+    conn.executemany('INSERT INTO day (day_num, date) VALUES (?, ?)', [(d, f'D{d}') for d in range(1, days + 1)])
+    for ticker in names:
+        price = rng.uniform(20, 300)
+        predictions, accuracy = [], []
+        for day in range(1, days + 1):
+            price *= 1 + rng.gauss(0, 0.02)
+            for h in range(1, HORIZON + 1):
+                predicted = price * (1 + rng.gauss(0, 0.03))
+                actual = price * (1 + rng.gauss(0, 0.02)) if day + h <= days else None
+                ape = abs(actual - predicted) / actual * 100 if actual else None
+                predictions.append((ticker, day, day + h, predicted, actual, ape, predicted > price))
+            accuracy.append((ticker, day, rng.uniform(1, 5), day // 2, rng.uniform(80, 150)))
+        conn.executemany('''
+            INSERT INTO prediction (ticker, from_day, for_day, predicted_price, actual_price, ape, buy)
+            VALUES (?, ?, ?, ?, ?, ?, ?)''', predictions)
+        conn.executemany('''
+            INSERT INTO daily_accuracy (ticker, day, mape, buy_accuracy, simulated_profit)
+            VALUES (?, ?, ?, ?, ?)''', accuracy)
+    conn.execute('COMMIT')
+    conn.execute('VACUUM')
+    conn.close()
+    return names
+#-------------------------------------------------------------#
+
+#--- Function: The hot read paths, in each layout ---#
+QUERIES = {
+    'old': {
+        'apes up to day': ('SELECT ape FROM prediction WHERE ticker = ? AND for_day <= ? AND ape IS NOT NULL',
+                           lambda t, tid, d: (t, d)),
+        'predictions for day': ('SELECT from_day, predicted_price FROM prediction WHERE ticker = ? AND for_day = ?',
+                                lambda t, tid, d: (t, d)),
+        'accuracy range': ('SELECT mape FROM daily_accuracy WHERE ticker = ? AND day BETWEEN ? AND ?',
+                           lambda t, tid, d: (t, d - 250, d)),
+    },
+    'new': {
+        'apes up to day': ('SELECT ape FROM prediction WHERE ticker_id = ? AND from_day < ? AND for_day <= ? '
+                           'AND ape IS NOT NULL', lambda t, tid, d: (tid, d, d)),
+        'predictions for day': ('SELECT from_day, predicted_price FROM prediction WHERE ticker_id = ? '
+                                'AND from_day BETWEEN ? AND ? AND for_day = ?',
+                                lambda t, tid, d: (tid, d - HORIZON, d - 1, d)),
+        'accuracy range': ('SELECT mape FROM daily_accuracy WHERE ticker_id = ? AND day BETWEEN ? AND ?',
+                           lambda t, tid, d: (tid, d - 250, d)),
+    },
+}
+
+def time_queries(path, layout, names, days, samples, seed=1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    ids = dict(conn.execute('SELECT ticker, model_id FROM model'))
+    picks = [(t, ids[t], rng.randint(300, days)) for t in rng.choices(names, k=samples)]
+    results = {}
+    for name, (sql, params) in QUERIES[layout].items():
+        start = time.perf_counter()
+        for ticker, ticker_id, day in picks:
+            conn.execute(sql, params(ticker, ticker_id, day)).fetchall()
+        results[name] = (time.perf_counter() - start) / samples * 1000
+    conn.close()
+    return results
+#----------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=300)
+    parser.add_argument('--days', type=int, default=1250, help='trading days (~5 years)')
+    parser.add_argument('--samples', type=int, default=500, help='queries timed per query type')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, 'old.db')
+        new_path = os.path.join(tmp, 'new.db')
+        print(f"Building {args.tickers} tickers x {args.days} days x {HORIZON} horizons...")
+        names = build_old_layout(old_path, args.tickers, args.days)
+        shutil.copy(old_path, new_path)
+
+        start = time.perf_counter()
+        migrations.migrate(new_path, verbose=False)
+        migrate_seconds = time.perf_counter() - start
+        conn = sqlite3.connect(new_path, isolation_level=None)
+        conn.execute('VACUUM')
+        conn.close()
+
+        old_size, new_size = os.path.getsize(old_path), os.path.getsize(new_path)
+        print(f"\nMigration: {migrate_seconds:.1f}s")
+        print(f"DB size: {old_size / 2**20:.1f} MiB -> {new_size / 2**20:.1f} MiB ({new_size / old_size:.0%})\n")
+
+        old_times = time_queries(old_path, 'old', names, args.days, args.samples)
+        new_times = time_queries(new_path, 'new', names, args.days, args.samples)
+        print(f"{'query':22s} {'old':>9s} {'new':>9s}")
+        for name in old_times:
+            print(f"{name:22s} {old_times[name]:7.3f}ms {new_times[name]:7.3f}ms "
+                  f"({old_times[name] / new_times[name]:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Per-epoch training time on CPU: Keras fit() on NumPy arrays vs. the tf.data + XLA backend.
+
+Uses a synthetic random-walk price series (no network) and the production LSTM architecture.
+The first epoch of each run includes tracing/compilation and is reported separately.
+
+    python benchmarks/bench_tf_backend.py --days 2200 --epochs 6 --runs 3
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')   # CPU numbers
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+
+import numpy as np
+from keras.callbacks import Callback
+from model.lstm_model import LSTMModel
+from model import tf_backend
+
+
+class EpochTimer(Callback):
+    def on_train_begin(self, logs=None):
+        self.times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.times.append(time.perf_counter() - self._start)
+
+
+#--- Function: Windows from a synthetic price series ---#
+def synthetic_windows(days, time_step, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    scaled = (prices - prices.min()) / (prices.max() - prices.min())
+    n = days - time_step - 1
+    X = np.lib.stride_tricks.sliding_window_view(scaled, time_step)[:n].reshape(n, time_step, 1)
+    y = scaled[time_step:time_step + n]
+    return X.astype(np.float32), y.astype(np.float32)
+#-------------------------------------------------------#
+
+#--- Function: Time `runs` fits on one backend ---#
+def time_backend(backend, X, y, epochs, runs):
+    first, steady = [], []
+    for run in range(runs):
+        # A fresh model per run, like a new day/ticker; the tfdata trainer is shared across runs
+        model = LSTMModel(f'BENCH{run}')._model
+        timer = EpochTimer()
+        if backend == 'tfdata':
+            tf_backend.fit(model, X, y, epochs, callbacks=[timer], verbose=0)
+        else:
+            model.fit(X, y, epochs=epochs, batch_size=64, callbacks=[timer], verbose=0)
+        first.append(timer.times[0])
+        steady.extend(timer.times[1:])
+    return first, steady
+#-------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=2200, help='length of the synthetic price history')
+    parser.add_argument('--epochs', type=int, default=6)
+    parser.add_argument('--runs', type=int, default=3, help='fits per backend (simulates days/tickers)')
+    args = parser.parse_args()
+
+    X, y = synthetic_windows(args.days, LSTMModel.time_step)
+    print(f"{len(X)} windows of {LSTMModel.time_step} days, {args.epochs} epochs x {args.runs} runs\n")
+    results = {}
+    for backend in ('keras', 'tfdata'):
+        first, steady = time_backend(backend, X, y, args.epochs, args.runs)
+        results[backend] = np.median(steady)
+        print(f"{backend:7s} first epoch (per run): {', '.join(f'{t:.2f}s' for t in first)}")
+        print(f"{backend:7s} steady-state epoch: median {np.median(steady):.3f}s, min {np.min(steady):.3f}s\n")
+    print(f"tfdata speed-up per epoch: {results['keras'] / results['tfdata']:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Load test for the production server: throughput vs. gunicorn worker count.
+
+Starts `gunicorn -c gunicorn.conf.py wsgi:application` once per worker count, hammers it
+with concurrent clients for a fixed time and prints requests/second and latency percentiles.
+
+    python benchmarks/load_test.py --workers 1 2 4 --clients 32 --seconds 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import urllib.error
+
+BASE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+#--- Function: Wait until the server answers ---#
+def wait_for_server(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return True
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.25)
+    return False
+#-----------------------------------------------#
+
+#--- Function: One client's request loop ---#
+def client(base_url, tickers, stop, latencies, errors):
+    i = 0
+    while not stop.is_set():
+        ticker = tickers[i % len(tickers)]
+        i += 1
+        # Mix of the two hot endpoints
+        if i % 4 == 0:
+            req = urllib.request.Request(f'{base_url}/predict_batch?tickers=all')
+        else:
+            body = json.dumps({'stock_symbol': ticker}).encode()
+            req = urllib.request.Request(f'{base_url}/predict', data=body,
+                                         headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            urllib.request.urlopen(req, timeout=30).read()
+            latencies.append(time.perf_counter() - start)
+        except (urllib.error.URLError, ConnectionError):
+            errors.append(1)
+#-------------------------------------------#
+
+#--- Function: Run one load phase against a running server ---#
+def run_load(base_url, clients, seconds):
+    tickers = json.loads(urllib.request.urlopen(f'{base_url}/tickers').read())['tickers'] or ['AAPL']
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(base_url, tickers, stop, latencies, errors))
+               for _ in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float('nan')
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / seconds,
+        'p50_ms': pct(0.50),
+        'p99_ms': pct(0.99),
+    }
+#-------------------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = []
+    for workers in args.workers:
+        env = dict(os.environ, FS_WORKERS=str(workers), FS_THREADS=str(args.threads),
+                   FS_BIND=f'127.0.0.1:{args.port}', FS_ERROR_LOG='/dev/null')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+                                  cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL)
+        try:
+            if not wait_for_server(f'{base_url}/tickers'):
+                print(f"Server with {workers} worker(s) didn't start.")
+                continue
+            run_load(base_url, args.clients, 2)     # Warm-up
+            result = run_load(base_url, args.clients, args.seconds)
+            result['workers'] = workers
+            results.append(result)
+            print(f"workers={workers:<3} rps={result['rps']:8.1f}  p50={result['p50_ms']:7.2f}ms  "
+                  f"p99={result['p99_ms']:7.2f}ms  errors={result['errors']}")
+        finally:
+            server.terminate()
+            server.wait()
+
+    if len(results) > 1:
+        base = results[0]['rps'] or 1
+        print("\nScaling vs. first run: " +
+              ', '.join(f"{r['workers']}w={r['rps'] / base:.2f}x" for r in results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Stand-in HTTP price server for testing ingestion without Yahoo Finance.
+
+Serves deterministic random-walk closes for any symbol over the protocol YFInterface's
+HTTPSource speaks (see model/yf_interface.py), and can misbehave on purpose: added latency,
+random 503s, 429s above a request rate, and symbols with no data. Standard library only.
+
+    python benchmarks/price_server.py --port 8090 --latency 0.2 --fail-rate 0.1
+    FS_PRICE_SOURCE_URL=http://127.0.0.1:8090 python -m model.updater
+"""
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+import urllib.parse
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIRST_DAY = datetime.date(2017, 1, 2)
+MISSING_PREFIX = 'BAD'      # Symbols starting with this have no data
+
+
+#--- Function: Business-day closes for one symbol ---#
+def series(ticker, start, end):
+    """Same walk for the same symbol every time, so reruns and refreshes line up."""
+    rng = random.Random(zlib.crc32(ticker.encode()))
+    price = rng.uniform(10, 500)
+    dates, closes = [], []
+    day = FIRST_DAY
+    while day < end:
+        if day.weekday() < 5:
+            price *= 1 + rng.gauss(0.0003, 0.02)
+            if day >= start:
+                dates.append(day.isoformat())
+                closes.append(round(price, 4))
+        day += datetime.timedelta(days=1)
+    return {'dates': dates, 'close': closes}
+#----------------------------------------------------#
+
+#--- Function: Build the server ---#
+def make_server(port=0, latency=0.0, fail_rate=0.0, max_rate=0.0, max_tickers=200, seed=0):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    recent = []     # Request times in the last second, for the 429 limit
+    stats = {'requests': 0, 'failed': 0, 'throttled': 0}
+
+    class PriceHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            if url.path != '/prices':
+                self.send_error(404)
+                return
+            with lock:
+                stats['requests'] += 1
+                now = time.monotonic()
+                recent[:] = [t for t in recent if now - t < 1.0] + [now]
+                throttled = max_rate and len(recent) > max_rate
+                failed = not throttled and rng.random() < fail_rate
+                stats['throttled'] += bool(throttled)
+                stats['failed'] += failed
+            if throttled:
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.end_headers()
+                return
+            if latency:
+                time.sleep(latency)
+            if failed:
+                self.send_error(503)
+                return
+
+            query = urllib.parse.parse_qs(url.query)
+            tickers = [t for t in query.get('tickers', [''])[0].split(',') if t]
+            if len(tickers) > max_tickers:
+                self.send_error(400, f'At most {max_tickers} tickers per request')
+                return
+            start = datetime.date.fromisoformat(query.get('start', [FIRST_DAY.isoformat()])[0])
+            end = datetime.date.fromisoformat(query['end'][0]) if 'end' in query else datetime.date.today()
+            body = json.dumps({t: series(t, start, end) for t in tickers
+                               if not t.startswith(MISSING_PREFIX)}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), PriceHandler)
+    server.stats = stats
+    return server
+#----------------------------------#
+
+#--- Function: Run in a background thread (for benchmarks) ---#
+def start_in_thread(**options):
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, name='price-server', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+#-------------------------------------------------------------#
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests answered 503')
+    parser.add_argument('--max-rate', type=float, default=0.0, help='requests/second before 429s (0 = no limit)')
+    parser.add_argument('--max-tickers', type=int, default=200, help='symbols allowed per request')
+    args = parser.parse_args()
+    server = make_server(args.port, args.latency, args.fail_rate, args.max_rate, args.max_tickers)
+    print(f"Serving prices at http://127.0.0.1:{args.port}/prices")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{server.stats}")
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,6 @@
 import os
 import sqlite3
-from model.db_interface import DBInterface
-from model.yf_interface import YFInterface
-from model.model import Model
+from model import migrations
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SAVE_PATH = os.path.join(BASE_DIR, 'static', 'models')
@@ -12,158 +10,36 @@ new_db = os.path.join(SAVE_PATH, 'futurestock.db')
 # If you would like to scrub the database, set this to True
 SCRUB_DB = False
 
-# Update to 0.7 - db_overhaul
+# Bring the database schema up to date (see model/migrations.py)
 def update_fs():
-    print("***Updating to version 0.7 - db_overhaul***")
-
     # Surround with try-except to handle potential errors
     try:
-        # Prep: Initialize YFI and DBI
-        print("\tPrepping YF and DB interfaces...", end=' ')
-        yf = YFInterface(['AAPL'], '2025-10-01')
-        dates = yf.get_all_dates()
-        if not SCRUB_DB:
-            db = DBInterface(SAVE_PATH, dates)
-        else:
-            db = DBInterface(SAVE_PATH)
-        print("done.")
-
-        # Step 1: Rename DB file
-        print("\t1. Renaming models.db to futurestock.db...", end=' ')
-        try:
+        # Pre-0.7 installs used models.db
+        if os.path.exists(old_db) and not os.path.exists(new_db):
+            print("\tRenaming models.db to futurestock.db...", end=' ')
             os.rename(old_db, new_db)
             print("done.")
-        except FileNotFoundError:
-            print("already renamed. Update already performed, exiting.")
-            return True
-
-        # Step 2: Connect to the new DB
-        print("\t2. Connecting to the new database...", end=' ')
-        conn = sqlite3.connect(new_db)
-        cursor = conn.cursor()
-        print("done.")
 
         # Scrub the database (optional)
-        if SCRUB_DB:  # Set to True if needed
+        if SCRUB_DB:
             print("\tBONUS: Scrubbing the database...", end=' ')
+            conn = sqlite3.connect(new_db)
+            cursor = conn.cursor()
             cursor.execute("DROP TABLE IF EXISTS model;")
             cursor.execute("DROP TABLE IF EXISTS prediction;")
             cursor.execute("DROP TABLE IF EXISTS daily_accuracy;")
             cursor.execute("DROP TABLE IF EXISTS day;")
+            cursor.execute("DROP TABLE IF EXISTS schema_version;")
             conn.commit()
+            conn.close()
             print("done.")
 
-        # Step 3: Create 'model' table
-        print("\t3. Creating model table...", end=' ')
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='model';")
-        if cursor.fetchone() is not None:
-            print("Model table already exists.")
+        # One query when the schema is already current
+        applied = migrations.migrate(new_db)
+        if applied:
+            print(f"***Database updated to schema version {migrations.LATEST_VERSION}!***")
         else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS model (
-                model_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticker TEXT UNIQUE NOT NULL,
-                result REAL,
-                mape REAL,
-                buy_acc REAL,
-                balance REAL,
-                last_update INTEGER,
-                status TEXT,
-                version INTEGER DEFAULT 0
-                )
-            ''')
-            conn.commit()
-            print("done.")
-        
-        # Step 4: Copy data from old "models" table to new "model" table
-        print("\t4. Copying data from old 'models' table to new 'model' table...", end=' ')
-        # Check if 'model' already has entries
-        cursor.execute("SELECT COUNT() FROM model;")
-        count = cursor.fetchone()[0]
-        if count > 0:
-            print("already done.")
-        else:
-            try:
-                cursor.execute("INSERT INTO model (ticker, blob, status) SELECT ticker, model, status FROM models;")
-                conn.commit()
-                # Check if the data was copied
-                cursor.execute("SELECT COUNT() FROM model;")
-                if cursor.fetchone()[0] == 0:
-                    print("Error: Couldn't copy.")
-                else: print("done.")
-            except sqlite3.OperationalError as e:
-                print("Error: Couldn't copy.")
-
-        # Step 5: Drop old "models" table
-        print("\t5. Dropping old 'models' table...", end=' ')
-        cursor.execute("DROP TABLE IF EXISTS models;")
-        conn.commit()
-        print("done.")
-
-        # Step 6 Create Day table
-        print("\t6. Creating Day table if it doesn't exist...", end=' ')
-        db.populate_dates(dates)  # This will create the table if it doesn't exist
-        result = db.get_day_num('2099-01-01')
-        if result != -1:
-            print("Day table is up to date!")
-        else: 
-            print("Error: Couldn't find date.")
-        
-        # Step 7: Create prediction table if it doesn't exist
-        print("\t7. Creating prediction table if it doesn't exist...", end=' ')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prediction (
-                predict_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticker TEXT NOT NULL,
-                from_day INTEGER NOT NULL,
-                for_day INTEGER NOT NULL,
-                predicted_price REAL NOT NULL,
-                actual_price REAL,
-                ape REAL,
-                buy BOOLEAN,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(ticker, from_day, for_day)
-            );
-        ''')
-        conn.commit()
-        print("done.")
-
-        # Step 8: Create daily_accuracy table if it doesn't exist
-        print("\t8. Creating daily_accuracy table if it doesn't exist...", end=' ')
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS daily_accuracy (
-            dailyacc_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticker TEXT NOT NULL,
-            day INTEGER NOT NULL,
-            mape REAL,
-            buy_accuracy INTEGER,
-            simulated_profit REAL,
-            UNIQUE(ticker, day)
-        )
-        ''')
-        conn.commit()
-        print("done.")
-
-        # Step 9: Add the models if they don't exist
-        print("\t9. Adding default models if they don't exist...", end=' ')
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        IMG_PATH = os.path.join(BASE_DIR, 'static', 'images')
-        models = {}
-        if 'AAPL' not in models:
-            models['AAPL'] = Model('AAPL', db, yf, IMG_PATH)
-        if 'GOOGL' not in models:
-            models['GOOGL'] = Model('GOOGL', db, yf, IMG_PATH)
-        if 'META' not in models:
-            models['META'] = Model('META', db, yf, IMG_PATH)
-        if 'AMZN' not in models:
-            models['AMZN'] = Model('AMZN', db, yf, IMG_PATH)
-        if 'NFLX' not in models:
-            models['NFLX'] = Model('NFLX', db, yf, IMG_PATH)
-        print("done.")
-
-        # Close the connection
-        conn.close()
-        print("***Update completed!***")
+            print(f"Database is up to date (schema version {migrations.LATEST_VERSION}).")
         return True
     
     except sqlite3.OperationalError as e:
@@ -175,9 +51,6 @@ def update_fs():
     except FileNotFoundError as e:
         print(f"File not found: {e}")
         return False
-    except PermissionError as e:
-        print(f"Permission error: {e}")
-        return False
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-        return False
\ No newline at end of file
+        return False
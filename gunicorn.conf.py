@@ -0,0 +1,56 @@
+import os
+import signal
+import threading
+
+# Gunicorn settings for serving FutureStock in production:
+#   gunicorn -c gunicorn.conf.py wsgi:application
+# Every value can be overridden with an FS_* environment variable.
+
+bind = os.environ.get('FS_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('FS_WORKERS', (os.cpu_count() or 1) + 1))
+threads = int(os.environ.get('FS_THREADS', 8))
+worker_class = 'gthread'            # each open /events stream holds a thread; status_stream.py bounds them
+timeout = int(os.environ.get('FS_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get('FS_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# Import wsgi.py (version update + warm caches) in the master before forking
+preload_app = True
+
+accesslog = os.environ.get('FS_ACCESS_LOG', None)
+errorlog = os.environ.get('FS_ERROR_LOG', '-')
+
+# How often the master checks whether the updater published new results
+PUBLISH_POLL_SECONDS = float(os.environ.get('FS_PUBLISH_POLL', 30))
+
+
+#--- Function: Modification time of the publish marker ---#
+def _marker_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+#---------------------------------------------------------#
+
+#--- Hook: Reload workers when the updater publishes ---#
+def when_ready(server):
+    from app import get_dbi, warm_state
+    marker = get_dbi().published_marker_path()
+
+    def watch():
+        last_seen = _marker_mtime(marker)
+        while True:
+            threading.Event().wait(PUBLISH_POLL_SECONDS)
+            mtime = _marker_mtime(marker)
+            if mtime is not None and mtime != last_seen:
+                last_seen = mtime
+                server.log.info("New results published, refreshing state and reloading workers")
+                # Re-warm the master first so the new workers fork with fresh state,
+                # then HUP: gunicorn starts new workers and lets old ones finish their requests
+                warm_state()
+                os.kill(os.getpid(), signal.SIGHUP)
+
+    threading.Thread(target=watch, name='publish-watcher', daemon=True).start()
+#-------------------------------------------------------#
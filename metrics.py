@@ -0,0 +1,234 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from model.rss import process_rss_bytes, process_max_rss_bytes
+
+# Prometheus-style metrics for the Flask app, rendered in the text exposition format.
+# Everything is kept in-process behind one lock per metric, so recording a value costs
+# a dict lookup and a bisect - cheap enough to leave on in production.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Default latency buckets in seconds (requests go from ~1ms for cached reads to many
+# seconds when a Keras model has to be loaded)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+#--- Helper: Format a label set ---#
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+#----------------------------------#
+
+
+class _Metric:
+    """Base class holding the name, help text and label names of a metric."""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    #--- Function: Turn keyword labels into a key ---#
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    #------------------------------------------------#
+
+    #--- Function: Render the HELP/TYPE header ---#
+    def _header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+    #---------------------------------------------#
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, optionally computed at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), func=None):
+        super().__init__(name, documentation, labelnames)
+        self._func = func
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = self._header()
+        if self._func is not None:
+            lines.append(f'{self.name} {self._func()}')
+            return lines
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values (e.g. latencies)."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    #--- Function: Record one observation ---#
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                entry = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+    #----------------------------------------#
+
+    #--- Function: Time a block of code ---#
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    #--------------------------------------#
+
+    def render(self):
+        with self._lock:
+            items = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        lines = self._header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', repr(float(bound))))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key, ('le', '+Inf'))
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together on /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+_START_TIME = time.time()
+
+#--- Default registry and the app's metrics ---#
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'futurestock_http_request_duration_seconds',
+    'HTTP request latency by route, method and response status.',
+    ('route', 'method', 'status')))
+
+PREDICT_STATUS = REGISTRY.register(Counter(
+    'futurestock_predict_status_total',
+    'Predict requests by ticker and model status branch (new/in_progress/completed/error).',
+    ('ticker', 'status')))   # Symbols not in the DB are counted as ticker="unknown", so this stays bounded
+
+DB_QUERY_LATENCY = REGISTRY.register(Histogram(
+    'futurestock_db_query_duration_seconds',
+    'Time spent in DBInterface calls made by the web tier.',
+    ('operation',)))
+
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'futurestock_cache_requests_total',
+    'Cache lookups by cache name and result (hit/miss).',
+    ('cache', 'result')))
+
+REGISTRY.register(Gauge(
+    'process_resident_memory_bytes',
+    'Resident memory size in bytes.',
+    func=process_rss_bytes))
+
+REGISTRY.register(Gauge(
+    'process_max_resident_memory_bytes',
+    'Peak resident memory size in bytes.',
+    func=process_max_rss_bytes))
+
+REGISTRY.register(Gauge(
+    'process_start_time_seconds',
+    'Start time of the process since unix epoch in seconds.',
+    func=lambda: _START_TIME))
+#----------------------------------------------#
+
+
+#--- Function: Record a cache lookup ---#
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+#---------------------------------------#
+
+#--- Function: Render all metrics ---#
+def render():
+    return REGISTRY.render()
+#------------------------------------#
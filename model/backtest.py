@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import numpy as np
+
+# Vectorized backtests over the stored prediction history.
+# The prediction table is read once into two arrays:
+#   close[ticker, day]            actual close (from the actual_price of any row for that day)
+#   pred[ticker, day, horizon-1]  price predicted on `day` for `day + horizon`
+# Every strategy is a position in [-1, 1] held from one close to the next, decided from the
+# predicted change at the chosen horizon, so a whole grid of (horizon, threshold, sizing,
+# shorting) is just broadcasting over [threshold, sizing, ticker, day].
+#   sizing 'all_in'        full position whenever the predicted move clears the threshold
+#   sizing 'proportional'  position = predicted move / FULL_POSITION_MOVE, capped at 1
+# The updater's buy-if-up, $100-start balance is horizon 5, threshold 0, all_in, long only.
+#
+#   python -m model.backtest [--tickers AAPL META] [--thresholds 0 0.5 1 2] [--cost-bps 5] [--json]
+
+HORIZONS = (1, 2, 3, 4, 5)
+THRESHOLDS = (0.0, 0.25, 0.5, 1.0, 2.0)     # Minimum predicted move, in percent
+SIZINGS = ('all_in', 'proportional')
+FULL_POSITION_MOVE = 0.05                   # Predicted move that earns a full proportional position
+START_BALANCE = 100.0
+TRADING_DAYS = 252
+SQL_VARIABLES = 500                         # Bound parameters per query (older SQLite caps at 999)
+
+
+#--- Function: Load prediction history into arrays ---#
+def load_history(db_path, tickers=None, horizons=max(HORIZONS)):
+    """Return (ticker names, close[T, D], pred[T, D, H]) from one query."""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        names = dict(conn.execute('SELECT model_id, ticker FROM model'))
+        query = '''
+            SELECT ticker_id, from_day, for_day, predicted_price, actual_price
+            FROM prediction'''
+        if tickers is None:
+            rows = conn.execute(query).fetchall()
+        else:
+            # Primary-key seeks per ticker instead of reading every ticker's history
+            wanted = sorted(tid for tid, name in names.items() if name in set(tickers))
+            rows = []
+            for i in range(0, len(wanted), SQL_VARIABLES):
+                chunk = wanted[i:i + SQL_VARIABLES]
+                rows += conn.execute(f"{query} WHERE ticker_id IN ({', '.join('?' * len(chunk))})",
+                                     chunk).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return [], np.empty((0, 0)), np.empty((0, 0, horizons))
+
+    data = np.array(rows, dtype=np.float64)     # NULL actual prices become NaN
+    ticker_ids, t_index = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+    from_day = data[:, 1].astype(np.int64)
+    for_day = data[:, 2].astype(np.int64)
+    n_days = int(for_day.max()) + 1
+
+    close = np.full((len(ticker_ids), n_days), np.nan)
+    known = ~np.isnan(data[:, 4])
+    close[t_index[known], for_day[known]] = data[known, 4]
+
+    pred = np.full((len(ticker_ids), n_days, horizons), np.nan)
+    h = for_day - from_day
+    ok = (h >= 1) & (h <= horizons)
+    pred[t_index[ok], from_day[ok], h[ok] - 1] = data[ok, 3]
+    return [names.get(int(t), str(t)) for t in ticker_ids], close, pred
+#-----------------------------------------------------#
+
+#--- Function: Positions for a grid of thresholds and sizings ---#
+def positions(signal, thresholds, sizings, allow_short):
+    """signal[T, D] -> positions[len(thresholds), len(sizings), T, D]."""
+    theta = np.asarray(thresholds, dtype=np.float32)[:, None, None, None] / 100
+    s = np.nan_to_num(signal, nan=0.0).astype(np.float32)[None, None]
+    magnitude = np.abs(s) if allow_short else np.maximum(s, 0)
+    active = magnitude > theta
+    sizes = []
+    for sizing in sizings:
+        if sizing == 'all_in':
+            sizes.append(np.ones_like(s[0, 0]))
+        elif sizing == 'proportional':
+            sizes.append(np.minimum(magnitude[0, 0] / FULL_POSITION_MOVE, 1.0))
+        else:
+            raise ValueError(f"Unknown sizing: {sizing}")
+    size = np.stack(sizes)[None]                # [1, S, T, D]
+    direction = np.sign(s) if allow_short else 1.0
+    return active * size * direction            # [Θ, S, T, D]
+#----------------------------------------------------------------#
+
+#--- Function: Summary statistics for each strategy in a grid ---#
+def _summarize(position, next_return, cost):
+    """position[..., T, D], next_return[T, D] -> dict of arrays over the leading axes."""
+    valid = ~np.isnan(next_return)
+    r = np.where(valid, next_return, 0.0).astype(np.float32)
+    pos = position * valid
+    trades = np.abs(np.diff(pos, axis=-1, prepend=0))
+    daily = np.maximum(pos * r - trades * cost, -0.9999)            # [..., T, D], a short can't lose more than all
+    balance = START_BALANCE * np.exp(np.log1p(daily).sum(axis=-1))  # [..., T]
+
+    # Equal-weight portfolio over the tickers that have a price that day
+    active = valid.sum(axis=0)
+    portfolio = daily.sum(axis=-2) / np.maximum(active, 1)          # [..., D]
+    portfolio = portfolio[..., active > 0]
+    mean, std = portfolio.mean(axis=-1), portfolio.std(axis=-1)
+    sharpe = np.where(std > 0, mean / np.where(std > 0, std, 1) * np.sqrt(TRADING_DAYS), 0.0)
+
+    invested = pos != 0
+    hits = (np.sign(pos) == np.sign(r)) & invested
+    return {
+        'mean_balance': balance.mean(axis=-1),
+        'median_balance': np.median(balance, axis=-1),
+        'sharpe': sharpe,
+        'exposure': np.abs(pos).sum(axis=(-1, -2)) / max(valid.sum(), 1),
+        'hit_rate': hits.sum(axis=(-1, -2)) / np.maximum(invested.sum(axis=(-1, -2)), 1),
+        'trades': (trades > 0).sum(axis=(-1, -2)),
+    }
+#----------------------------------------------------------------#
+
+#--- Function: One strategy's stats as JSON-friendly numbers ---#
+def _rounded(stats, index):
+    return {key: int(value[index]) if key == 'trades' else round(float(value[index]), 4)
+            for key, value in stats.items()}
+#---------------------------------------------------------------#
+
+#--- Function: Run the whole grid ---#
+def run(close, pred, horizons=HORIZONS, thresholds=THRESHOLDS, sizings=SIZINGS, shorting=(False, True),
+        cost_bps=0.0):
+    """Return (strategy results, best mean balance first; buy-and-hold baseline)."""
+    next_return = np.full_like(close, np.nan)
+    next_return[:, :-1] = close[:, 1:] / close[:, :-1] - 1
+    cost = cost_bps / 10000
+    results = []
+    for horizon in horizons:
+        signal = pred[:, :, horizon - 1] / close - 1
+        for allow_short in shorting:
+            stats = _summarize(positions(signal, thresholds, sizings, allow_short), next_return, cost)
+            for i, threshold in enumerate(thresholds):
+                for j, sizing in enumerate(sizings):
+                    results.append({
+                        'horizon': horizon, 'threshold': threshold, 'sizing': sizing, 'short': allow_short,
+                        **_rounded(stats, (i, j)),
+                    })
+    results.sort(key=lambda r: r['mean_balance'], reverse=True)
+
+    hold = _summarize(np.ones((1,) + close.shape, dtype=np.float32) * ~np.isnan(close), next_return, 0.0)
+    baseline = {'strategy': 'buy_and_hold', **_rounded(hold, 0)}
+    return results, baseline
+#------------------------------------#
+
+#--- Function: Backtest straight from the database ---#
+def backtest(db_path, tickers=None, thresholds=THRESHOLDS, horizons=HORIZONS, cost_bps=0.0, top=None):
+    start = time.perf_counter()
+    names, close, pred = load_history(db_path, tickers)
+    loaded = time.perf_counter()
+    if not names:
+        return {'tickers': [], 'days': 0, 'strategies': [], 'baseline': None}
+    strategies, baseline = run(close, pred, horizons, thresholds, cost_bps=cost_bps)
+    return {
+        'tickers': names,
+        'days': int((~np.isnan(close)).any(axis=0).sum()),
+        'cost_bps': cost_bps,
+        'strategies': strategies[:top] if top else strategies,
+        'baseline': baseline,
+        'seconds': {'load': round(loaded - start, 3), 'backtest': round(time.perf_counter() - loaded, 3)},
+    }
+#-----------------------------------------------------#
+
+
+#--- Entry point ---#
+def main(argv=None):
+    from model.db_interface import DBInterface
+    parser = argparse.ArgumentParser(description='Backtest trading strategies over the stored predictions.')
+    parser.add_argument('--tickers', nargs='*', help='default: every ticker')
+    parser.add_argument('--thresholds', nargs='*', type=float, default=list(THRESHOLDS), help='percent')
+    parser.add_argument('--horizons', nargs='*', type=int, default=list(HORIZONS))
+    parser.add_argument('--cost-bps', type=float, default=0.0, help='cost per unit of position change')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    models_path = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static', 'models'))
+    report = DBInterface(models_path).backtest(args.tickers or None, args.thresholds, args.horizons,
+                                               args.cost_bps, args.top)
+    if args.json:
+        print(json.dumps(report))
+        return
+    if not report['tickers']:
+        print("No predictions to backtest.")
+        return
+    print(f"{len(report['tickers'])} tickers, {report['days']} days "
+          f"(load {report['seconds']['load']}s, backtest {report['seconds']['backtest']}s)\n")
+    print(f"{'h':>2s} {'thr%':>5s} {'sizing':12s} {'short':5s} {'mean $':>8s} {'median $':>8s} "
+          f"{'sharpe':>6s} {'hit':>5s} {'expo':>5s}")
+    for r in report['strategies']:
+        print(f"{r['horizon']:2d} {r['threshold']:5.2f} {r['sizing']:12s} {str(r['short']):5s} "
+              f"{r['mean_balance']:8.2f} {r['median_balance']:8.2f} {r['sharpe']:6.2f} "
+              f"{r['hit_rate']:5.2f} {r['exposure']:5.2f}")
+    b = report['baseline']
+    print(f"\nbuy and hold: mean ${b['mean_balance']:.2f}, median ${b['median_balance']:.2f}, sharpe {b['sharpe']:.2f}")
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+#-------------------#
@@ -0,0 +1,95 @@
+import os
+import sys
+import argparse
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# Chart rendering that doesn't need the model.
+# The 'mirror' (model vs actual price) chart is drawn from a small compressed array saved next
+# to the Keras files, static/models/mirror/{ticker}.npz, so charts can be restyled or redrawn
+# without loading Keras or running inference:
+#
+#   python -m model.charts [AAPL META ...]
+#
+# Published copies are stamped with the model version (model/snapshot.py), so redrawn charts
+# reach the web tier with the ticker's next update.
+
+MIRROR_DIR = 'mirror'       # Under static/models
+# The chart is 6in x 100dpi with ~465px of plot area: more points than pixels can't show
+MIRROR_POINTS = 600
+MIRROR_DAYS = int(os.environ.get('FS_MIRROR_DAYS', 0))  # Most recent days shown; 0 = since 2017
+
+
+#--- Function: Write the current figure without ever leaving a partial PNG ---#
+def save_figure(path):
+    tmp_path = path + '.tmp'
+    plt.savefig(tmp_path, format='png')
+    plt.close()
+    os.replace(tmp_path, path)   # Snapshot publishing may copy the file at any moment
+#-----------------------------------------------------------------------------#
+
+#--- Function: Windows to run for the mirror chart ---#
+def mirror_windows(n_windows, days=MIRROR_DAYS, points=MIRROR_POINTS):
+    """Indices of the windows to predict: the last `days` of them, strided down to about `points`."""
+    start = max(n_windows - days, 0) if days else 0
+    stride = max(-(-(n_windows - start) // points), 1)
+    # Count back from the newest window so the latest day is always drawn
+    return np.arange(n_windows - 1, start - 1, -stride)[::-1]
+#-----------------------------------------------------#
+
+#--- Function: Draw the mirror chart ---#
+def plot_mirror(path, ticker, actual, index, mirror, start=0):
+    """actual: close prices, drawn from `start`; index: positions in `actual` that mirror[i] predicts."""
+    start = max(int(start), 0)
+    if len(actual) <= start:
+        start = 0   # Less than a window of history: no offset, draw every close there is
+    plt.figure(figsize=(6, 3))
+    plt.title(f'Model Against Actual Price - {ticker}')
+    plt.plot(np.arange(start, len(actual)), actual[start:], label="Actual Price")
+    if len(index):
+        plt.plot(index, mirror, label='Model Prediction')
+    plt.legend()
+    save_figure(path)
+#---------------------------------------#
+
+#--- Function: Persist the arrays behind a mirror chart ---#
+def save_mirror(path, actual, index, mirror, start, day):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, actual=np.asarray(actual, dtype=np.float32).ravel(),
+                        index=np.asarray(index, dtype=np.int32), mirror=np.asarray(mirror, dtype=np.float32).ravel(),
+                        start=start, day=day)
+    os.replace(tmp_path, path)
+#----------------------------------------------------------#
+
+#--- Function: Redraw a mirror chart from its saved arrays ---#
+def redraw_mirror(mirror_path, img_path, ticker):
+    if not os.path.exists(mirror_path):
+        return False
+    with np.load(mirror_path) as data:
+        plot_mirror(img_path, ticker, data['actual'], data['index'], data['mirror'], data['start'])
+    return True
+#-------------------------------------------------------------#
+
+
+#--- Entry point ---#
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Redraw mirror charts from saved arrays (no model needed).')
+    parser.add_argument('tickers', nargs='*', help='default: every saved mirror')
+    args = parser.parse_args(argv)
+
+    base = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static'))
+    mirror_dir = os.path.join(base, 'models', MIRROR_DIR)
+    tickers = args.tickers
+    if not tickers and os.path.isdir(mirror_dir):
+        tickers = sorted(name[:-4] for name in os.listdir(mirror_dir) if name.endswith('.npz'))
+    for ticker in tickers:
+        drawn = redraw_mirror(os.path.join(mirror_dir, f'{ticker}.npz'),
+                              os.path.join(base, 'images', f'{ticker}mirr.png'), ticker)
+        print(f"{ticker}: {'redrawn' if drawn else 'no saved mirror'}")
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+#-------------------#
@@ -0,0 +1,142 @@
+import os
+import csv
+import gzip
+import sys
+import time
+import sqlite3
+import argparse
+
+# Retention for the prediction table.
+# Finalized predictions (with an APE) made more than RETENTION_DAYS trading days ago are rolled into per-ticker totals in
+# prediction_summary (through_day, ape_sum, ape_count - all the MAPE needs), written to a gzipped
+# CSV under static/models/archive, and deleted from the hot table. Each ticker is its own short transaction
+# and the file is shrunk with incremental vacuum in small steps, so with WAL the web tier keeps
+# reading throughout. The hot table stays at about tickers x RETENTION_DAYS x 5 rows.
+#
+#   python -m model.compaction [--retention 500] [--dry-run] [--vacuum]
+
+RETENTION_DAYS = int(os.environ.get('FS_RETENTION_DAYS', 500))     # ~2 trading years
+VACUUM_STEP_PAGES = 500     # Pages freed per incremental_vacuum call
+VACUUM_PAUSE = 0.05         # Seconds between steps so readers/writers get the lock
+ARCHIVE_COLUMNS = ['from_day', 'for_day', 'predicted_price', 'actual_price', 'ape', 'buy']
+
+
+#--- Function: Open with WAL so readers aren't blocked by the compactor ---#
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+#--------------------------------------------------------------------------#
+
+#--- Function: Write one ticker's rows to a gzipped CSV ---#
+def _archive_rows(archive_dir, ticker, after_day, rows):
+    os.makedirs(archive_dir, exist_ok=True)
+    # Named by where the summary stood, not by the cutoff: until the delete commits, through_day
+    # doesn't move, so a rerun after a crash (even days later, with a later cutoff) rewrites this
+    # same file with a superset of its rows instead of archiving them a second time.
+    path = os.path.join(archive_dir, f'prediction-{ticker}-after-{after_day}.csv.gz')
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ARCHIVE_COLUMNS)
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+    return path
+#----------------------------------------------------------#
+
+#--- Function: Compact one ticker ---#
+def compact_ticker(conn, archive_dir, ticker, ticker_id, cutoff_day, dry_run=False):
+    """Roll finalized predictions made on or before cutoff_day into the summary. Returns rows removed."""
+    # Only rows with an APE: one still waiting for its actual price keeps waiting in the hot table
+    rows = conn.execute(f'''
+        SELECT {', '.join(ARCHIVE_COLUMNS)} FROM prediction
+        WHERE ticker_id = ? AND from_day <= ? AND ape IS NOT NULL
+        ORDER BY from_day, for_day''', (ticker_id, cutoff_day)).fetchall()
+    if not rows:
+        return 0
+    if dry_run:
+        print(f"\t{ticker}: would compact {len(rows)} finalized rows through day {cutoff_day}")
+        return len(rows)
+
+    # Archive first (atomically): if we die before the delete commits, the next run rewrites the same file
+    row = conn.execute('SELECT through_day FROM prediction_summary WHERE ticker_id = ?', (ticker_id,)).fetchone()
+    _archive_rows(archive_dir, ticker, row[0] if row else 0, rows)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('''
+            INSERT INTO prediction_summary (ticker_id, through_day, ape_sum, ape_count, rows_archived)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ticker_id) DO UPDATE SET
+                through_day = MAX(through_day, excluded.through_day),
+                ape_sum = ape_sum + excluded.ape_sum,
+                ape_count = ape_count + excluded.ape_count,
+                rows_archived = rows_archived + excluded.rows_archived''',
+            (ticker_id, cutoff_day, sum(r[4] for r in rows), len(rows), len(rows)))
+        conn.execute('''
+            DELETE FROM prediction
+            WHERE ticker_id = ? AND from_day <= ? AND ape IS NOT NULL''', (ticker_id, cutoff_day))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return len(rows)
+#------------------------------------#
+
+#--- Function: Give freed pages back to the filesystem, a little at a time ---#
+def reclaim_space(conn, full_vacuum=False):
+    mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    if mode != 2:
+        if not full_vacuum:
+            print("Freed pages will be reused; run with --vacuum once to enable incremental vacuum.")
+            return 0
+        # One-time switch; VACUUM rewrites the file, so do it off-hours
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        return 0
+    freed = 0
+    while True:
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if free_pages == 0:
+            return freed
+        conn.execute(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})')
+        freed += min(free_pages, VACUUM_STEP_PAGES)
+        time.sleep(VACUUM_PAUSE)
+#-----------------------------------------------------------------------------#
+
+#--- Function: Compact every ticker ---#
+def compact(db_path, archive_dir, retention_days=RETENTION_DAYS, dry_run=False, full_vacuum=False):
+    conn = _connect(db_path)
+    try:
+        today = conn.execute('SELECT MAX(day_num) FROM day').fetchone()[0] or 0
+        cutoff_day = today - retention_days
+        if cutoff_day <= 0:
+            print(f"Nothing to compact: {today} days of history, retention is {retention_days}.")
+            return 0
+        total = 0
+        for ticker, ticker_id in conn.execute('SELECT ticker, model_id FROM model ORDER BY model_id').fetchall():
+            total += compact_ticker(conn, archive_dir, ticker, ticker_id, cutoff_day, dry_run)
+        print(f"Compacted {total} prediction rows made on or before day {cutoff_day}.")
+        if not dry_run and (total or full_vacuum):
+            pages = reclaim_space(conn, full_vacuum)
+            if pages:
+                print(f"Reclaimed {pages} pages.")
+        return total
+    finally:
+        conn.close()
+#-------------------------------------#
+
+
+#--- Entry point ---#
+def main(argv=None):
+    from model.db_interface import DBInterface
+    parser = argparse.ArgumentParser(description='Compact old prediction rows into per-ticker summaries.')
+    parser.add_argument('--retention', type=int, default=RETENTION_DAYS, help='trading days kept in full')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--vacuum', action='store_true', help='one-time switch to incremental vacuum (rewrites the file)')
+    args = parser.parse_args(argv)
+    models_path = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static', 'models'))
+    DBInterface(models_path).compact(args.retention, args.dry_run, args.vacuum)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+#-------------------#
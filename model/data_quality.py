@@ -0,0 +1,150 @@
+import os
+import time
+import numpy as np
+
+# Price validation, run right after ingestion and before any training.
+# Every ticker's closes are laid out on one trading calendar (the dates at least half the
+# tickers have) as a [tickers, days] matrix, a block of tickers at a time, and checked with
+# whole-matrix NumPy operations:
+#   nan          rows whose close is missing
+#   gap          calendar days after a ticker's first close with no row (halts, stale data)
+#   nonpositive  zero or negative closes
+#   spike        a jump of more than MAX_JUMP that reverses the next day (a bad print)
+#   jump         any other move of more than MAX_JUMP; reported only, crashes are real
+# Then FS_DATA_QUALITY decides, per ticker:
+#   repair  forward-fill nan/gap/nonpositive/spike days, unless a hole is longer than
+#           MAX_GAP_DAYS or more than MAX_REPAIR_FRACTION of the history is bad: then skip
+#   skip    skip any ticker with a problem
+#   off     no checks
+# Skipped tickers are dropped from YFInterface with the reason, so the updater passes over
+# them before loading a model instead of failing halfway through a backfill.
+
+POLICY = os.environ.get('FS_DATA_QUALITY', 'repair')
+MAX_JUMP = float(os.environ.get('FS_MAX_JUMP', 0.5))   # 50% day-over-day
+MAX_GAP_DAYS = 5                # Longest run of missing/bad days forward-fill may cover
+MAX_REPAIR_FRACTION = 0.02      # Share of a history that may be repaired
+BLOCK_TICKERS = 256             # Tickers per matrix, bounds memory for large universes
+
+
+#--- Function: Trading calendar shared by the universe ---#
+def trading_calendar(series):
+    """Dates present for at least half of the tickers (so one stray row doesn't make everyone gappy)."""
+    all_dates = np.concatenate([dates for dates, _ in series.values()])
+    dates, counts = np.unique(all_dates, return_counts=True)
+    return dates[counts * 2 >= len(series)]
+#---------------------------------------------------------#
+
+#--- Function: Forward-fill along days ---#
+def _ffill(matrix, valid):
+    cols = np.arange(matrix.shape[1])
+    last = np.maximum.accumulate(np.where(valid, cols, -1), axis=1)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], np.maximum(last, 0)]
+    filled[last < 0] = np.nan     # Nothing to carry forward yet
+    return filled, last
+#-----------------------------------------#
+
+#--- Function: Check one block of tickers ---#
+def _check_block(tickers, series, calendar, policy):
+    n, days = len(tickers), len(calendar)
+    closes = np.full((n, days), np.nan)
+    present = np.zeros((n, days), dtype=bool)
+    for i, ticker in enumerate(tickers):
+        dates, values = series[ticker]
+        pos = np.searchsorted(calendar, dates)
+        on_calendar = pos < days
+        on_calendar[on_calendar] = calendar[pos[on_calendar]] == dates[on_calendar]
+        closes[i, pos[on_calendar]] = values[on_calendar]
+        present[i, pos[on_calendar]] = True
+
+    cols = np.arange(days)
+    first = np.where(present.any(axis=1), present.argmax(axis=1), days)
+    listed = cols >= first[:, None]
+    nan = present & np.isnan(closes)
+    with np.errstate(invalid='ignore'):
+        nonpositive = present & (closes <= 0)
+
+    # Day-over-day moves on the cleaned, forward-filled series
+    usable = present & ~nan & ~nonpositive
+    filled, _ = _ffill(closes, usable)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moves = np.log(filled[:, 1:] / filled[:, :-1])
+    big = np.abs(np.nan_to_num(moves)) > np.log1p(MAX_JUMP)
+    spike = np.zeros_like(present)
+    spike[:, 1:-1] = big[:, :-1] & big[:, 1:] & (np.sign(moves[:, :-1]) != np.sign(moves[:, 1:]))
+    spike &= usable
+    jump = big & ~spike[:, 1:] & ~spike[:, :-1]
+
+    # Everything forward-fill would have to cover, and the longest hole per ticker
+    good = usable & ~spike
+    missing = listed & ~good
+    repaired, last_good = _ffill(closes, good)
+    longest = np.where(missing, cols - last_good, 0).max(axis=1) if days else np.zeros(n, dtype=int)
+    n_listed = listed.sum(axis=1)
+
+    counts = {
+        'nan': nan.sum(axis=1), 'gap': (listed & ~present).sum(axis=1),
+        'nonpositive': nonpositive.sum(axis=1), 'spike': spike.sum(axis=1), 'jump': jump.sum(axis=1),
+    }
+    results = {}
+    for i, ticker in enumerate(tickers):
+        issues = {name: int(c[i]) for name, c in counts.items() if c[i]}
+        bad = int(missing[i].sum())
+        if first[i] == days:
+            action, reason = 'skip', 'no closes on the trading calendar'
+        elif not bad:
+            action, reason = 'ok', None
+        elif policy == 'skip':
+            action, reason = 'skip', f'{bad} bad or missing days'
+        elif longest[i] > MAX_GAP_DAYS:
+            action, reason = 'skip', f'{int(longest[i])} consecutive bad or missing days'
+        elif bad > MAX_REPAIR_FRACTION * n_listed[i]:
+            action, reason = 'skip', f'{bad} of {int(n_listed[i])} days bad or missing'
+        else:
+            action, reason = 'repair', None
+        result = {'action': action, 'issues': issues, 'reason': reason}
+        if action == 'repair':
+            row = repaired[i, first[i]:]
+            start = int(np.argmax(np.isfinite(row)))   # A bad first close can't be filled
+            result['series'] = (calendar[first[i] + start:], row[start:])
+        results[ticker] = result
+    return results
+#--------------------------------------------#
+
+#--- Function: Check many tickers ---#
+def check(series, policy=POLICY, calendar=None):
+    """series: {ticker: (dates, closes)} -> {ticker: {'action', 'issues', 'reason'[, 'series']}}."""
+    if not series:
+        return {}
+    if calendar is None:
+        calendar = trading_calendar(series)
+    tickers = list(series)
+    results = {}
+    for i in range(0, len(tickers), BLOCK_TICKERS):
+        results.update(_check_block(tickers[i:i + BLOCK_TICKERS], series, calendar, policy))
+    return results
+#------------------------------------#
+
+#--- Function: Check, then repair or drop tickers in a YFInterface ---#
+def validate(yf, tickers, policy=POLICY):
+    """Returns {ticker: result} for tickers that weren't clean."""
+    if policy == 'off':
+        return {}
+    start = time.perf_counter()
+    series = {t: yf.series(t) for t in tickers if yf.series(t) is not None}
+    results = check(series, policy)
+    flagged = {}
+    for ticker, result in results.items():
+        if result['action'] == 'repair':
+            yf.set_series(ticker, *result['series'])
+        elif result['action'] == 'skip':
+            yf.drop(ticker, f"data quality: {result['reason']}")
+        if result['issues']:
+            flagged[ticker] = result
+            print(f"\t{ticker}: {result['action']} {result['issues']}"
+                  + (f" ({result['reason']})" if result['reason'] else ''))
+    skipped = sum(r['action'] == 'skip' for r in results.values())
+    repaired = sum(r['action'] == 'repair' for r in results.values())
+    print(f"Data quality: {len(results)} tickers checked in {(time.perf_counter() - start) * 1000:.0f}ms, "
+          f"{repaired} repaired, {skipped} skipped.")
+    return flagged
+#---------------------------------------------------------------------#
@@ -1,7 +1,16 @@
 import sqlite3
 import os
+import time
+import json
 import numpy as np
-from keras.models import load_model
+from model import migrations
+
+# prediction/daily_accuracy are keyed by the ticker's integer model_id (see migration 11)
+_TICKER_ID = '(SELECT model_id FROM model WHERE ticker = ?)'
+# Job statuses that hold a ticker: its job runner owns the ticker until the job finishes (model/jobs.py)
+_CLAIMED_JOB = "('validating', 'training')"
+# Predictions are made for the next PREDICTION_HORIZON days, so for_day pins from_day to a short range
+PREDICTION_HORIZON = 5
 
 class DBInterface:
     """Database interface for managing LSTM models and predictions."""
@@ -30,70 +39,32 @@ class DBInterface:
 
     #--- Function: Create the database if needed ---#
     def _ensure_db_exists(self):
-        """Create the database file and base schema if missing."""
+        """Create the database file if missing and bring its schema up to date."""
         if not os.path.exists(self._db_path):
             print(f"[DBI] Database not found — creating {self._db_path}...")
-            conn = sqlite3.connect(self._db_path)
-
-            # TODO Create tables here, for example:
-            # cursor = conn.cursor()
-            # cursor.execute("""
-            #     CREATE TABLE IF NOT EXISTS models (
-            #         id INTEGER PRIMARY KEY AUTOINCREMENT,
-            #         stock_symbol TEXT NOT NULL,
-            #         model_data BLOB NOT NULL,
-            #         last_updated TEXT NOT NULL
-            #     );
-            # """)
-
-            # cursor.execute("""
-            #     CREATE TABLE IF NOT EXISTS predictions (
-            #         id INTEGER PRIMARY KEY AUTOINCREMENT,
-            #         stock_symbol TEXT NOT NULL,
-            #         predicted_price REAL NOT NULL,
-            #         actual_price REAL,
-            #         prediction_date TEXT NOT NULL
-            #     );
-            # """)
-
-            # Add other tables as needed
-            conn.commit()
-            conn.close()
+        # A single query when the schema is already current
+        migrations.migrate(self._db_path, verbose=False)
     #-----------------------------------------------#
 
 
-    #--- Function: Check if an updater is already running ---#
-    def is_updater_running(self):
-        """Check if a model has status in_progress."""
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(*) FROM model WHERE status = 'in_progress';
-        ''')
-        row = cursor.fetchone()
-        conn.close()
-        if row and row[0] > 0:
-            print(f"Found {row[0]} model(s) with status 'in_progress'.")
-            return True
-        else:
-            return False
-    #-----------------------------------------#
-
     #--- Function: Get first training day ---#
     def train_start_day(self, ticker):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
 
         # Left join to find the first day that predictions weren't made
-        cursor.execute('''
+        # (days rolled into prediction_summary by compaction count as done)
+        cursor.execute(f'''
             SELECT d.day_num
             FROM day d
             LEFT JOIN prediction p ON d.day_num = p.from_day
-                AND p.ticker = ?
+                AND p.ticker_id = {_TICKER_ID}
             WHERE p.from_day IS NULL
+                AND d.day_num > COALESCE((SELECT through_day FROM prediction_summary
+                                          WHERE ticker_id = {_TICKER_ID}), 0)
             ORDER BY d.day_num ASC
             LIMIT 1;
-        ''', (ticker,))
+        ''', (ticker, ticker))
         row = cursor.fetchone()
         conn.close()
         if row:
@@ -105,12 +76,57 @@ class DBInterface:
     #--- Function: Get path to LSTM file ---#
     def get_lstm_path(self, ticker):
         return os.path.join(self._lstm_path, ticker + '.keras')
+
+    #--- Function: Saved arrays behind the mirror chart (model/charts.py) ---#
+    def get_mirror_path(self, ticker):
+        from model.charts import MIRROR_DIR
+        return os.path.join(self._lstm_path, MIRROR_DIR, ticker + '.npz')
+    #------------------------------------------------------------------------#
     
+    #--- Function: Write the Keras file without ever leaving a partial one ---#
+    def _save_lstm_file(self, ticker, model):
+        if getattr(model._model, 'shared', False):
+            return  # Global-model view: the shared weights are saved once by the updater
+        path = self.get_lstm_path(ticker)
+        tmp_path = os.path.join(self._lstm_path, f'.{ticker}.tmp.keras')  # Keras wants a .keras suffix
+        model._model.save(tmp_path)
+        os.replace(tmp_path, path)
+    #-------------------------------------------------------------------------#
+
+    #--- Function: Save a resumable training checkpoint ---#
+    def save_checkpoint(self, ticker, model, day):
+        """Persist weights, then record the day they are good through."""
+        # File first: if we die in between, the DB still points at an older (safe) day
+        self._save_lstm_file(ticker, model)
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE model
+            SET checkpoint_day = ?
+            WHERE ticker = ?''',
+            (day, ticker))
+        conn.commit()
+        conn.close()
+    #------------------------------------------------------#
+
+    #--- Function: Get the last checkpointed day ---#
+    def get_checkpoint_day(self, ticker):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT checkpoint_day FROM model WHERE ticker = ?', (ticker,))
+        row = cursor.fetchone()
+        conn.close()
+        if row:
+            return row[0]
+        return None
+    #-----------------------------------------------#
+
     #--- Function: Save model to DB ---#
-    def save_model(self, ticker, model, last_update=None, result='', status='completed'):
+    def save_model(self, ticker, model, last_update=None, result='', status='completed', checkpoint_day=None):
         # Save model as file
-        path = self.get_lstm_path(ticker)
-        model._model.save(path)
+        self._save_lstm_file(ticker, model)
+        if isinstance(result, np.generic):
+            result = result.item()  # sqlite3 binds numpy scalars that aren't float subclasses as BLOBs
 
         # Database connection
         conn = sqlite3.connect(self._db_path)
@@ -133,9 +149,10 @@ class DBInterface:
 
         cursor.execute('''
             UPDATE model
-            SET result=?, last_update=?, status=?, version=COALESCE(version, 0) + 1
+            SET result=?, last_update=?, status=?, version=COALESCE(version, 0) + 1,
+                checkpoint_day=COALESCE(?, checkpoint_day)
             WHERE ticker=?
-        ''', (result, last_update, status, ticker))
+        ''', (result, last_update, status, checkpoint_day, ticker))
 
         if cursor.rowcount == 0:  # no row updated, so insert new one
             # Store the model in the database
@@ -166,10 +183,15 @@ class DBInterface:
         path = self.get_lstm_path(ticker)
         if not os.path.exists(path):
             raise FileNotFoundError(f"Model file not found at {path}")
+        from keras.models import load_model    # Keep Keras out of the web tier's imports
         model = load_model(path, compile=False)
         model.compile(optimizer='adam', loss='mean_squared_error')
+        result, last_update, status = self.get_model_state(ticker)
+        return model, result, last_update, status
+    #------------------------------#
 
-        # Get model data from the database
+    #--- Function: Get a model's saved state without its Keras file ---#
+    def get_model_state(self, ticker):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
         cursor.execute('''
@@ -183,13 +205,47 @@ class DBInterface:
         if row:
             result, last_update, status = row
             print("Loaded data for ticker: ", ticker)
-            # print("\nLoaded data! Ticker:\t", ticker,
-            #     "\nModel:\t\t", model, "\nLast Update:\t", last_update,
-            #     "\nResult:\t\t", result, "\nStatus:\t\t", status)
-            return model, result, last_update, status
+            return result, last_update, status
         else:
             raise ValueError("Model could not be found in the database.")
-    #------------------------------#
+    #------------------------------------------------------------------#
+
+    #--- Function: Integer ids for the global model's ticker embedding ---#
+    def get_ticker_ids(self, tickers=None):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT ticker, model_id FROM model')
+        rows = cursor.fetchall()
+        conn.close()
+        ids = dict(rows)
+        if tickers is not None:
+            ids = {t: ids[t] for t in tickers if t in ids}
+        return ids
+    #---------------------------------------------------------------------#
+
+    #--- Function: Get model rows without loading any Keras files ---#
+    def get_model_rows(self, tickers=None):
+        """Return {ticker: row dict} for the given tickers (or all) from one query."""
+        columns = ['ticker', 'result', 'status', 'last_update', 'mape', 'buy_acc', 'balance', 'version']
+        query = f"SELECT {', '.join(columns)} FROM model"
+        params = ()
+        # SQLite caps bound parameters, so big lists just scan the (small) model table
+        if tickers is not None and len(tickers) <= 500:
+            query += f" WHERE ticker IN ({', '.join('?' * len(tickers))})"
+            params = tuple(tickers)
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute(query + ' ORDER BY ticker', params)
+        rows = cursor.fetchall()
+        conn.close()
+
+        wanted = set(tickers) if tickers is not None else None
+        models = {}
+        for row in rows:
+            if wanted is None or row[0] in wanted:
+                models[row[0]] = dict(zip(columns, row))
+        return models
+    #-----------------------------------------------------------------#
 
     #--- Function: Get all the tickers in db ---#
     def get_tickers(self):
@@ -231,44 +287,16 @@ class DBInterface:
             raise ValueError("Ticker not found in the database.")
     #-----------------------------------#
 
-    #--- Function: Save Day to DB ---#
-    def _save_day(self, day_num, day_string):
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-
-        # Insert or update the day data
-        cursor.execute('''
-            INSERT INTO day (day_num, date)
-            VALUES (?, ?)''',
-            (day_num, day_string,))
-        conn.commit()
-        conn.close()
-    #--------------------------------#
-
     #--- Function: Save Prediction to DB ---#
     def save_prediction(self, ticker, from_day, for_day, predicted_price, buy):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prediction (
-                predict_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticker TEXT NOT NULL,
-                from_day INTEGER NOT NULL,
-                for_day INTEGER NOT NULL,
-                predicted_price REAL NOT NULL,
-                actual_price REAL,
-                ape REAL,
-                buy BOOLEAN,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(ticker, from_day, for_day)
-            );
-        ''')
 
         # Insert or update the prediction data
-        cursor.execute('''
-            INSERT OR REPLACE INTO prediction (ticker, from_day, for_day, predicted_price, actual_price, buy)
-            VALUES (?, ?, ?, ?, ?, ?)''',
-            (ticker, from_day, for_day, predicted_price, None, buy))
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO prediction (ticker_id, from_day, for_day, predicted_price, actual_price, buy)
+            VALUES ({_TICKER_ID}, ?, ?, ?, ?, ?)''',
+            (ticker, from_day, for_day, predicted_price, None, int(buy)))
         conn.commit()
         conn.close()
     #---------------------------------------#
@@ -277,26 +305,27 @@ class DBInterface:
     def get_predictions(self, ticker, end_day):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT predict_id,
-                from_day,
+        # The from_day range keeps this a seek on the (ticker_id, from_day, for_day) key
+        cursor.execute(f'''
+            SELECT from_day,
                 for_day,
                 predicted_price,
                 actual_price,
                 ape,
                 buy
             FROM prediction
-            WHERE ticker = ?
+            WHERE ticker_id = {_TICKER_ID}
+                AND from_day BETWEEN ? AND ?
                 AND for_day = ?
-            ORDER BY for_day ASC
-        ''', (ticker, end_day))
+            ORDER BY from_day ASC
+        ''', (ticker, end_day - PREDICTION_HORIZON, end_day - 1, end_day))
         rows = cursor.fetchall()
         conn.close()
 
         # Return as data frame
         if rows:
             import pandas as pd
-            predictions = pd.DataFrame(rows, columns=['predict_id', 'from_day', 'for_day',
+            predictions = pd.DataFrame(rows, columns=['from_day', 'for_day',
                     'predicted_price', 'actual_price', 'ape', 'buy'])
             return predictions            
         else:
@@ -305,12 +334,13 @@ class DBInterface:
 
     #--- Function: Get APEs from DB ---#
     def get_apes(self, ticker, up_to_day):
+        """APEs still in the hot table; compacted history is only in get_ape_stats()."""
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT ape FROM prediction
-            WHERE ticker = ? AND for_day <= ? AND ape IS NOT NULL
-        ''', (ticker, up_to_day))
+            WHERE ticker_id = {_TICKER_ID} AND from_day < ? AND for_day <= ? AND ape IS NOT NULL
+        ''', (ticker, up_to_day, up_to_day))
         rows = cursor.fetchall()
         conn.close()
 
@@ -320,6 +350,215 @@ class DBInterface:
             return []  # No APEs found
     #---------------------------------------#
 
+    #--- Function: Sum and count of APEs, including compacted history ---#
+    def get_ape_stats(self, ticker, up_to_day):
+        """Return (ape_sum, ape_count) of finalized predictions for days up to up_to_day."""
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        # Live rows only past the summary's through_day, so no prediction is counted twice
+        cursor.execute(f'''
+            SELECT COALESCE(SUM(ape), 0), COUNT(ape) FROM prediction
+            WHERE ticker_id = {_TICKER_ID} AND ape IS NOT NULL
+                AND from_day > COALESCE((SELECT through_day FROM prediction_summary
+                                         WHERE ticker_id = {_TICKER_ID}), 0)
+                AND from_day < ? AND for_day <= ?
+        ''', (ticker, ticker, up_to_day, up_to_day))
+        ape_sum, ape_count = cursor.fetchone()
+        # Compacted days only survive as totals; they are all long before any day being scored
+        cursor.execute(f'''
+            SELECT ape_sum, ape_count FROM prediction_summary
+            WHERE ticker_id = {_TICKER_ID}
+        ''', (ticker,))
+        row = cursor.fetchone()
+        conn.close()
+        if row:
+            ape_sum += row[0]
+            ape_count += row[1]
+        return ape_sum, ape_count
+    #--------------------------------------------------------------------#
+
+    #--- Function: Get recent finalized APEs ---#
+    def get_recent_apes(self, ticker, after_day):
+        """APEs of predictions for days after after_day that already have an actual price."""
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT ape FROM prediction
+            WHERE ticker_id = {_TICKER_ID} AND from_day >= ? AND for_day > ? AND ape IS NOT NULL
+        ''', (ticker, after_day - PREDICTION_HORIZON + 1, after_day))
+        rows = cursor.fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+    #-------------------------------------------#
+
+    #--- Function: One page of a ticker's prediction history ---#
+    def get_prediction_history(self, ticker, start_day=None, end_day=None, after=None, limit=500):
+        """Predictions made from start_day to end_day, in (from_day, for_day) order.
+
+        Keyset pagination: `after` is the (from_day, for_day) of the last row already seen.
+        The seek starts at the cursor on the primary key, so deep pages cost the same as the
+        first. Returns (rows, next_cursor, archived_through); next_cursor is None on the last page.
+        """
+        low = start_day if start_day is not None else 0
+        high = end_day if end_day is not None else 2**31
+        after = after or (low - 1, 0)
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        # max(low, cursor's from_day) is the seek; the row value only trims that one from_day
+        cursor.execute(f'''
+            SELECT from_day, for_day, predicted_price, actual_price, ape
+            FROM prediction
+            WHERE ticker_id = {_TICKER_ID}
+                AND from_day BETWEEN ? AND ?
+                AND (from_day, for_day) > (?, ?)
+            ORDER BY from_day, for_day
+            LIMIT ?
+        ''', (ticker, max(low, after[0]), high, after[0], after[1], limit + 1))
+        rows = cursor.fetchall()
+        cursor.execute(f'SELECT through_day FROM prediction_summary WHERE ticker_id = {_TICKER_ID}', (ticker,))
+        summary = cursor.fetchone()
+        conn.close()
+        next_cursor = rows[limit - 1][:2] if len(rows) > limit else None
+        return rows[:limit], next_cursor, summary[0] if summary else None
+    #-----------------------------------------------------------#
+
+    #--- Function: Record the training policy's decision ---#
+    def save_train_decision(self, ticker, day, decision):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO train_decision (ticker, day, mode, epochs, recent_ape, baseline_ape, reason)
+            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (ticker, day, decision.mode, decision.epochs, decision.recent_ape, decision.baseline_ape, decision.reason))
+        conn.commit()
+        conn.close()
+    #-------------------------------------------------------#
+
+    #--- Function: Record how much training a day actually took ---#
+    def save_train_log(self, ticker, day, epochs_planned, epochs_spent, train_loss, val_loss, seconds,
+                       full_history=False):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO train_log
+                (ticker, day, epochs_planned, epochs_spent, train_loss, val_loss, seconds, full_history)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            (ticker, day, epochs_planned, epochs_spent, train_loss, val_loss, seconds, int(full_history)))
+        conn.commit()
+        conn.close()
+    #---------------------------------------------------------------#
+
+    #--- Function: Last day trained on the full history ---#
+    def get_last_full_day(self, ticker):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT MAX(day) FROM train_log
+            WHERE ticker = ? AND full_history = 1''',
+            (ticker,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    #------------------------------------------------------#
+
+    #--- Function: Total epochs planned vs. spent ---#
+    def get_epoch_totals(self, ticker=None):
+        """Return {ticker: (epochs_planned, epochs_spent, seconds)} from the train log."""
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        query = '''
+            SELECT ticker, SUM(epochs_planned), SUM(epochs_spent), SUM(seconds)
+            FROM train_log'''
+        params = ()
+        if ticker is not None:
+            query += ' WHERE ticker = ?'
+            params = (ticker,)
+        cursor.execute(query + ' GROUP BY ticker', params)
+        rows = cursor.fetchall()
+        conn.close()
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+    #------------------------------------------------#
+
+    #--- Function: Save a ticker's searched hyperparameters ---#
+    def save_hparams(self, ticker, hparams):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('UPDATE model SET hparams = ? WHERE ticker = ?',
+                       (json.dumps(hparams, sort_keys=True) if hparams else None, ticker))
+        conn.commit()
+        conn.close()
+    #----------------------------------------------------------#
+
+    #--- Function: Get a ticker's hyperparameters (None means defaults) ---#
+    def get_hparams(self, ticker):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT hparams FROM model WHERE ticker = ?', (ticker,))
+        row = cursor.fetchone()
+        conn.close()
+        if row and row[0]:
+            return json.loads(row[0])
+        return None
+    #----------------------------------------------------------------------#
+
+    #--- Function: Record which model a new ticker was warm-started from ---#
+    def save_donor(self, ticker, donor):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('UPDATE model SET donor = ?, epochs_saved = NULL WHERE ticker = ?', (donor, ticker))
+        conn.commit()
+        conn.close()
+    #-----------------------------------------------------------------------#
+
+    #--- Function: Get a ticker's warm-start donor (None if cold-started) ---#
+    def get_donor(self, ticker):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT donor FROM model WHERE ticker = ?', (ticker,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    #------------------------------------------------------------------------#
+
+    #--- Function: Epochs a warm start saved over the cold-start budget ---#
+    def save_epochs_saved(self, ticker, cold_epochs):
+        """Call after initial training: epochs a measured cold start spends for the days trained,
+        minus epochs actually run. Cold starts stop early too, so the baseline is what cold-started
+        tickers really spent per day at the cold budget; with no such runs yet it stays NULL."""
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE model
+            SET epochs_saved = (
+                SELECT CAST(ROUND(COUNT(*) * (
+                    SELECT AVG(l.epochs_spent) FROM train_log l JOIN model m ON m.ticker = l.ticker
+                    WHERE m.donor IS NULL AND l.epochs_planned = ?) - COALESCE(SUM(epochs_spent), 0)) AS INTEGER)
+                FROM train_log WHERE ticker = ?)
+            WHERE ticker = ? AND donor IS NOT NULL AND epochs_saved IS NULL''',
+            (cold_epochs, ticker, ticker))
+        conn.commit()
+        conn.close()
+    #--------------------------------------------------------------------#
+
+    #--- Function: Count trailing 'skip' decisions ---#
+    def consecutive_skips(self, ticker, limit=30):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT mode FROM train_decision
+            WHERE ticker = ?
+            ORDER BY day DESC LIMIT ?''',
+            (ticker, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        count = 0
+        for (mode,) in rows:
+            if mode != 'skip':
+                break
+            count += 1
+        return count
+    #-------------------------------------------------#
+
     #--- Function: Update the Actual Price ---#
     def save_actual_price(self, ticker, for_day, price):
         """Update the actual price in prediction table for a given ticker and day."""
@@ -327,11 +566,11 @@ class DBInterface:
             raise ValueError(f"Price for {ticker} on day {for_day} is NaN, cannot save actual price.")
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             UPDATE prediction
             SET actual_price = ?
-            WHERE ticker = ? AND for_day = ?''',
-            (price, ticker, for_day))
+            WHERE ticker_id = {_TICKER_ID} AND from_day BETWEEN ? AND ? AND for_day = ?''',
+            (price, ticker, for_day - PREDICTION_HORIZON, for_day - 1, for_day))
         conn.commit()
         if cursor.rowcount == 0 and for_day > 1:
             print(f"Warning: No prediction found for {ticker} on day {for_day}. Actual price not updated.")
@@ -347,8 +586,9 @@ class DBInterface:
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT ticker, for_day FROM prediction
-            WHERE actual_price IS NULL AND for_day < ?''',
+            SELECT m.ticker, p.for_day
+            FROM prediction p JOIN model m ON m.model_id = p.ticker_id
+            WHERE p.actual_price IS NULL AND p.for_day < ?''',
             (today,))
         rows = cursor.fetchall()
         conn.close()
@@ -365,10 +605,10 @@ class DBInterface:
     def get_buy_accuracy(self, ticker):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT MAX(buy_accuracy)
             FROM daily_accuracy
-            WHERE ticker = ?''',
+            WHERE ticker_id = {_TICKER_ID}''',
             (ticker,))
         row = cursor.fetchall()
         conn.close()
@@ -383,9 +623,9 @@ class DBInterface:
     def get_mape(self, ticker, day):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT mape FROM daily_accuracy
-            WHERE ticker = ?
+            WHERE ticker_id = {_TICKER_ID}
                 AND day = ?''',
             (ticker, day))
         rows = cursor.fetchall()
@@ -400,9 +640,9 @@ class DBInterface:
     def get_simulated_profit(self, ticker, day):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT simulated_profit FROM daily_accuracy
-            WHERE ticker = ? AND day = ?''',
+            WHERE ticker_id = {_TICKER_ID} AND day = ?''',
             (ticker, day))
         row = cursor.fetchone()
         conn.close()
@@ -416,22 +656,11 @@ class DBInterface:
     def save_accuracy(self, ticker, day, ape, mape, buy_accuracy, simulated_profit):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS daily_accuracy (
-            dailyacc_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticker TEXT NOT NULL,
-            day INTEGER NOT NULL,
-            mape REAL,
-            buy_accuracy INTEGER,
-            simulated_profit REAL,
-            UNIQUE(ticker, day)
-        )
-        ''')
 
         # Insert or update the accuracy data
-        cursor.execute('''
-            INSERT OR REPLACE INTO daily_accuracy (ticker, day, mape, buy_accuracy, simulated_profit)
-            VALUES (?, ?, ?, ?, ?)''',
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO daily_accuracy (ticker_id, day, mape, buy_accuracy, simulated_profit)
+            VALUES ({_TICKER_ID}, ?, ?, ?, ?)''',
             (ticker, day, mape, buy_accuracy, simulated_profit))
         
         conn.commit()
@@ -439,14 +668,14 @@ class DBInterface:
     #---------------------------------------#
 
     #-- Function: Save APE for each prediction ---#
-    def save_ape(self, id, ape):
+    def save_ape(self, ticker, from_day, for_day, ape):
         conn = sqlite3.connect(self._db_path)
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             UPDATE prediction
             SET ape = ?
-            WHERE predict_id = ?''',
-            (ape, id))
+            WHERE ticker_id = {_TICKER_ID} AND from_day = ? AND for_day = ?''',
+            (ape, ticker, from_day, for_day))
         conn.commit()
         conn.close()
     #---------------------------------------#
@@ -458,9 +687,9 @@ class DBInterface:
         cursor = conn.cursor()
         for ticker in tickers:
             # Most of the time, only today's entry will be missing
-            cursor.execute('''
+            cursor.execute(f'''
                     SELECT COUNT(*) FROM daily_accuracy
-                    WHERE ticker = ?''',
+                    WHERE ticker_id = {_TICKER_ID}''',
                     (ticker,))
             count = cursor.fetchone()[0]
             if count < today:
@@ -468,16 +697,16 @@ class DBInterface:
                 print(f"Ticker {ticker} has {count} entries, expected {today}. Adding days in daily_acc...", end=' ')
                 for day in range(1, today+1): # from day 1 to today
                     # Check if it's already in the database
-                    cursor.execute('''
+                    cursor.execute(f'''
                         SELECT COUNT(*) FROM daily_accuracy
-                        WHERE ticker = ? AND day = ?''',
+                        WHERE ticker_id = {_TICKER_ID} AND day = ?''',
                         (ticker, day))
                     count = cursor.fetchone()[0]
                     if count == 0:
                         # Insert the missing day with NULL values
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO daily_accuracy (ticker, day)
-                            VALUES (?, ?)''',
+                        cursor.execute(f'''
+                            INSERT OR IGNORE INTO daily_accuracy (ticker_id, day)
+                            VALUES ({_TICKER_ID}, ?)''',
                             (ticker, day))
                         conn.commit()
                 print("done.")
@@ -489,10 +718,10 @@ class DBInterface:
         cursor = conn.cursor()
 
         # Return all entries with NULL values
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT day FROM daily_accuracy
             WHERE simulated_profit IS NULL
-                AND ticker = ?''', 
+                AND ticker_id = {_TICKER_ID}''',
             (ticker,))
         row = cursor.fetchall()
         conn.close()
@@ -500,90 +729,52 @@ class DBInterface:
             return [r[0] for r in row]  # Return list of days with NULL entries
     #---------------------------------------#
     
+    #--- Function: In-memory trading calendar (model/trading_calendar.py) ---#
+    def calendar(self):
+        from model import trading_calendar
+        return trading_calendar.for_db(self._db_path)
+    #-------------------------------------------------------------------------#
+
     #--- Function: Get the integer ID of the day ---#
     def get_day_num(self, target):
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT day_num FROM day WHERE date = ?''',
-            (target,))
-        row = cursor.fetchone()
+        day_num = self.calendar().day_num(target)
+        if day_num is not None:
+            return day_num  # Return the day_num
 
-        if row:
-            conn.close()
-            return row[0]  # Return the day_num
-        
         # If the day does not exist, try to update the table with all dates
-        else:
-            if self._all_dates is None:
-                raise ValueError("Day not found in the database. You may need to populate dates.")
-            self.populate_dates(self._all_dates)
-            cursor.execute('''
-                SELECT day_num FROM day WHERE date = ?''',
-                (target,))
-            row = cursor.fetchone()
-            conn.close()
-            if row:
-                return row[0]  # Return the day_num
-            else:
-                return -1  # If still not found, return -1
+        if self._all_dates is None:
+            raise ValueError("Day not found in the database. You may need to populate dates.")
+        self.populate_dates(self._all_dates)
+        day_num = self.calendar().day_num(target)
+        return day_num if day_num is not None else -1  # If still not found, return -1
     #--------------------------------#
 
     #--- Function: Get today's day num ---#
     def today_num(self):
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT day_num FROM day ORDER BY day_num DESC LIMIT 1')
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return row[0]
-        else:
-            # If no days exist, return -1
-            return -1
+        return self.calendar().today()  # -1 if no days exist
     #--------------------------------#
 
     #--- Function: Get string from day num ---#
     def get_day_string(self, day_num):
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT date FROM day WHERE day_num = ?', (day_num,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return row[0]
-        else:
-            ""
+        return self.calendar().date(day_num) or ""
     #--------------------------------#
 
     #--- Function: Get all dates in the database ---#
     def all_dates(self):
-        """Get the total number of days in the database."""
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT date FROM day')
-        row = cursor.fetchall()
-        conn.close()
-        if row:
-            row = [r[0] for r in row]  # Extract the date strings from the tuples
-            return row
-        else:
+        """Every trading date, in day order."""
+        dates = self.calendar().dates()
+        if not dates:
             raise ValueError("No days found in the database.")
+        return dates
     #----------------------------------------------#
 
     #--- Function: Get all days in the database ---#
-    def all_days (self):
-        """Get the total number of days in the database."""
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT day_num FROM day')
-        row = cursor.fetchall()
-        conn.close()
-        if row:
-            row = [r[0] for r in row]  # Extract the date strings from the tuples
-            return row
-        else:
+    def all_days(self):
+        """Every day_num, in order."""
+        days = self.calendar().days()
+        if not days:
             raise ValueError("No days found in the database.")
+        return days
     #----------------------------------------------#
 
 
@@ -591,28 +782,30 @@ class DBInterface:
     def populate_dates(self, dates):
         """Populate the database with all dates since the last recorded date."""
         self._all_dates = dates
-        conn = sqlite3.connect(self._db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS day (
-                day_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                day_num INTEGER,
-                date TEXT
-            );''')
-        conn.commit()
+        calendar = self.calendar()
+        calendar.refresh()  # Another process may have added days since we last looked
 
-        # Get the last day recorded in the database
-        today = self.get_day_string(self.today_num())
+        # Day numbers start at 1 and follow the position in `dates` (which starts at a fixed date)
         index = 0
-
-        # Check if we've already added dates
-        if today != "" and today in dates:
-            # find position of 'today' in the list
+        today = calendar.date(calendar.today())
+        if today is not None and today in dates:
             index = dates.index(today) + 1  # Start from the next day
-        
-        for date in dates[index:]:
-            day_num = dates.index(date) + 1  # Day numbers start at 1
-            self._save_day(day_num, date)
+        rows = [(i + 1, dates[i]) for i in range(index, len(dates))]
+        if not rows:
+            return
+
+        # One transaction for the whole backlog of days
+        conn = sqlite3.connect(self._db_path)
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS day (
+                    day_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    day_num INTEGER,
+                    date TEXT
+                );''')
+            conn.executemany('INSERT INTO day (day_num, date) VALUES (?, ?)', rows)
+        conn.close()
+        calendar.extend(rows)
     #-----------------------------------------------#
 
     #--- Function: Wrap-up updater process ---#
@@ -637,6 +830,227 @@ class DBInterface:
         return erroneous_tickers
     #-----------------------------------------#
 
+    #--- Function: Add a ticker that hasn't been trained yet ---#
+    def add_ticker(self, ticker):
+        """Insert a model row with status 'new'. Returns False if it already exists."""
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO model (ticker, status)
+            VALUES (?, 'new')''',
+            (ticker,))
+        conn.commit()
+        added = cursor.rowcount > 0
+        conn.close()
+        return added
+    #----------------------------------------------------------#
+
+    #--- Function: Queue a background job unless the ticker already has one ---#
+    def enqueue_job(self, ticker, kind, max_pending):
+        """Returns (job_id, created). Raises RuntimeError when max_pending jobs are unfinished."""
+        conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+        try:
+            # BEGIN IMMEDIATE: two web workers can't both queue the same ticker or overfill the queue
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT job_id FROM job
+                WHERE ticker = ? AND status NOT IN ('completed', 'failed')
+                ORDER BY job_id DESC LIMIT 1''',
+                (ticker,)).fetchone()
+            if row:
+                return row[0], False
+            pending = conn.execute("SELECT COUNT(*) FROM job WHERE status NOT IN ('completed', 'failed')").fetchone()[0]
+            if pending >= max_pending:
+                raise RuntimeError('Too many tickers are already queued, please try again later.')
+            cursor = conn.execute('''
+                INSERT INTO job (ticker, kind, status, message)
+                VALUES (?, ?, 'queued', 'Waiting for the job runner...')''',
+                (ticker, kind))
+            conn.execute('COMMIT')
+            return cursor.lastrowid, True
+        finally:
+            conn.close()    # Rolls back anything left uncommitted
+    #---------------------------------------------------------------------------#
+
+    #--- Function: Oldest queued jobs ---#
+    def queued_jobs(self, limit):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT job_id, ticker FROM job
+            WHERE status = 'queued'
+            ORDER BY job_id LIMIT ?''',
+            (limit,))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    #------------------------------------#
+
+    #--- Function: Claim a queued job for the job runner ---#
+    def claim_job(self, job_id):
+        """Move a queued job to 'validating'. False if it's gone or the updater is training its ticker."""
+        conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')     # Serialized with DBInterface.claim_ticker
+            row = conn.execute("SELECT ticker FROM job WHERE job_id = ? AND status = 'queued'",
+                               (job_id,)).fetchone()
+            if row is None:
+                return False
+            busy = conn.execute("SELECT 1 FROM model WHERE ticker = ? AND status = 'in_progress'",
+                                (row[0],)).fetchone()
+            if busy:
+                return False    # The updater holds it; the job stays queued
+            conn.execute('''
+                UPDATE job
+                SET status = 'validating', message = 'Checking symbol with the price source...',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ?''',
+                (job_id,))
+            conn.execute('COMMIT')
+            return True
+        finally:
+            conn.close()
+    #-------------------------------------------------------#
+
+    #--- Function: Claim a ticker for the updater ---#
+    def claim_ticker(self, ticker):
+        """Set the ticker in_progress and return its previous status, or None if a job holds it."""
+        conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')     # Serialized with DBInterface.claim_job
+            held = conn.execute(f"SELECT 1 FROM job WHERE ticker = ? AND status IN {_CLAIMED_JOB}",
+                                (ticker,)).fetchone()
+            if held:
+                return None
+            row = conn.execute('SELECT status FROM model WHERE ticker = ?', (ticker,)).fetchone()
+            conn.execute("UPDATE model SET status = 'in_progress' WHERE ticker = ?", (ticker,))
+            conn.execute('COMMIT')
+            return row[0] if row else None
+        finally:
+            conn.close()
+    #------------------------------------------------#
+
+    #--- Function: Release tickers left in_progress by a killed updater ---#
+    def reset_in_progress(self):
+        """Tickers held by a running job keep their status; returns how many were reset."""
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            UPDATE model
+            SET status = 'completed'
+            WHERE status = 'in_progress'
+                AND ticker NOT IN (SELECT ticker FROM job WHERE status IN {_CLAIMED_JOB})''')
+        conn.commit()
+        count = cursor.rowcount
+        conn.close()
+        return count
+    #----------------------------------------------------------------------#
+
+    #--- Function: Update a job's status/progress ---#
+    def update_job(self, job_id, status=None, progress=None, message=None):
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE job
+            SET status = COALESCE(?, status),
+                progress = COALESCE(?, progress),
+                message = COALESCE(?, message),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ?''',
+            (status, progress, message, job_id))
+        conn.commit()
+        conn.close()
+    #------------------------------------------------#
+
+    #--- Function: Get a job ---#
+    def get_job(self, job_id):
+        columns = ['job_id', 'ticker', 'kind', 'status', 'progress', 'message', 'created_at', 'updated_at']
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM job WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+        except sqlite3.OperationalError:
+            row = None  # No job table yet
+        conn.close()
+        if row:
+            return dict(zip(columns, row))
+        return None
+    #---------------------------#
+
+    #--- Function: Fail jobs orphaned by a job runner restart ---#
+    def fail_stale_jobs(self):
+        """Only call while holding the job runner lock: claimed jobs then belong to a dead runner.
+        Their tickers go back to 'new' for the updater; queued jobs are left for the new runner."""
+        conn = sqlite3.connect(self._db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            UPDATE model
+            SET status = 'new'
+            WHERE status = 'in_progress'
+                AND ticker IN (SELECT ticker FROM job WHERE status IN {_CLAIMED_JOB})''')
+        cursor.execute(f'''
+            UPDATE job
+            SET status = 'failed', message = 'Interrupted by a restart.', updated_at = CURRENT_TIMESTAMP
+            WHERE status IN {_CLAIMED_JOB}''')
+        conn.commit()
+        count = cursor.rowcount
+        conn.close()
+        return count
+    #-------------------------------------------------#
+
+    #--- Function: Path of a process lock file (held with fcntl.flock) ---#
+    def lock_path(self, name):
+        return os.path.join(self._lstm_path, name + '.lock')
+    #---------------------------------------------------------------------#
+
+    #--- Function: Path of the 'new results published' marker ---#
+    def published_marker_path(self):
+        return os.path.join(self._lstm_path, 'published')
+    #------------------------------------------------------------#
+
+    #--- Function: Path of the web tier's read-only snapshot ---#
+    def snapshot_path(self):
+        from model.snapshot import SNAPSHOT_FILE
+        return os.path.join(self._lstm_path, SNAPSHOT_FILE)
+    #-----------------------------------------------------------#
+
+    #--- Function: Publish model rows and charts to the snapshot (model/snapshot.py) ---#
+    def publish_snapshot(self, img_path=None):
+        from model import snapshot
+        if img_path is None:
+            img_path = os.path.join(os.path.dirname(os.path.normpath(self._lstm_path)), 'images')
+        return snapshot.publish(self._db_path, self.snapshot_path(), img_path)
+    #-----------------------------------------------------------------------------------#
+
+    #--- Function: Roll old predictions into summaries (model/compaction.py) ---#
+    def compact(self, retention_days=None, dry_run=False, full_vacuum=False):
+        from model import compaction
+        if retention_days is None:
+            retention_days = compaction.RETENTION_DAYS
+        return compaction.compact(self._db_path, os.path.join(self._lstm_path, 'archive'),
+                                  retention_days, dry_run, full_vacuum)
+    #---------------------------------------------------------------------------#
+
+    #--- Function: Backtest trading strategies over the stored predictions (model/backtest.py) ---#
+    def backtest(self, tickers=None, thresholds=None, horizons=None, cost_bps=0.0, top=None):
+        from model import backtest
+        return backtest.backtest(self._db_path, tickers, thresholds or backtest.THRESHOLDS,
+                                 horizons or backtest.HORIZONS, cost_bps, top)
+    #---------------------------------------------------------------------------------------------#
+
+    #--- Function: Tell the web tier new results are ready ---#
+    def mark_published(self):
+        """Publish a fresh snapshot, then atomically rewrite the marker file servers watch to reload.
+        Reloads every worker, so it's for the end of an updater run; jobs only call publish_snapshot()."""
+        self.publish_snapshot()
+        path = self.published_marker_path()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(time.time()))
+        os.replace(tmp_path, path)
+    #---------------------------------------------------------#
+
     #--- Function: Perform Some Update ---#
     def do_update(self, instructions):
         conn = sqlite3.connect(self._db_path)
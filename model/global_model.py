@@ -0,0 +1,165 @@
+import os
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from keras.models import Model as KerasModel, load_model
+from keras.layers import Input, LSTM, Dense, Embedding, Flatten, Concatenate
+
+# Optional global model mode (FS_GLOBAL_MODEL=1): one network for every ticker.
+# Each window is paired with its ticker's id (model.model_id), which feeds a learned
+# embedding, so the same weights serve any ticker. Training interleaves windows from all
+# tickers in large shuffled batches; adding a ticker adds rows to the batches, not a network.
+#
+# In this mode the updater fits the global model once per run on data through the latest
+# close, then runs each ticker with epochs=0 (inference only) through a per-ticker view.
+# Those weights have seen every close, so a view only predicts the latest day: missing earlier
+# days are left unpredicted rather than backfilled with look-ahead (see Model.train). A ticker
+# added in this mode gets no per-ticker network; it stays 'new' until the next global update.
+
+MAX_TICKERS = 4096          # Embedding capacity; ids above this need a rebuild
+EMBEDDING_DIM = 8
+GLOBAL_FILE = 'global.keras'
+INITIAL_EPOCHS = 15         # First fit on full history
+UPDATE_EPOCHS = 3           # Daily fit on each ticker's recent windows
+
+
+class TickerView:
+    """Looks like a per-ticker Keras model to LSTMModel but predicts through the global one."""
+    shared = True
+
+    def __init__(self, network, ticker_id):
+        self._network = network
+        self._ticker_id = ticker_id
+
+    def predict(self, X, batch_size=1024, verbose=0, **kwargs):
+        ids = np.full((len(X), 1), self._ticker_id, dtype=np.int32)
+        return self._network.predict([X, ids], batch_size=batch_size, verbose=verbose, **kwargs)
+
+
+class GlobalLSTMModel:
+    """One LSTM conditioned on a ticker embedding, trained on all tickers at once."""
+    time_step = 50
+    _start_date = '2017-01-01'
+    _batch_size = 512
+    _finetune_windows = 250     # Per-ticker recent windows used in daily updates
+
+    #--- Constructor ---#
+    def __init__(self, save_path, network=None):
+        self._path = os.path.join(save_path, GLOBAL_FILE)
+        if network is None and os.path.exists(self._path):
+            network = load_model(self._path, compile=False)
+        self.trained = network is not None
+        if network is None:
+            network = self._create_model()
+        network.compile(optimizer='adam', loss='mean_squared_error')
+        self._network = network
+        self.epochs_spent = 0
+        self.train_seconds = 0.0
+        self.tickers_trained = 0
+    #-------------------#
+
+    #--- Function: Build the conditioned network ---#
+    def _create_model(self):
+        window = Input(shape=(self.time_step, 1), name='window')
+        ticker = Input(shape=(1,), dtype='int32', name='ticker_id')
+        embedded = Flatten()(Embedding(MAX_TICKERS, EMBEDDING_DIM)(ticker))
+        x = LSTM(200)(window)
+        x = Concatenate()([x, embedded])
+        x = Dense(128)(x)
+        x = Dense(32)(x)
+        x = Dense(8)(x)
+        output = Dense(1)(x)
+        return KerasModel(inputs=[window, ticker], outputs=output)
+    #-----------------------------------------------#
+
+    #--- Function: Scaled windows for one ticker ---#
+    def _windows(self, prices, recent_only):
+        prices = np.asarray(prices, dtype=np.float32).reshape(-1)
+        low, high = np.nanmin(prices), np.nanmax(prices)
+        if not np.isfinite(low) or high <= low:
+            return None, None
+        scaled = (prices - low) / (high - low)      # Same per-ticker MinMax scaling as LSTMModel
+        n = len(scaled) - self.time_step - 1
+        if n <= 0:
+            return None, None
+        X = sliding_window_view(scaled, self.time_step)[:n]
+        y = scaled[self.time_step:self.time_step + n]
+        if recent_only:
+            X, y = X[-self._finetune_windows:], y[-self._finetune_windows:]
+        return X, y
+    #-----------------------------------------------#
+
+    #--- Function: Interleaved training set across tickers ---#
+    def build_dataset(self, series_by_id, recent_only=False, seed=0):
+        """series_by_id: {ticker_id: close prices}. Returns shuffled (X, ids, y)."""
+        X_parts, id_parts, y_parts = [], [], []
+        for ticker_id, prices in series_by_id.items():
+            if ticker_id >= MAX_TICKERS:
+                raise ValueError(f"Ticker id {ticker_id} exceeds the global model's capacity ({MAX_TICKERS}).")
+            X, y = self._windows(prices, recent_only)
+            if X is None or np.isnan(X).any():
+                continue
+            X_parts.append(X)
+            y_parts.append(y)
+            id_parts.append(np.full(len(X), ticker_id, dtype=np.int32))
+        if not X_parts:
+            raise ValueError("No usable price series for the global model.")
+        X = np.concatenate(X_parts)[..., None]
+        ids = np.concatenate(id_parts)[:, None]
+        y = np.concatenate(y_parts)
+        order = np.random.default_rng(seed).permutation(len(X))
+        return X[order], ids[order], y[order]
+    #---------------------------------------------------------#
+
+    #--- Function: Train on every ticker at once ---#
+    def train(self, series_by_id, epochs=5, recent_only=False, verbose=2):
+        start = time.perf_counter()
+        X, ids, y = self.build_dataset(series_by_id, recent_only)
+        history = self._network.fit([X, ids], y, epochs=epochs, batch_size=self._batch_size, verbose=verbose)
+        self.epochs_spent = len(history.history['loss'])
+        self.train_seconds = time.perf_counter() - start
+        return history.history['loss'][-1]
+    #-----------------------------------------------#
+
+    #--- Function: Train from the price cache, through end_date ---#
+    def train_from_prices(self, yf, ticker_ids, epochs=5, end_date=None, recent_only=False):
+        series, skipped = {}, []
+        for ticker, ticker_id in ticker_ids.items():
+            if yf.error(ticker) is not None or yf.series(ticker) is None:
+                skipped.append(ticker)  # Failed download or data-quality check, as in the per-ticker loop
+                continue
+            prices = yf.get_close_prices(ticker, self._start_date, end_date)
+            if len(prices) == 0:
+                skipped.append(ticker)
+                continue
+            series[ticker_id] = prices
+        if skipped:
+            print(f"Global model: skipping {len(skipped)} ticker(s) without prices: {', '.join(skipped)}")
+        self.tickers_trained = len(series)
+        return self.train(series, epochs, recent_only)
+    #--------------------------------------------------------------#
+
+    #--- Function: Daily update (full history the first time) ---#
+    def update(self, yf, ticker_ids, end_date=None):
+        if self.trained:
+            loss = self.train_from_prices(yf, ticker_ids, UPDATE_EPOCHS, end_date, recent_only=True)
+        else:
+            loss = self.train_from_prices(yf, ticker_ids, INITIAL_EPOCHS, end_date)
+        self.trained = True
+        self.save()
+        print(f"Global model: loss {loss:.5f} after {self.epochs_spent} epoch(s) on {self.tickers_trained} tickers "
+              f"({self.train_seconds:.0f}s).")
+        return loss
+    #-------------------------------------------------------------#
+
+    #--- Function: Per-ticker view for LSTMModel ---#
+    def view(self, ticker_id):
+        return TickerView(self._network, ticker_id)
+    #-----------------------------------------------#
+
+    #--- Function: Save atomically ---#
+    def save(self):
+        tmp_path = self._path.replace('.keras', '.tmp.keras')
+        self._network.save(tmp_path)
+        os.replace(tmp_path, self._path)
+    #---------------------------------#
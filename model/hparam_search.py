@@ -0,0 +1,164 @@
+import os
+import sys
+import math
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Per-ticker hyperparameter search with successive halving.
+# A random sample of configs from SEARCH_SPACE is trained for a small epoch budget in a
+# process pool; the best 1/eta (by score) move on to a budget eta times larger, until one
+# config is left. Most compute goes to promising configs, and configs that diverge are
+# dropped after their first rung.
+#   score = holdout MAPE * (1 + COST_WEIGHT * (cost / cheapest cost in the rung - 1))
+#   cost  = seconds per training epoch + seconds to predict the holdout
+# The winner is stored as JSON in model.hparams; LSTMModel uses it the next time the ticker's
+# network is built (a new ticker, or after its .keras file is removed).
+#
+#   python -m model.hparam_search AAPL MSFT --configs 27 --workers 4
+#   python -m model.hparam_search FIXTURE --fixture --dry-run
+
+SEARCH_SPACE = {
+    'time_step': [30, 50, 100],
+    'lstm_units': [64, 128, 200],
+    'dense_units': [[128, 32, 8], [64, 16], [32]],
+    'learning_rate': [0.001, 0.0005],
+    'batch_size': [64, 128],
+}
+COST_WEIGHT = float(os.environ.get('FS_HPARAM_COST_WEIGHT', 0.1))
+HOLDOUT_DAYS = 60           # Trailing days scored, never trained on (same days for every time_step)
+START_DATE = '2017-01-01'
+
+
+#--- Function: Random sample of the search space ---#
+def sample_configs(n, seed=0):
+    keys = list(SEARCH_SPACE)
+    grid = list(itertools.product(*(range(len(SEARCH_SPACE[k])) for k in keys)))
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(grid), size=min(n, len(grid)), replace=False)
+    return [{k: SEARCH_SPACE[k][grid[p][i]] for i, k in enumerate(keys)} for p in picks]
+#---------------------------------------------------#
+
+#--- Function: Synthetic prices for trying the search without network access ---#
+def fixture_prices(days=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    return (100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, days)))).astype(np.float32)
+#-------------------------------------------------------------------------------#
+
+#--- Function: Train one config for `epochs` and score it (runs in a worker process) ---#
+def evaluate_config(config, prices, epochs, holdout=HOLDOUT_DAYS, seed=0):
+    # Heavy imports stay in the worker
+    from model.lstm_model import LSTMModel
+    from keras.callbacks import EarlyStopping
+    import keras
+    keras.utils.set_random_seed(seed)
+
+    ts = config['time_step']
+    prices = np.asarray(prices, dtype=np.float32).reshape(-1)
+    prices = prices[np.isfinite(prices)]
+    low, high = prices[:-holdout].min(), prices[:-holdout].max()    # Scaler sees training data only
+    scaled = (prices - low) / (high - low)
+    n = len(scaled) - ts
+    X = np.lib.stride_tricks.sliding_window_view(scaled, ts)[:n][..., None]
+    y = scaled[ts:ts + n]
+    X_train, y_train, X_test, y_test = X[:-holdout], y[:-holdout], X[-holdout:], y[-holdout:]
+
+    lstm = LSTMModel('SEARCH', hparams=config)
+    model = lstm._model
+    model.optimizer.learning_rate = lstm._learning_rate
+    start = time.perf_counter()
+    history = model.fit(X_train, y_train, epochs=epochs, batch_size=lstm._batch_size, validation_split=0.1,
+                        callbacks=[EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True)],
+                        verbose=0)
+    train_seconds = time.perf_counter() - start
+    epochs_run = len(history.history['loss'])
+
+    start = time.perf_counter()
+    pred = model.predict(X_test, batch_size=1024, verbose=0).reshape(-1)
+    infer_seconds = time.perf_counter() - start
+
+    actual = y_test * (high - low) + low
+    pred = pred * (high - low) + low
+    mape = float(np.mean(np.abs((actual - pred) / actual)) * 100)
+    if not np.isfinite(mape):
+        mape = math.inf
+    return {'mape': mape, 'cost': train_seconds / max(epochs_run, 1) + infer_seconds,
+            'epochs': epochs_run, 'train_seconds': train_seconds}
+#--------------------------------------------------------------------------------------#
+
+#--- Function: Accuracy/cost objective over one rung ---#
+def score_results(results, cost_weight=COST_WEIGHT):
+    finite = [r['cost'] for r in results if math.isfinite(r['mape'])]
+    cheapest = min(finite) if finite else 1.0
+    for r in results:
+        r['score'] = r['mape'] * (1 + cost_weight * (r['cost'] / cheapest - 1))
+    return results
+#-------------------------------------------------------#
+
+#--- Function: Successive halving over sampled configs ---#
+def successive_halving(prices, configs, min_epochs=2, eta=3, max_epochs=30, workers=2, verbose=True):
+    """Return (best config, its last result)."""
+    from model.jobs import _init_training_worker    # Same niced spawn workers as ticker jobs
+    context = multiprocessing.get_context('spawn')
+    epochs = min_epochs
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_training_worker) as pool:
+        while True:
+            futures = [pool.submit(evaluate_config, c, prices, epochs) for c in configs]
+            results = score_results([f.result() for f in futures])
+            ranked = sorted(zip(configs, results), key=lambda item: item[1]['score'])
+            ranked = [item for item in ranked if math.isfinite(item[1]['score'])]   # Early abort
+            if not ranked:
+                raise ValueError("Every config diverged.")
+            if verbose:
+                best_config, best = ranked[0]
+                print(f"\t{len(configs)} configs x {epochs} epochs: best MAPE {best['mape']:.2f}% "
+                      f"cost {best['cost']:.2f}s {best_config}")
+            keep = max(1, len(ranked) // eta)
+            if keep == 1 or epochs >= max_epochs:
+                return ranked[0]
+            configs = [config for config, _ in ranked[:keep]]
+            epochs = min(epochs * eta, max_epochs)
+#---------------------------------------------------------#
+
+#--- Function: Search one ticker and persist the winner ---#
+def search_ticker(ticker, prices, db=None, n_configs=27, eta=3, min_epochs=2, workers=2, seed=0):
+    print(f"Searching hyperparameters for {ticker} ({n_configs} configs)...")
+    config, result = successive_halving(prices, sample_configs(n_configs, seed), min_epochs, eta, workers=workers)
+    print(f"{ticker}: {config} (MAPE {result['mape']:.2f}%, {result['cost']:.2f}s per epoch)")
+    if db is not None:
+        db.save_hparams(ticker, config)
+    return config
+#---------------------------------------------------------#
+
+
+#--- Entry point ---#
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-ticker hyperparameter search (successive halving).')
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--configs', type=int, default=27, help='configs sampled per ticker')
+    parser.add_argument('--eta', type=int, default=3, help='keep the best 1/eta configs per rung')
+    parser.add_argument('--min-epochs', type=int, default=2, help='epoch budget of the first rung')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('FS_TRAINING_WORKERS', 2)))
+    parser.add_argument('--fixture', action='store_true', help='use synthetic prices instead of yfinance')
+    parser.add_argument('--dry-run', action='store_true', help="don't save the winners")
+    args = parser.parse_args(argv)
+
+    db = None
+    if not args.dry_run:
+        from model.db_interface import DBInterface
+        from model.updater import MODELS_PATH
+        db = DBInterface(MODELS_PATH)
+    yf = None
+    if not args.fixture:
+        from model.yf_interface import YFInterface
+        yf = YFInterface(args.tickers, START_DATE)
+    for i, ticker in enumerate(args.tickers):
+        prices = fixture_prices(seed=i) if args.fixture else yf.get_close_prices(ticker, START_DATE)
+        search_ticker(ticker, prices, db, args.configs, args.eta, args.min_epochs, args.workers)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+#-------------------#
@@ -0,0 +1,243 @@
+import os
+import sys
+import fcntl
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from model.db_interface import DBInterface
+from model import warm_start
+
+# Background jobs for adding tickers.
+# The web tier only queues a row in the `job` table (DBInterface.enqueue_job). One JobRunner per
+# database, started by the updater daemon or on its own with `python -m model.jobs`, claims queued
+# jobs and runs symbol validation and initial training on a bounded process pool, so no request
+# thread or web worker ever trains, and web reloads can't orphan a job.
+# Claims are atomic (BEGIN IMMEDIATE): a job waits while the updater holds its ticker, and the
+# updater skips any ticker a claimed job holds, so the two never train the same ticker at once.
+#   queued -> validating -> training -> completed | failed
+
+MAX_TRAINING_WORKERS = int(os.environ.get('FS_TRAINING_WORKERS', 2))
+MAX_PENDING_JOBS = int(os.environ.get('FS_MAX_PENDING_JOBS', 20))
+POLL_SECONDS = float(os.environ.get('FS_JOB_POLL_SECONDS', 2))
+TRAINING_NICENESS = 10          # Keep trainers from starving the web tier for CPU
+GLOBAL_MODEL = os.environ.get('FS_GLOBAL_MODEL', '0') == '1'    # Same switch as model/updater.py
+INITIAL_EPOCHS = 15
+INITIAL_THRESHOLD = 0.0002
+
+
+#--- Function: Lower priority of training processes ---#
+def _init_training_worker():
+    try:
+        os.nice(TRAINING_NICENESS)
+    except (AttributeError, OSError):
+        pass    # Not supported on this platform
+#------------------------------------------------------#
+
+#--- Function: Validate and train a new ticker (runs in a worker process) ---#
+def run_initial_training(save_path, img_path, job_id, ticker, global_mode=GLOBAL_MODEL):
+    # Heavy imports stay in the worker so neither the web tier nor the runner loads TensorFlow for this
+    from model.yf_interface import YFInterface
+    from model.model import Model
+    from model import data_quality
+
+    db = DBInterface(save_path)
+    try:
+        if not YFInterface.is_valid_ticker(ticker):
+            db.update_job(job_id, status='failed', message=f'No price data found for {ticker}.')
+            return False
+        db.add_ticker(ticker)
+        db.publish_snapshot(img_path)   # Show it as 'new' right away
+        if global_mode:
+            # No per-ticker network to train: the next global update fits and predicts it
+            db.update_job(job_id, status='completed', progress=1.0,
+                          message='Added; predictions start after the next global-model update.')
+            return True
+
+        db.update_job(job_id, status='training', progress=0.0, message='Downloading prices...')
+        yf = YFInterface([ticker], '2017-01-01')
+        data_quality.validate(yf, [ticker])
+        if yf.error(ticker) is not None:
+            raise ValueError(yf.error(ticker))
+        db.populate_dates(yf.get_all_dates())
+
+        model = Model(ticker, db, yf, img_path)
+        model.set_status(2) # in_progress
+
+        def report(done, total):
+            db.update_job(job_id, progress=round(done / total, 4), message=f'Trained {done} of {total} days.')
+
+        db.update_job(job_id, message='Training...')
+        epochs, threshold = warm_start.initial_budget(db, ticker, INITIAL_EPOCHS, INITIAL_THRESHOLD)
+        model.train(epochs=epochs, threshold=threshold, progress=report)
+        db.save_epochs_saved(ticker, INITIAL_EPOCHS)
+        model.set_status(3) # completed
+        # Swap in the snapshot only: workers read it on every request, so no reload is needed, and
+        # touching the publish marker here would SIGHUP every worker once per finished job
+        db.publish_snapshot(img_path)
+        db.update_job(job_id, status='completed', progress=1.0, message='Initial training finished.')
+        return True
+    except Exception as e:
+        db.set_status(ticker, 'new')   # The nightly updater will pick it up instead
+        db.update_job(job_id, status='failed', message=f'Training failed: {e}')
+        return False
+#----------------------------------------------------------------------------#
+
+
+class TrainingQueue:
+    """Web-side handle: queues add-ticker jobs for the JobRunner and reports their progress."""
+
+    def __init__(self, save_path, max_pending=MAX_PENDING_JOBS):
+        self._max_pending = max_pending
+        self._db = DBInterface(save_path)
+
+    #--- Function: Queue a ticker to be validated and trained ---#
+    def add_ticker(self, ticker):
+        """Returns (job_id, created). Raises RuntimeError when the queue is full."""
+        # The limit is a count of unfinished jobs in the database, so it holds across every worker
+        return self._db.enqueue_job(ticker, 'initial_training', self._max_pending)
+    #------------------------------------------------------------#
+
+    #--- Function: Get job progress ---#
+    def get_job(self, job_id):
+        return self._db.get_job(job_id)
+    #----------------------------------#
+
+
+class JobRunner:
+    """Claims queued jobs and runs them on one bounded process pool; one runner per database."""
+
+    def __init__(self, save_path, img_path, max_workers=MAX_TRAINING_WORKERS, poll_seconds=POLL_SECONDS,
+                 global_mode=GLOBAL_MODEL):
+        self._save_path = save_path
+        self._img_path = img_path
+        self._max_workers = max_workers
+        self._poll_seconds = poll_seconds
+        self._global_mode = global_mode
+        self._db = DBInterface(save_path)
+        self._lock = threading.Lock()
+        self._running = {}      # job_id -> ticker
+        self._trainers = None   # Created on first use
+        self._lock_file = None
+        self._stop = threading.Event()
+
+    #--- Function: Become the only runner for this database ---#
+    def _acquire(self):
+        lock_file = open(self._db.lock_path('jobs'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file     # Held until stop() or process exit
+        return True
+    #----------------------------------------------------------#
+
+    #--- Function: Lazily start the training process pool ---#
+    def _training_pool(self):
+        if self._trainers is None:
+            # spawn: never fork a process that holds SQLite connections or threads
+            context = multiprocessing.get_context('spawn')
+            self._trainers = ProcessPoolExecutor(max_workers=self._max_workers,
+                                                 mp_context=context,
+                                                 initializer=_init_training_worker)
+        return self._trainers
+    #---------------------------------------------------------#
+
+    #--- Function: Start polling in a background thread ---#
+    def start(self):
+        """Returns False if another runner already owns the queue."""
+        if not self._acquire():
+            print("Job runner: another runner owns the job queue; not starting.")
+            return False
+        # We hold the lock, so any claimed job belongs to a runner that no longer exists
+        stale = self._db.fail_stale_jobs()
+        if stale:
+            print(f"Job runner: marked {stale} interrupted job(s) as failed.")
+        threading.Thread(target=self._loop, name='job-runner', daemon=True).start()
+        print(f"Job runner: started with {self._max_workers} training worker(s).")
+        return True
+    #------------------------------------------------------#
+
+    #--- Function: Poll until stopped ---#
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Job runner: poll failed: {e}")
+            self._stop.wait(self._poll_seconds)
+    #------------------------------------#
+
+    #--- Function: Claim and submit queued jobs while workers are free ---#
+    def poll(self):
+        started = 0
+        for job_id, ticker in self._db.queued_jobs(MAX_PENDING_JOBS):
+            with self._lock:
+                if len(self._running) >= self._max_workers:
+                    break
+            if not self._db.claim_job(job_id):
+                continue    # The updater is training this ticker; retried on a later poll
+            with self._lock:
+                self._running[job_id] = ticker
+                future = self._training_pool().submit(run_initial_training, self._save_path, self._img_path,
+                                                      job_id, ticker, self._global_mode)
+            future.add_done_callback(lambda f, job_id=job_id: self._finished(job_id, f))
+            started += 1
+        return started
+    #---------------------------------------------------------------------#
+
+    #--- Function: Clean up after a job ---#
+    def _finished(self, job_id, future):
+        with self._lock:
+            ticker = self._running.pop(job_id, None)
+        error = future.exception()
+        if error is None:
+            return
+        # The worker itself died (e.g. killed); record it since it couldn't
+        self._db.set_status(ticker, 'new')
+        self._db.update_job(job_id, status='failed', message=f'Training worker crashed: {error}')
+        if isinstance(error, BrokenProcessPool):
+            with self._lock:
+                self._trainers = None   # A broken pool takes no more work; start a fresh one
+    #--------------------------------------#
+
+    #--- Function: Number of jobs being worked on ---#
+    def running(self):
+        with self._lock:
+            return len(self._running)
+    #------------------------------------------------#
+
+    #--- Function: Stop polling and the pool ---#
+    def stop(self, wait=False):
+        self._stop.set()
+        with self._lock:
+            trainers, self._trainers = self._trainers, None
+        if trainers is not None:
+            trainers.shutdown(wait=wait)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+    #-------------------------------------------#
+
+
+#--- Entry point ---#
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run queued add-ticker jobs (the updater daemon runs these itself).')
+    parser.add_argument('--workers', type=int, default=MAX_TRAINING_WORKERS, help='training processes')
+    args = parser.parse_args(argv)
+
+    base_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    runner = JobRunner(os.path.join(base_dir, 'static', 'models'), os.path.join(base_dir, 'static', 'images'),
+                       max_workers=args.workers)
+    if not runner.start():
+        sys.exit(1)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        runner.stop()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+#-------------------#
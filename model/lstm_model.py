@@ -2,13 +2,26 @@ import numpy as np
 from model.yf_interface import YFInterface
 import logging
 import os
+import time
 logging.getLogger('tensorflow').setLevel(logging.ERROR) # Set tf logs to error only
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'    # Suppresses INFO and WARNING messages
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'   # Turn off oneDNN custom operations
 # import tensorflow as tf
 from keras.models import Sequential
 from keras.layers import Dense, LSTM, Input
+from keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau
 from sklearn.preprocessing import MinMaxScaler
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Stops training as soon as the training MSE reaches the threshold
+class _ThresholdStop(Callback):
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+
+    def on_epoch_end(self, epoch, logs=None):
+        if logs and logs.get('loss', float('inf')) <= self.threshold:
+            self.model.stop_training = True
 
 class LSTMModel:
     # LSTM Performance Variables
@@ -18,6 +31,21 @@ class LSTMModel:
     _update_epoch = 1           # how many epochs for an update
     _prediction_len = 5         # how many days to predict
     _start_date = '2017-01-01'  # Initial training start date
+    _lstm_units = 200
+    _dense_units = (128, 32, 8) # Dense stack before the single output
+    # Training controller
+    _backend = os.environ.get('FS_TRAIN_BACKEND', 'keras')   # 'keras' | 'tfdata' (tf.data + XLA)
+    _batch_size = 64
+    _validation_windows = 20    # most recent windows held out for early stopping
+    _patience = 3               # epochs without val_loss improvement before stopping
+    _learning_rate = 0.001      # Adam default; restored at the start of every day
+    _lr_factor = 0.5            # LR multiplier on plateau
+    _lr_patience = 2            # epochs without improvement before lowering LR
+    _min_lr = 1e-5
+    # Fine-tune mode: daily updates fit only recent windows plus a replay sample of older ones
+    _finetune_windows = 250     # most recent K windows (~1 trading year)
+    _replay_windows = 100       # random older windows mixed in to limit forgetting
+    _mirror_batch_size = 1024   # inference only, so batches can be much larger than in training
     last_update = None      # Last update as a date 'YYYY-MM-DD'
     _model = None
     orig_data = None
@@ -28,9 +56,15 @@ class LSTMModel:
 
     X = np.array([])
     scaler = MinMaxScaler(feature_range=(0,1))
+    epochs_spent = 0            # epochs actually run by the last train()
+    train_loss = None
+    val_loss = None
+    train_seconds = 0.0
 
     #--- Constructor ---#
-    def __init__(self, ticker, model=None, last_update=None, status=None, yf=None):
+    def __init__(self, ticker, model=None, last_update=None, status=None, yf=None, base=None, hparams=None):
+        # Per-ticker hyperparameters from the search (model.hparams); class defaults otherwise
+        self.set_hparams(hparams)
         # Check for valid model
         if model is not None:
             self.ticker = ticker
@@ -42,10 +76,24 @@ class LSTMModel:
             self.ticker = ticker
             self.status = 'new'
             self.last_update = '2025-10-01'
-            self._model = self._create_model(model)
+            self._model = self._create_model(base)  # base: warm-start weights from another ticker
+        # Saved (or donor) networks know their own window length
+        input_shape = getattr(self._model, 'input_shape', None)
+        if isinstance(input_shape, tuple) and input_shape[1] is not None:
+            self.time_step = input_shape[1]
         self._yf = yf
     #------------------------------#
 
+    #--- Function: Override architecture/training defaults ---#
+    def set_hparams(self, hparams):
+        hparams = hparams or {}
+        self.time_step = hparams.get('time_step', LSTMModel.time_step)
+        self._lstm_units = hparams.get('lstm_units', LSTMModel._lstm_units)
+        self._dense_units = tuple(hparams.get('dense_units', LSTMModel._dense_units))
+        self._learning_rate = hparams.get('learning_rate', LSTMModel._learning_rate)
+        self._batch_size = hparams.get('batch_size', LSTMModel._batch_size)
+    #---------------------------------------------------------#
+
     #--- Function: Preprocess the latest data ---#
     def preprocess(self, end_date=None):
         # Get the latest close prices
@@ -55,32 +103,39 @@ class LSTMModel:
             orig_data = self._yf.get_close_prices(self.ticker, self._start_date)
         else:
             orig_data = self._yf.get_close_prices(self.ticker, self._start_date, end_date)
-        self.orig_data = orig_data.reshape(-1, 1)    # Reshape into a 2d array: [[1], [2], [3]]
+        # float32 throughout: half the memory of float64 and what Keras trains in anyway
+        self.orig_data = orig_data.reshape(-1, 1).astype(np.float32)    # 2d array: [[1], [2], [3]]
         self.scaler = MinMaxScaler(feature_range=(0,1))
         self._scaled_data = self.scaler.fit_transform(self.orig_data)
         if np.isnan(self._scaled_data).any():
             raise ValueError(f"Scaled data for {self.ticker} contains NaNs on {end_date}")
 
-        # Create Datasets to feed LSTM
-        X, y = [], []
-        for i in range(len(self._scaled_data) - self.time_step - 1):
-            X.append(self._scaled_data[i:(i + self.time_step), 0])
-            y.append(self._scaled_data[i + self.time_step, 0])
-        self.X, self.y = np.array(X), np.array(y)
-        self.X = self.X.reshape(self.X.shape[0], self.X.shape[1], 1)
+        # Create Datasets to feed LSTM: window i is scaled[i:i+time_step], target scaled[i+time_step]
+        series = self._scaled_data[:, 0]
+        n_windows = max(len(series) - self.time_step - 1, 0)
+        windows = sliding_window_view(series, self.time_step)[:n_windows]
+        self.X = np.ascontiguousarray(windows).reshape(n_windows, self.time_step, 1)
+        self.y = series[self.time_step:self.time_step + n_windows].copy()
     #---------------------------------------------#
 
+    #--- Function: Drop the datasets until the next preprocess() ---#
+    def release_data(self):
+        self.orig_data = None
+        self._scaled_data = None
+        self.X = None
+        self.y = None
+    #---------------------------------------------------------------#
+
     #--- Function: Set model properties and compile ---#
     def _create_model(self, model):
-        # TODO 0.9 do some quick testing to find which values work best for each ticker
+        # Per-ticker values come from model/hparam_search.py via set_hparams()
         # Build and compile the LSTM, if needed
         if (model == None):
             model = Sequential()
             model.add(Input(shape=(self.time_step, 1)))
-            model.add(LSTM(200))
-            model.add(Dense(128))
-            model.add(Dense(32))
-            model.add(Dense(8))
+            model.add(LSTM(self._lstm_units))
+            for units in self._dense_units:
+                model.add(Dense(units))
             model.add(Dense(1))
             model.compile(optimizer='adam', loss='mean_squared_error')
 
@@ -88,10 +143,17 @@ class LSTMModel:
     #-----------------------------------------------#
 
     #--- Function: Show how model mirrors actual data ---#
-    def mirror_data(self):
-        mirror = self._model.predict(self.X)
-        mirror = self.scaler.inverse_transform(mirror)
-        return mirror
+    def mirror_data(self, days=None, points=None):
+        """Return (index, mirror): predicted prices for orig_data[index], for chart display."""
+        from model import charts
+        windows = charts.mirror_windows(len(self.X), charts.MIRROR_DAYS if days is None else days,
+                                        charts.MIRROR_POINTS if points is None else points)
+        if not len(windows):
+            return windows, np.empty(0, dtype=np.float32)  # Less than one full window of history
+        # A few hundred windows in one or two large batches instead of ~2000 batches of 32
+        mirror = self._model.predict(self.X[windows], batch_size=self._mirror_batch_size, verbose=0)
+        mirror = self.scaler.inverse_transform(mirror.reshape(-1, 1))
+        return windows + self.time_step, mirror[:, 0]
     #-----------------------------------------------#
 
     #--- Function: Predict price over future given days ---#
@@ -124,36 +186,92 @@ class LSTMModel:
     #------------------------------------------------------#
 
     #--- Function: Train the model up to given date ---#
-    def train(self, epochs, end_date=None, mse_threshold=0):
+    def train(self, epochs, end_date=None, mse_threshold=0, finetune=False):
+        """Fit up to end_date. finetune=True trains on recent windows only (constant cost per day)."""
         if end_date is None:
             self.preprocess()
         else:
             self.preprocess(end_date)
 
-        # Loop until threshold either threshold is met or epochs exausted
-        counter = 0
-        mse_value = 999999   # Stupidly high error value guarantees one loop
-        while (mse_value > mse_threshold) and (counter < epochs):
-            epochs_ = epochs
-            # Only do 5 epochs at a time if we're going for threshold
-            # TODO 0.9 do a mix of epochs and threshold
-            if mse_threshold > 0:
-                epochs_ = 5
-            history = self._model.fit(self.X, self.y, epochs=epochs_, batch_size=64)
-            mse_values = history.history['loss']
-            mse_value = mse_values[-1:][0]
-            counter += epochs_
-            if mse_threshold > 0:
-                if mse_value > mse_threshold:
-                    if (counter < epochs):
-                        print('MSE value ' + str(round(mse_value, 5)) + ' is inadequate, looping again...')
-                    else:
-                        print('MSE value ' + str(round(mse_value, 5)) + ' is inadequate but epochs maxed out.')
-                else:
-                    print('MSE value ' + str(round(mse_value, 5)) + ' is adequate.')
+        self.epochs_spent = 0
+        self.train_loss = None
+        self.val_loss = None
+        start = time.perf_counter()
+        if epochs > 0:
+            self._fit_with_early_stopping(epochs, mse_threshold, finetune)
+        self.train_seconds = time.perf_counter() - start
         self.last_update = self._yf.last_close()
     #-------------------------------------------------------------#
 
+    #--- Function: Fit until converged, plateaued or out of epochs ---#
+    def _fit_with_early_stopping(self, epochs, mse_threshold, finetune=False):
+        X, y = self.X, self.y
+        if finetune:
+            X, y = self._finetune_windows_sample()
+
+        # Hold out the most recent windows to watch for plateaus/overfitting
+        n_val = min(self._validation_windows, len(X) // 5)
+        if n_val > 0:
+            X_train, y_train = X[:-n_val], y[:-n_val]
+            validation = (X[-n_val:], y[-n_val:])
+            monitor = 'val_loss'
+        else:
+            X_train, y_train = X, y
+            validation = None
+            monitor = 'loss'
+
+        callbacks = [
+            EarlyStopping(monitor=monitor, patience=self._patience, restore_best_weights=True),
+            ReduceLROnPlateau(monitor=monitor, factor=self._lr_factor, patience=self._lr_patience,
+                              min_lr=self._min_lr, verbose=0),
+        ]
+        if mse_threshold > 0:
+            callbacks.append(_ThresholdStop(mse_threshold))
+
+        history = self._fit(X_train, y_train, epochs, validation, callbacks)
+        self.epochs_spent = len(history.history['loss'])
+        self.train_loss = history.history['loss'][-1]
+        if validation is not None:
+            self.val_loss = min(history.history['val_loss'])
+            # The held-out tail is the most recent data; learn it once before predicting
+            self._fit(validation[0], validation[1], 1, verbose=0)
+
+        mse_value = round(self.train_loss, 5)
+        if mse_threshold > 0 and self.train_loss <= mse_threshold:
+            print(f'MSE value {mse_value} is adequate after {self.epochs_spent} epoch(s).')
+        elif self.epochs_spent < epochs:
+            print(f'MSE value {mse_value} stopped improving after {self.epochs_spent} epoch(s).')
+        else:
+            print(f'MSE value {mse_value} is inadequate but epochs maxed out.')
+    #-----------------------------------------------------------------#
+
+    #--- Function: Run fit() on the configured backend ---#
+    def _fit(self, X, y, epochs, validation=None, callbacks=None, verbose=2):
+        # Each day starts from the base learning rate; the schedule only lowers it within a day
+        if self._backend == 'tfdata':
+            from model import tf_backend
+            return tf_backend.fit(self._model, X, y, epochs, self._batch_size, validation, callbacks,
+                                  self._learning_rate, verbose)
+        self._model.optimizer.learning_rate = self._learning_rate
+        return self._model.fit(X, y, epochs=epochs, batch_size=self._batch_size,
+                               validation_data=validation, callbacks=callbacks, verbose=verbose)
+    #-----------------------------------------------------#
+
+    #--- Function: Recent windows plus a replay sample of older ones ---#
+    def _finetune_windows_sample(self):
+        n = len(self.X)
+        recent_start = max(n - self._finetune_windows, 0)
+        if recent_start == 0 or self._replay_windows <= 0:
+            return self.X[recent_start:], self.y[recent_start:]
+
+        # Same sample for the same day, so reruns/resumes are reproducible
+        rng = np.random.default_rng(n)
+        replay = np.sort(rng.choice(recent_start, size=min(self._replay_windows, recent_start), replace=False))
+        # Replay first, recent last: the validation tail stays the most recent windows
+        index = np.concatenate([replay, np.arange(recent_start, n)])
+        return self.X[index], self.y[index]
+    #-------------------------------------------------------------------#
+
     #--- Function: Determine whether to buy or sell stock ---#
     def percentage_change(self, prediction):
         last_price = self.orig_data[len(self.orig_data) - 1][0]
@@ -0,0 +1,309 @@
+import sqlite3
+
+# Schema migrations for futurestock.db.
+# Applied versions are recorded in `schema_version`, so checking an up-to-date database is
+# a single query - no network, TensorFlow or model loading. Each step runs in its own
+# transaction together with its schema_version row, and checks the schema before acting
+# (IF NOT EXISTS, _add_column, step 11's layout check), so rerunning one is a no-op.
+
+DEFAULT_TICKERS = ['AAPL', 'GOOGL', 'META', 'AMZN', 'NFLX']
+
+
+#--- Helper: Check whether a table exists ---#
+def _table_exists(conn, table):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row is not None
+#--------------------------------------------#
+
+#--- Helper: Check whether a table has a column ---#
+def _has_column(conn, table, column):
+    return column in [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+#--------------------------------------------------#
+
+#--- Helper: Add a column if it isn't there yet ---#
+def _add_column(conn, table, column, declaration):
+    if not _has_column(conn, table, column):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {declaration}')
+#--------------------------------------------------#
+
+
+#--- Step 1: 0.7 db_overhaul base schema ---#
+def _create_base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS model (
+            model_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticker TEXT UNIQUE NOT NULL,
+            result REAL,
+            mape REAL,
+            buy_acc REAL,
+            balance REAL,
+            last_update INTEGER,
+            status TEXT,
+            version INTEGER DEFAULT 0
+        )''')
+
+    # Carry over tickers from the pre-0.7 'models' table
+    if _table_exists(conn, 'models'):
+        conn.execute('''
+            INSERT OR IGNORE INTO model (ticker, status)
+            SELECT ticker, status FROM models''')
+        conn.execute('DROP TABLE models')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS day (
+            day_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day_num INTEGER,
+            date TEXT
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction (
+            predict_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticker TEXT NOT NULL,
+            from_day INTEGER NOT NULL,
+            for_day INTEGER NOT NULL,
+            predicted_price REAL NOT NULL,
+            actual_price REAL,
+            ape REAL,
+            buy BOOLEAN,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(ticker, from_day, for_day)
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_accuracy (
+            dailyacc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticker TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            mape REAL,
+            buy_accuracy INTEGER,
+            simulated_profit REAL,
+            UNIQUE(ticker, day)
+        )''')
+#-------------------------------------------#
+
+#--- Step 2: Seed the default tickers ---#
+def _seed_default_tickers(conn):
+    # Rows start as 'new'; the updater creates and trains their Keras models
+    count = conn.execute('SELECT COUNT(*) FROM model').fetchone()[0]
+    if count == 0:
+        conn.executemany("INSERT OR IGNORE INTO model (ticker, status) VALUES (?, 'new')",
+                         [(ticker,) for ticker in DEFAULT_TICKERS])
+#----------------------------------------#
+
+#--- Step 3: Background job table ---#
+def _create_job_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticker TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL DEFAULT 0,
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+#------------------------------------#
+
+#--- Step 4: Indexes for day lookups ---#
+def _index_day_table(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_day_num ON day(day_num)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_day_date ON day(date)')
+#----------------------------------------#
+
+#--- Step 5: Training checkpoints ---#
+def _add_checkpoint_day(conn):
+    # Last day whose trained weights are durably saved in <ticker>.keras
+    _add_column(conn, 'model', 'checkpoint_day', 'INTEGER')
+#------------------------------------#
+
+#--- Step 6: Training policy decisions ---#
+def _create_train_decision_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS train_decision (
+            ticker TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            mode TEXT NOT NULL,
+            epochs INTEGER,
+            recent_ape REAL,
+            baseline_ape REAL,
+            reason TEXT,
+            PRIMARY KEY (ticker, day)
+        )''')
+#-----------------------------------------#
+
+#--- Step 7: Per-day training log ---#
+def _create_train_log_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS train_log (
+            ticker TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            epochs_planned INTEGER,
+            epochs_spent INTEGER,
+            train_loss REAL,
+            val_loss REAL,
+            seconds REAL,
+            PRIMARY KEY (ticker, day)
+        )''')
+#------------------------------------#
+
+#--- Step 8: Mark full-history retrains in the train log ---#
+def _add_train_log_full_history(conn):
+    _add_column(conn, 'train_log', 'full_history', 'INTEGER DEFAULT 0')
+#-----------------------------------------------------------#
+
+#--- Step 9: Warm-start bookkeeping ---#
+def _add_warm_start_columns(conn):
+    _add_column(conn, 'model', 'donor', 'TEXT')
+    _add_column(conn, 'model', 'epochs_saved', 'INTEGER')
+#--------------------------------------#
+
+#--- Step 10: Per-ticker hyperparameters ---#
+def _add_hparams_column(conn):
+    _add_column(conn, 'model', 'hparams', 'TEXT')    # JSON from model/hparam_search.py
+#-------------------------------------------#
+
+#--- Step 11: Compact, clustered prediction/accuracy storage ---#
+def _normalize_prediction_storage(conn):
+    # Integer ticker ids and day numbers only, clustered on the key the queries seek by.
+    # No surrogate ids or timestamps: rows are addressed by (ticker_id, from_day, for_day).
+    # Each table is converted only while it still has the old ticker-text layout, so
+    # rerunning the step (e.g. after restoring an old schema_version row) changes nothing.
+    if not _has_column(conn, 'prediction', 'ticker_id'):
+        conn.execute('ALTER TABLE prediction RENAME TO prediction_old')
+        conn.execute('''
+            CREATE TABLE prediction (
+                ticker_id INTEGER NOT NULL,
+                from_day INTEGER NOT NULL,
+                for_day INTEGER NOT NULL,
+                predicted_price REAL NOT NULL,
+                actual_price REAL,
+                ape REAL,
+                buy INTEGER,
+                PRIMARY KEY (ticker_id, from_day, for_day)
+            ) WITHOUT ROWID''')
+        # Rows of tickers no longer in the model table are dropped
+        conn.execute('''
+            INSERT OR REPLACE INTO prediction
+                (ticker_id, from_day, for_day, predicted_price, actual_price, ape, buy)
+            SELECT m.model_id, p.from_day, p.for_day, p.predicted_price, p.actual_price, p.ape, p.buy
+            FROM prediction_old p JOIN model m ON m.ticker = p.ticker
+            ORDER BY m.model_id, p.from_day, p.for_day''')
+        conn.execute('DROP TABLE prediction_old')
+    # Rows still waiting for an actual price; tiny, so the daily backfill check never scans history
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_prediction_pending ON prediction (for_day)
+        WHERE actual_price IS NULL''')
+
+    if not _has_column(conn, 'daily_accuracy', 'ticker_id'):
+        conn.execute('ALTER TABLE daily_accuracy RENAME TO daily_accuracy_old')
+        conn.execute('''
+            CREATE TABLE daily_accuracy (
+                ticker_id INTEGER NOT NULL,
+                day INTEGER NOT NULL,
+                mape REAL,
+                buy_accuracy INTEGER,
+                simulated_profit REAL,
+                PRIMARY KEY (ticker_id, day)
+            ) WITHOUT ROWID''')
+        conn.execute('''
+            INSERT OR REPLACE INTO daily_accuracy (ticker_id, day, mape, buy_accuracy, simulated_profit)
+            SELECT m.model_id, a.day, a.mape, a.buy_accuracy, a.simulated_profit
+            FROM daily_accuracy_old a JOIN model m ON m.ticker = a.ticker
+            ORDER BY m.model_id, a.day''')
+        conn.execute('DROP TABLE daily_accuracy_old')
+#---------------------------------------------------------------#
+
+#--- Step 12: Rolled-up prediction history ---#
+def _create_prediction_summary_table(conn):
+    # Predictions made on or before through_day were compacted into these totals (model/compaction.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_summary (
+            ticker_id INTEGER PRIMARY KEY,
+            through_day INTEGER NOT NULL,
+            ape_sum REAL NOT NULL DEFAULT 0,
+            ape_count INTEGER NOT NULL DEFAULT 0,
+            rows_archived INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID''')
+#---------------------------------------------#
+
+#--- Step 13: Checkpoints for models trained before checkpoint_day existed ---#
+def _backfill_checkpoint_day(conn):
+    # Their weights were saved at the end of each run, i.e. through the last day they predicted from
+    conn.execute('''
+        UPDATE model SET checkpoint_day = (
+            SELECT MAX(day) FROM (
+                SELECT MAX(from_day) AS day FROM prediction WHERE ticker_id = model.model_id
+                UNION ALL
+                SELECT through_day FROM prediction_summary WHERE ticker_id = model.model_id))
+        WHERE checkpoint_day IS NULL''')
+#----------------------------------------------------------------------------#
+
+
+# Ordered list of (version, name, step). Append new steps; never reorder or renumber.
+MIGRATIONS = [
+    (1, '0.7 db_overhaul', _create_base_tables),
+    (2, 'seed default tickers', _seed_default_tickers),
+    (3, 'job table', _create_job_table),
+    (4, 'day table indexes', _index_day_table),
+    (5, 'model checkpoint_day', _add_checkpoint_day),
+    (6, 'train_decision table', _create_train_decision_table),
+    (7, 'train_log table', _create_train_log_table),
+    (8, 'train_log full_history', _add_train_log_full_history),
+    (9, 'model warm start', _add_warm_start_columns),
+    (10, 'model hparams', _add_hparams_column),
+    (11, 'normalized prediction storage', _normalize_prediction_storage),
+    (12, 'prediction_summary table', _create_prediction_summary_table),
+    (13, 'backfill checkpoint_day', _backfill_checkpoint_day),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+#--- Function: Read the applied schema version ---#
+def current_version(conn):
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0    # No schema_version table yet
+    return row[0] or 0
+#-------------------------------------------------#
+
+#--- Function: Bring the database up to the latest version ---#
+def migrate(db_path, verbose=True):
+    """Apply pending migrations. Returns the list of versions applied (empty if up-to-date)."""
+    # Autocommit mode so each step's transaction is managed explicitly below
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # Fast path: one query on an up-to-date database
+        if current_version(conn) >= LATEST_VERSION:
+            return []
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )''')
+
+        applied = []
+        for version, name, step in MIGRATIONS:
+            # Take the write lock first, then re-check, so concurrent starters don't double-apply
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if current_version(conn) >= version:
+                    conn.execute('COMMIT')
+                    continue
+                if verbose:
+                    print(f"\tApplying migration {version}: {name}...", end=' ')
+                step(conn)
+                conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+                conn.execute('COMMIT')
+                if verbose:
+                    print("done.")
+                applied.append(version)
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return applied
+    finally:
+        conn.close()
+#-------------------------------------------------------------#
@@ -4,9 +4,16 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 from model.lstm_model import LSTMModel
+from model import warm_start
+from model import charts
 
 # A wrapper class for LSTMModels that generates images
 class Model:
+    # Save a resumable checkpoint every N trained days during catch-up
+    CHECKPOINT_EVERY = 5
+    # Days between full-history retrains; other days fine-tune on recent windows only
+    FULL_RETRAIN_EVERY = 20
+
     # LSTM Vars
     ticker = None
     recommendation = None
@@ -22,7 +29,7 @@ class Model:
     img2_path = None
     
     #--- Constructor ---#
-    def __init__(self, ticker, db, yf, IMG_PATH):
+    def __init__(self, ticker, db, yf, IMG_PATH, global_model=None):
         self.ticker = ticker
         self._db = db
         self._yf = yf
@@ -31,35 +38,53 @@ class Model:
         self.img1_path = os.path.join(IMG_PATH, (ticker + 'pred.png'))
         self.img2_path = os.path.join(IMG_PATH, (ticker + 'mirr.png'))
 
+        # Global model mode: predict through the shared network, no per-ticker Keras file
+        if global_model is not None:
+            ticker_id = self._db.get_ticker_ids([ticker])[ticker]
+            self.recommendation, last_update, self._status = self._db.get_model_state(ticker)
+            self._lstm = LSTMModel(ticker, global_model.view(ticker_id), last_update, self._status, self._yf)
+            return
+
         # First, try to load an existing model
         try:
             keras_model, self.recommendation, last_update, self._status = self._db.load_model(ticker)
-            self._lstm = LSTMModel(ticker, keras_model, last_update, self._status, self._yf)
+            self._lstm = LSTMModel(ticker, keras_model, last_update, self._status, self._yf,
+                                   hparams=self._db.get_hparams(ticker))
 
         # If the model doesn't exist, create a new one
         except Exception as e:
             print("Creating new model...", end=' ')
-            self._lstm = LSTMModel(ticker, yf=self._yf)
+            hparams = self._db.get_hparams(ticker)
+            base, donor = None, None
+            if hparams is None:     # A searched architecture can't take a donor's weights
+                base, donor = warm_start.base_model(self._db, ticker, self._yf)
+            self._lstm = LSTMModel(ticker, yf=self._yf, base=base, hparams=hparams)
             self._db.save_model(self.ticker, self._lstm, status='new')
-            print("done.")
+            self._db.save_donor(self.ticker, donor)
+            print(f"done (warm-started from {donor})." if donor else "done.")
     #-------------------------------#
     
     #--- Function: Predict, generate imgs, save ---#
-    def generate_output(self, day):
+    def generate_output(self, day, render=True):
         # Make prediction (data) & recommendation (text)
         print(f"Generating output for {self.ticker}...")
         prediction = self._lstm.make_prediction()
         percent = self._lstm.percentage_change(prediction)
-        self.recommendation = percent
+        self.recommendation = float(percent)  # numpy float32 would be stored as a BLOB
         buy = True if percent > 0 else False
 
         for i in range(1, len(prediction)): # Skip the first prediction (current price)
             self._db.save_prediction(self.ticker, day, day+i, float(prediction[i]), bool(buy))
         
-        # Create images
-        mirror = self._lstm.mirror_data()
-        self._generate_prediction(self._lstm, prediction)
-        self._generate_mirror(self._lstm, mirror)
+        # Create images (catch-up only draws them on its last day; nobody sees the rest)
+        if render:
+            index, mirror = self._lstm.mirror_data()
+            # Actual prices from the first window's start: all of them, or a window's worth before the range
+            window = self._lstm.time_step
+            start = int(index[0]) - window if len(index) and len(self._lstm.orig_data) > window else 0
+            charts.save_mirror(self._db.get_mirror_path(self.ticker), self._lstm.orig_data, index, mirror, start, day)
+            self._generate_prediction(self._lstm, prediction)
+            self._generate_mirror(self._lstm, index, mirror, start)
     #----------------------------------------------#
 
     #--- Function: Create prediction image ---#
@@ -80,51 +105,93 @@ class Model:
         if not os.path.exists(os.path.dirname(self.img1_path)):
             print("Directory doesn't exist!")
             raise FileNotFoundError(f"Directory for {self.img1_path} does not exist.")
-        plt.savefig(self.img1_path)
-        plt.close()
+        charts.save_figure(self.img1_path)
     #------------------------------------------#
 
     #--- Function: Create price history image ---#
-    def _generate_mirror(self, model, mirror):
-        # Start + end dates for 'mirror' display
-        start = model.time_step
-        end = start + len(mirror)
-
-        # Create matplot
-        plt.figure(figsize=(6, 3))
-        plt.title(f'Model Against Actual Price - {model.ticker}')
-        plt.plot(model.orig_data, label="Actual Price")
-        plt.plot(np.arange(start, end), mirror, label='Model Prediction')
-        plt.legend()
-
-        # Save as file
-        plt.savefig(self.img2_path)
-        plt.close()
+    def _generate_mirror(self, model, index, mirror, start):
+        # Drawn from arrays only, so `python -m model.charts` can redraw it without the model
+        charts.plot_mirror(self.img2_path, model.ticker, model.orig_data[:, 0], index, mirror, start)
     #-----------------------------------------------#
 
     #--- Function: Train model further ---#
-    def train(self, epochs=5, threshold=0):
+    def train(self, epochs=5, threshold=0, progress=None, checkpoint_every=None, full_history=False):
         # Train model starting with first missing date in prediction table
         # TODO 0.8 check for model's first date instead of first date in DB
+        if checkpoint_every is None:
+            checkpoint_every = self.CHECKPOINT_EVERY
+        calendar = self._db.calendar()
         dates = self._db.all_dates()
         days = self._db.all_days()
-        first_missing_day = self._db.train_start_day(self.ticker)
-        if first_missing_day == -1:
+        shared = getattr(self._lstm._model, 'shared', False)   # Global-model view, no weights of its own
+        start_day = self._db.train_start_day(self.ticker) if shared else self._resume_day(days)
+        if start_day == -1:
             print(f"Model: {self.ticker} is up-to-date, no training needed.")
             return
         
-        # Train on all days from first_missing_day to the end
-        start_index = days.index(first_missing_day)
+        # Train on all days from start_day to the end
+        start_index = calendar.index(start_day)  # Dict lookup, not a scan of every day
+        if shared and start_index < len(days) - 1:
+            # The global network was fit through the latest close, so earlier days would be predicted
+            # (and scored) on prices it has already seen: leave them unpredicted instead
+            print(f"Model: {self.ticker} skipping {len(days) - 1 - start_index} backfill days (global model).")
+            start_index = len(days) - 1
+        last_full_day = self._db.get_last_full_day(self.ticker)
         for i in range(start_index, len(days)): # BUG first_missing_day is being used as index
-            print(f"Training {self.ticker} on day {days[i]}: {dates[i]}...")
-            self._lstm.train(epochs, dates[i], threshold)
-            self.generate_output(days[i])
+            # Full-history retrain on a slow cadence (or when asked); sliding-window fine-tune otherwise
+            full = full_history or last_full_day is None or days[i] - last_full_day >= self.FULL_RETRAIN_EVERY
+            print(f"Training {self.ticker} on day {days[i]}: {dates[i]} ({'full history' if full else 'fine-tune'})...")
+            self._lstm.train(epochs, dates[i], threshold, finetune=not full)
+            full = full and epochs > 0
+            if full:
+                last_full_day = days[i]
+            self._db.save_train_log(self.ticker, days[i], epochs, self._lstm.epochs_spent,
+                                    self._lstm.train_loss, self._lstm.val_loss, self._lstm.train_seconds,
+                                    full_history=full)
+            self.generate_output(days[i], render=i == len(days) - 1)
             self._db.save_actual_price(self.ticker, days[i], self._yf.get_price(self.ticker, dates[i]))
+            if progress is not None:
+                progress(i - start_index + 1, len(days) - start_index)
+
+            # Durable checkpoint so a killed run resumes here instead of from start_day
+            trained = i - start_index + 1
+            if checkpoint_every and trained % checkpoint_every == 0 and i < len(days) - 1:
+                self._db.save_checkpoint(self.ticker, self._lstm, days[i])
 
         # Save model, which is still in progress
-        self._db.save_model(self.ticker, self._lstm, self._lstm.last_update, self.recommendation, 'in_progress')
+        self._db.save_model(self.ticker, self._lstm, self._lstm.last_update, self.recommendation, 'in_progress',
+                            checkpoint_day=days[-1])
     #----------------------------------------------#
 
+    #--- Function: Find the first day that still needs training ---#
+    def _resume_day(self, days):
+        """Earliest of the first day without predictions and the day after the last checkpoint."""
+        first_missing_day = self._db.train_start_day(self.ticker)
+        checkpoint_day = self._db.get_checkpoint_day(self.ticker)
+
+        # No checkpoint: the saved weights are untrained (or from a first run killed before its
+        # first checkpoint), so any predictions already stored came from weights we don't have
+        if checkpoint_day is None:
+            if first_missing_day != days[0]:
+                print(f"Model: {self.ticker} has no checkpoint, retraining from the first day.")
+            return days[0]
+
+        # Predictions may be ahead of the saved weights if the last run was killed
+        if checkpoint_day < days[-1]:
+            resume_day = checkpoint_day + 1
+            if first_missing_day == -1 or resume_day < first_missing_day:
+                print(f"Model: {self.ticker} resuming from checkpoint after day {checkpoint_day}.")
+                return resume_day
+        return first_missing_day
+    #----------------------------------------------#
+
+    #--- Function: Free per-day data, keep the network (see model/model_pool.py) ---#
+    def release(self):
+        self._lstm.release_data()
+        self._prediction = None
+        self._mirror = None
+    #--------------------------------------------------------------------------------#
+
     #--- Function: Change status ---#
     def set_status(self, status_int):
         temp_status = ''
@@ -139,6 +206,7 @@ class Model:
         
         self._db.set_status(self.ticker, temp_status)
         self._status = temp_status
+        self._lstm.status = temp_status    # Keep warm (daemon) models from looking 'new' forever
     #----------------------------#
 
     #--- Function: Check status ---#
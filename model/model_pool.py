@@ -0,0 +1,109 @@
+import os
+import gc
+from collections import OrderedDict
+from model import rss
+from model.model import Model
+
+# Bounded set of loaded models for the updater.
+# Tickers are streamed: get() loads a model (or reuses a warm one), the updater trains and
+# persists it, and release() drops its datasets and then evicts least-recently-used models
+# until the pool is within both limits:
+#   capacity        models kept loaded between uses (cron: 0, so each ticker is freed at once)
+#   MEMORY_BUDGET   process RSS the updater tries to stay under (0 = no limit)
+# so peak memory is one ticker's worth (plus the warm set) instead of growing with the universe.
+
+MEMORY_BUDGET = int(os.environ.get('FS_MEMORY_BUDGET_MB', 0)) * 2**20
+WARM_MODELS = int(os.environ.get('FS_WARM_MODELS', 64))    # Daemon's warm-set size
+
+
+class ModelPool:
+    """LRU of loaded Models, bounded by count and by process RSS."""
+
+    def __init__(self, db, yf, img_path, capacity=0, memory_budget=MEMORY_BUDGET, global_model=None):
+        self._db = db
+        self._yf = yf
+        self._img_path = img_path
+        self._capacity = capacity
+        self._memory_budget = memory_budget
+        self._global_model = global_model
+        self._models = OrderedDict()    # ticker -> Model, least recently used first
+        self.peak_rss = {}              # ticker -> peak RSS (bytes) while it was processed
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, ticker):
+        return ticker in self._models
+
+    #--- Function: Forget tickers that were removed from the DB ---#
+    def sync(self, tickers):
+        wanted = set(tickers)
+        for ticker in [t for t in self._models if t not in wanted]:
+            del self._models[ticker]
+    #--------------------------------------------------------------#
+
+    #--- Function: Load models up front until either limit is reached ---#
+    def preload(self, tickers):
+        for ticker in tickers:
+            if len(self._models) >= self._capacity:
+                break
+            if self._memory_budget and rss.process_rss_bytes() > self._memory_budget:
+                break
+            # New tickers are left for the updater to claim first: an add-ticker job may be training one
+            if ticker not in self._models and self._db.get_status(ticker) != 'new':
+                self._models[ticker] = Model(ticker, self._db, self._yf, self._img_path, self._global_model)
+    #---------------------------------------------------------------------#
+
+    #--- Function: Processing order that gets the most out of the warm set ---#
+    def order(self, tickers):
+        # Same order every run would make LRU miss on every ticker once the universe outgrows the
+        # pool; warm ones first means each run hits on everything still loaded from the last one
+        return [t for t in tickers if t in self._models] + [t for t in tickers if t not in self._models]
+    #-------------------------------------------------------------------------#
+
+    #--- Function: Loaded model for a ticker ---#
+    def get(self, ticker):
+        rss.reset_peak_rss()
+        model = self._models.pop(ticker, None)
+        if model is None:
+            model = Model(ticker, self._db, self._yf, self._img_path, self._global_model)
+        self._models[ticker] = model    # Most recently used
+        return model
+    #-------------------------------------------#
+
+    #--- Function: Done with a ticker for this run ---#
+    def release(self, model):
+        """Free the model's datasets, record its peak RSS and shrink the pool back into its limits."""
+        self.peak_rss[model.ticker] = rss.process_peak_rss_bytes()
+        model.release()
+        self._evict()
+        return self.peak_rss[model.ticker]
+    #-------------------------------------------------#
+
+    #--- Function: Evict least-recently-used models until within limits ---#
+    def _evict(self):
+        evicted = 0
+        while self._models and len(self._models) > self._capacity:
+            self._models.popitem(last=False)
+            evicted += 1
+        if evicted:
+            gc.collect()
+        while self._models and self._memory_budget and rss.process_rss_bytes() > self._memory_budget:
+            self._models.popitem(last=False)
+            evicted += 1
+            gc.collect()
+        if evicted and not self._models and self._global_model is None:
+            # Nothing loaded references Keras state anymore; drop the graphs/caches it accumulated
+            from keras import backend
+            backend.clear_session()
+            gc.collect()
+        if self._memory_budget and rss.process_rss_bytes() > self._memory_budget:
+            print(f"WARNING: RSS {rss.process_rss_bytes() / 2**20:.0f} MiB is over the "
+                  f"{self._memory_budget / 2**20:.0f} MiB budget with {len(self._models)} models loaded.")
+    #----------------------------------------------------------------------#
+
+    #--- Function: Heaviest tickers of the last run ---#
+    def report(self, top=5):
+        heaviest = sorted(self.peak_rss.items(), key=lambda item: item[1], reverse=True)[:top]
+        return ', '.join(f"{ticker} {peak / 2**20:.0f} MiB" for ticker, peak in heaviest)
+    #--------------------------------------------------#
@@ -0,0 +1,49 @@
+import os
+import resource
+
+# Process memory readings, shared by the web tier (metrics.py) and the updater (model/model_pool.py)
+# without either importing the other's module.
+
+
+#--- Function: Resident set size of this process ---#
+def process_rss_bytes():
+    """Current RSS in bytes, read from /proc where available."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return process_max_rss_bytes()
+#---------------------------------------------------#
+
+#--- Function: Peak resident set size of this process ---#
+def process_max_rss_bytes():
+    """Peak RSS in bytes (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname().sysname == 'Darwin':
+        return maxrss
+    return maxrss * 1024
+#--------------------------------------------------------#
+
+#--- Function: Restart peak-RSS tracking from the current RSS ---#
+def reset_peak_rss():
+    """Reset VmHWM (Linux 4.0+) so peaks can be measured per unit of work. False if unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+#----------------------------------------------------------------#
+
+#--- Function: Peak RSS since the last reset_peak_rss() ---#
+def process_peak_rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return process_max_rss_bytes()
+#----------------------------------------------------------#
@@ -0,0 +1,165 @@
+import os
+import time
+import fcntl
+import shutil
+import sqlite3
+import threading
+
+# Read-only snapshots for the web tier.
+# The updater and training jobs write to futurestock.db; the web tier never reads it for
+# model rows. Instead, publish() copies the model table into a fresh small database file,
+# copies each ticker's charts to version-stamped names so a snapshot only ever points at
+# finished images, and swaps the file in with os.replace. Readers open the current file
+# read-only and immutable, so they take no locks, never wait on the writer and always see a
+# whole update: a ticker's status, result and charts change together.
+# Publishers (the updater and training jobs) take an exclusive lock on snapshot.db.lock for the
+# whole read -> build -> replace -> prune, so an older read can never replace a newer snapshot
+# and one publisher never prunes charts another has just referenced.
+
+SNAPSHOT_FILE = 'snapshot.db'
+PUBLISHED_IMG_DIR = 'published'     # Under static/images
+MODEL_COLUMNS = ['ticker', 'result', 'status', 'last_update', 'mape', 'buy_acc', 'balance', 'version']
+CHARTS = {'img1_path': 'pred', 'img2_path': 'mirr'}
+
+
+#--- Function: Copy one chart to its version-stamped name ---#
+def _publish_chart(img_path, ticker, kind, version):
+    source = os.path.join(img_path, f'{ticker}{kind}.png')
+    name = f'{ticker}{kind}-{version}.png'
+    target = os.path.join(img_path, PUBLISHED_IMG_DIR, name)
+    if not os.path.exists(target):
+        if not os.path.exists(source):
+            return None
+        tmp_target = target + '.tmp'
+        shutil.copyfile(source, tmp_target)
+        os.replace(tmp_target, target)
+    return f'static/images/{PUBLISHED_IMG_DIR}/{name}'
+#-----------------------------------------------------------#
+
+#--- Function: Remove charts no snapshot refers to anymore ---#
+def _prune_charts(img_path, keep):
+    folder = os.path.join(img_path, PUBLISHED_IMG_DIR)
+    for name in os.listdir(folder):
+        if name.endswith('.png') and f'static/images/{PUBLISHED_IMG_DIR}/{name}' not in keep:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+#------------------------------------------------------------#
+
+#--- Function: Open a snapshot file for reading ---#
+def connect(snapshot_path):
+    # immutable: the file is replaced, never modified, so SQLite can skip locking entirely
+    return sqlite3.connect(f'file:{snapshot_path}?mode=ro&immutable=1', uri=True)
+#--------------------------------------------------#
+
+#--- Function: Chart paths referenced by a snapshot ---#
+def _chart_refs(snapshot_path):
+    if not os.path.exists(snapshot_path):
+        return set()
+    conn = connect(snapshot_path)
+    try:
+        rows = conn.execute('SELECT img1_path, img2_path FROM model').fetchall()
+    except sqlite3.Error:
+        return set()
+    finally:
+        conn.close()
+    return {path for row in rows for path in row if path}
+#-----------------------------------------------------#
+
+#--- Function: Build and atomically swap in a new snapshot ---#
+def publish(db_path, snapshot_path, img_path):
+    """Snapshot the model table (plus versioned charts) from db_path. Returns the ticker count."""
+    with open(snapshot_path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)    # Released when the file is closed
+        return _publish(db_path, snapshot_path, img_path)
+#-------------------------------------------------------------#
+
+#--- Function: The publish itself, run under the lock ---#
+def _publish(db_path, snapshot_path, img_path):
+    os.makedirs(os.path.join(img_path, PUBLISHED_IMG_DIR), exist_ok=True)
+    source = sqlite3.connect(db_path, timeout=30)
+    try:
+        rows = source.execute(f"SELECT {', '.join(MODEL_COLUMNS)} FROM model ORDER BY ticker").fetchall()
+    finally:
+        source.close()
+
+    records = []
+    for row in rows:
+        record = dict(zip(MODEL_COLUMNS, row))
+        version = record['version'] or 0
+        for column, kind in CHARTS.items():
+            record[column] = None if record['status'] == 'new' else \
+                _publish_chart(img_path, record['ticker'], kind, version)
+        records.append(record)
+
+    # Per-process temp name, so a file left by a publisher that crashed is never mistaken for ours
+    tmp_path = f'{snapshot_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    columns = MODEL_COLUMNS + list(CHARTS)
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)     # Left over from a crashed publish
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute(f'''
+            CREATE TABLE model (
+                ticker TEXT PRIMARY KEY,
+                {', '.join(columns[1:])}
+            ) WITHOUT ROWID''')
+        conn.executemany(f"INSERT INTO model ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                         [tuple(record[c] for c in columns) for record in records])
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value)')
+        conn.execute("INSERT INTO meta VALUES ('published_at', ?)", (time.time(),))
+        conn.commit()
+    finally:
+        conn.close()
+
+    previous_refs = _chart_refs(snapshot_path)
+    os.replace(tmp_path, snapshot_path)
+    # Keep the previous snapshot's charts too: pages rendered from it may still be loading them
+    _prune_charts(img_path, previous_refs | {r[c] for r in records for c in CHARTS if r[c]})
+    return len(records)
+#-------------------------------------------------------------#
+
+
+class SnapshotReader:
+    """The web tier's read path: same calls as DBInterface, served from the latest snapshot."""
+
+    def __init__(self, snapshot_path, fallback=None):
+        self._path = snapshot_path
+        self._fallback = fallback   # DBInterface used until the first snapshot exists
+
+    #--- Function: Path of the snapshot file ---#
+    def path(self):
+        return self._path
+    #-------------------------------------------#
+
+    #--- Function: All tickers ---#
+    def get_tickers(self):
+        if not os.path.exists(self._path) and self._fallback is not None:
+            return self._fallback.get_tickers()
+        conn = connect(self._path)
+        try:
+            return [row[0] for row in conn.execute('SELECT ticker FROM model')]
+        finally:
+            conn.close()
+    #-----------------------------#
+
+    #--- Function: {ticker: row dict}, like DBInterface.get_model_rows ---#
+    def get_model_rows(self, tickers=None):
+        if not os.path.exists(self._path) and self._fallback is not None:
+            return self._fallback.get_model_rows(tickers)
+        columns = MODEL_COLUMNS + list(CHARTS)
+        query = f"SELECT {', '.join(columns)} FROM model"
+        params = ()
+        if tickers is not None and len(tickers) <= 500:
+            query += f" WHERE ticker IN ({', '.join('?' * len(tickers))})"
+            params = tuple(tickers)
+        conn = connect(self._path)
+        try:
+            rows = conn.execute(query + ' ORDER BY ticker', params).fetchall()
+        finally:
+            conn.close()
+        wanted = set(tickers) if tickers is not None else None
+        return {row[0]: dict(zip(columns, row)) for row in rows if wanted is None or row[0] in wanted}
+    #---------------------------------------------------------------------#
@@ -0,0 +1,79 @@
+import numpy as np
+import tensorflow as tf
+from keras.models import clone_model
+from keras.optimizers import Adam
+
+# Optional training backend for LSTMModel (FS_TRAIN_BACKEND=tfdata).
+# Data goes through a cached, prefetched tf.data pipeline and the train step is compiled
+# with XLA (jit_compile). Compiling is the expensive part, so one compiled "trainer" copy is
+# kept per architecture and reused across days and tickers: a ticker's weights are loaded
+# into it, trained, and copied back.
+
+# architecture signature -> CompiledTrainer
+_trainers = {}
+
+
+#--- Function: Build the input pipeline for one fit ---#
+def make_dataset(X, y, batch_size=64, shuffle=True):
+    """Cached, shuffled, batched and prefetched dataset of float32 windows/targets."""
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    dataset = tf.data.Dataset.from_tensor_slices((X, y)).cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(X), reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+#------------------------------------------------------#
+
+#--- Function: Identify models that can share a compiled trainer ---#
+def architecture_key(model):
+    layers = tuple((type(layer).__name__, tuple(tuple(w.shape) for w in layer.weights)) for layer in model.layers)
+    return (tuple(model.input_shape[1:]), layers)
+#-------------------------------------------------------------------#
+
+
+class CompiledTrainer:
+    """An XLA-compiled copy of one architecture that trains other models' weights."""
+
+    def __init__(self, model):
+        self.model = clone_model(model)
+        self.model.compile(optimizer=Adam(), loss='mean_squared_error', jit_compile=True)
+
+    #--- Function: Fresh optimizer state for the next ticker/day ---#
+    def _reset_optimizer(self, learning_rate):
+        optimizer = self.model.optimizer
+        if optimizer.built:
+            for variable in optimizer.variables:
+                variable.assign(tf.zeros_like(variable))
+        optimizer.learning_rate = learning_rate
+    #---------------------------------------------------------------#
+
+    #--- Function: Train `target`'s weights in the compiled copy ---#
+    def fit(self, target, X, y, epochs, batch_size=64, validation=None, callbacks=None,
+            learning_rate=0.001, verbose=2):
+        self.model.set_weights(target.get_weights())
+        self._reset_optimizer(learning_rate)
+        val_dataset = None
+        if validation is not None:
+            val_dataset = make_dataset(validation[0], validation[1], batch_size, shuffle=False)
+        history = self.model.fit(make_dataset(X, y, batch_size), epochs=epochs, validation_data=val_dataset,
+                                 callbacks=callbacks, verbose=verbose)
+        # Callbacks (e.g. EarlyStopping's best-weight restore) acted on the copy; hand them back
+        target.set_weights(self.model.get_weights())
+        return history
+    #---------------------------------------------------------------#
+
+
+#--- Function: Get (or compile) the trainer for a model's architecture ---#
+def get_trainer(model):
+    key = architecture_key(model)
+    trainer = _trainers.get(key)
+    if trainer is None:
+        trainer = CompiledTrainer(model)
+        _trainers[key] = trainer
+    return trainer
+#-------------------------------------------------------------------------#
+
+#--- Function: Fit a model through its shared compiled trainer ---#
+def fit(model, X, y, epochs, batch_size=64, validation=None, callbacks=None, learning_rate=0.001, verbose=2):
+    return get_trainer(model).fit(model, X, y, epochs, batch_size, validation, callbacks, learning_rate, verbose)
+#-----------------------------------------------------------------#
@@ -0,0 +1,131 @@
+import time
+import bisect
+import sqlite3
+import threading
+
+# The `day` table (day_num <-> 'YYYY-MM-DD') held in memory, one copy per database per process.
+# Lookups both ways are dict hits and next/previous trading day is a list step, so loops in the
+# updater and Model.train never go back to SQLite for them. The table only ever grows at the end,
+# so a refresh just reads rows past the last known day_num. Refreshes happen when this process
+# adds days (DBInterface.populate_dates extends the calendar), when a lookup misses, and for
+# today() at most every REFRESH_SECONDS to notice days another process added.
+#
+# Not named calendar.py: `python model/updater.py` puts model/ on sys.path, where it would
+# shadow the standard library module that email/urllib import.
+
+REFRESH_SECONDS = 60
+
+
+class TradingCalendar:
+    """day_num <-> date string for every trading day in the day table."""
+
+    def __init__(self, db_path):
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._days = []         # day_nums in order
+        self._dates = []        # dates in the same order ('YYYY-MM-DD' sorts chronologically)
+        self._date_by_num = {}
+        self._num_by_date = {}
+        self._position = {}     # day_num -> index in _days
+        self._checked = 0.0     # monotonic time of the last refresh
+        self.refresh()
+
+    def __len__(self):
+        return len(self._days)
+
+    #--- Function: Append (day_num, date) rows in day order ---#
+    def extend(self, rows):
+        with self._lock:
+            for day_num, date in rows:
+                if day_num in self._date_by_num or (self._days and day_num < self._days[-1]):
+                    continue
+                self._position[day_num] = len(self._days)
+                self._days.append(day_num)
+                self._dates.append(date)
+                self._date_by_num[day_num] = date
+                self._num_by_date[date] = day_num
+    #----------------------------------------------------------#
+
+    #--- Function: Load days added since the last refresh ---#
+    def refresh(self):
+        last = self._days[-1] if self._days else -1
+        conn = sqlite3.connect(self._db_path)
+        try:
+            rows = conn.execute('SELECT day_num, date FROM day WHERE day_num > ? ORDER BY day_num',
+                                (last,)).fetchall()
+        except sqlite3.OperationalError:
+            rows = []   # No day table yet
+        finally:
+            conn.close()
+        self.extend(rows)
+        self._checked = time.monotonic()
+        return len(rows)
+    #--------------------------------------------------------#
+
+    #--- Function: date string for a day_num (None if unknown) ---#
+    def date(self, day_num):
+        date = self._date_by_num.get(day_num)
+        if date is None and (not self._days or day_num > self._days[-1]) and self.refresh():
+            date = self._date_by_num.get(day_num)
+        return date
+    #-------------------------------------------------------------#
+
+    #--- Function: day_num for a date string (None if not a trading day we know) ---#
+    def day_num(self, date):
+        day_num = self._num_by_date.get(date)
+        if day_num is None and (not self._dates or date > self._dates[-1]) and self.refresh():
+            day_num = self._num_by_date.get(date)
+        return day_num
+    #-------------------------------------------------------------------------------#
+
+    #--- Function: Latest day_num (-1 if there are none) ---#
+    def today(self):
+        if time.monotonic() - self._checked > REFRESH_SECONDS:
+            self.refresh()
+        return self._days[-1] if self._days else -1
+    #-------------------------------------------------------#
+
+    #--- Function: Position of a day_num in days() ---#
+    def index(self, day_num):
+        if day_num not in self._position:
+            self.refresh()
+            if day_num not in self._position:
+                raise ValueError(f"Day {day_num} is not in the trading calendar.")
+        return self._position[day_num]
+    #-------------------------------------------------#
+
+    #--- Function: Trading day n days after/before a day_num (None past either end) ---#
+    def next_day(self, day_num, n=1):
+        i = self.index(day_num) + n
+        return self._days[i] if 0 <= i < len(self._days) else None
+
+    def prev_day(self, day_num, n=1):
+        return self.next_day(day_num, -n)
+    #----------------------------------------------------------------------------------#
+
+    #--- Function: Last trading day on or before any date string (None if before the first) ---#
+    def on_or_before(self, date):
+        i = bisect.bisect_right(self._dates, date) - 1
+        return self._days[i] if i >= 0 else None
+    #------------------------------------------------------------------------------------------#
+
+    #--- Function: All day_nums / dates, in order ---#
+    def days(self):
+        return list(self._days)
+
+    def dates(self):
+        return list(self._dates)
+    #------------------------------------------------#
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+#--- Function: The process-wide calendar for a database ---#
+def for_db(db_path):
+    with _calendars_lock:
+        calendar = _calendars.get(db_path)
+        if calendar is None:
+            calendar = _calendars[db_path] = TradingCalendar(db_path)
+    return calendar
+#----------------------------------------------------------#
@@ -0,0 +1,114 @@
+import os
+from collections import Counter
+from model.warm_start import WARM_EPOCHS, WARM_THRESHOLD
+
+# Decides how much training each ticker gets in an update, based on how far its recent
+# forecast error (APE from the prediction table) has drifted from its long-run MAPE.
+#   full  - the usual epochs/threshold training
+#   light - a short fine-tune
+#   skip  - inference only: predictions and charts are still produced, no fit() calls
+
+FULL = 'full'
+LIGHT = 'light'
+SKIP = 'skip'
+
+# Recent APE may exceed the long-run MAPE by this fraction before we fine-tune...
+DRIFT_TOLERANCE = float(os.environ.get('FS_DRIFT_TOLERANCE', 0.10))
+# ...and by this fraction before we do a full train
+DRIFT_FULL = float(os.environ.get('FS_DRIFT_FULL', 0.35))
+# Always at least fine-tune when recent APE is above this many percent
+MAX_RECENT_APE = float(os.environ.get('FS_MAX_RECENT_APE', 5.0))
+# Never skip training more than this many updates in a row
+MAX_CONSECUTIVE_SKIPS = int(os.environ.get('FS_MAX_SKIPS', 5))
+RECENT_DAYS = 5             # Window of for_days used for the recent APE
+MIN_RECENT_APES = 3         # Fewer finalized predictions than this means "no evidence"
+
+FULL_EPOCHS = 15
+FULL_THRESHOLD = 0.0002
+LIGHT_EPOCHS = 3
+LIGHT_THRESHOLD = 0
+
+
+class TrainingDecision:
+    """What the policy decided for one ticker, and why."""
+
+    def __init__(self, ticker, mode, epochs, threshold, reason, recent_ape=None, baseline_ape=None,
+                 full_history=False):
+        self.ticker = ticker
+        self.mode = mode
+        self.epochs = epochs
+        self.threshold = threshold
+        self.reason = reason
+        self.recent_ape = recent_ape
+        self.baseline_ape = baseline_ape
+        self.full_history = full_history    # Retrain on all history instead of fine-tuning
+
+    def __repr__(self):
+        return f"TrainingDecision({self.ticker}: {self.mode}, {self.reason})"
+
+
+class TrainingPolicy:
+    """Per-ticker full / light / skip decisions from recent APE drift."""
+
+    def __init__(self, db, tolerance=DRIFT_TOLERANCE, full_drift=DRIFT_FULL, max_recent_ape=MAX_RECENT_APE,
+                 max_skips=MAX_CONSECUTIVE_SKIPS, recent_days=RECENT_DAYS):
+        self._db = db
+        self.tolerance = tolerance
+        self.full_drift = full_drift
+        self.max_recent_ape = max_recent_ape
+        self.max_skips = max_skips
+        self.recent_days = recent_days
+        self.decisions = []
+
+    #--- Function: Build a decision of the given mode ---#
+    def _decision(self, ticker, mode, reason, recent_ape=None, baseline_ape=None, full_history=False):
+        if mode == FULL:
+            epochs, threshold = FULL_EPOCHS, FULL_THRESHOLD
+        elif mode == LIGHT:
+            epochs, threshold = LIGHT_EPOCHS, LIGHT_THRESHOLD
+        else:
+            epochs, threshold = 0, 0
+        decision = TrainingDecision(ticker, mode, epochs, threshold, reason, recent_ape, baseline_ape, full_history)
+        self.decisions.append(decision)
+        return decision
+    #----------------------------------------------------#
+
+    #--- Function: Decide how to train one ticker ---#
+    def decide(self, ticker, status=None):
+        if status == 'new':
+            donor = self._db.get_donor(ticker)
+            if donor:
+                # Starts from trained weights, so a short fine-tune per day is enough
+                decision = self._decision(ticker, FULL, f'new model, warm-started from {donor}')
+                decision.epochs, decision.threshold = WARM_EPOCHS, WARM_THRESHOLD
+                return decision
+            return self._decision(ticker, FULL, 'new model')
+
+        today = self._db.today_num()
+        recent = self._db.get_recent_apes(ticker, today - self.recent_days)
+        row = self._db.get_model_rows([ticker]).get(ticker)
+        baseline = row['mape'] if row else None
+        if len(recent) < MIN_RECENT_APES or baseline is None:
+            return self._decision(ticker, FULL, 'not enough accuracy history')
+
+        recent_ape = sum(recent) / len(recent)
+        drift = (recent_ape - baseline) / baseline if baseline > 0 else 0.0
+
+        if drift > self.full_drift:
+            # Large drift: don't wait for the full-history cadence
+            return self._decision(ticker, FULL, f'recent APE {recent_ape:.2f}% is {drift:+.0%} vs MAPE {baseline:.2f}%',
+                                  recent_ape, baseline, full_history=True)
+        if drift > self.tolerance or recent_ape > self.max_recent_ape:
+            return self._decision(ticker, LIGHT, f'recent APE {recent_ape:.2f}% is {drift:+.0%} vs MAPE {baseline:.2f}%',
+                                  recent_ape, baseline)
+        if self._db.consecutive_skips(ticker) >= self.max_skips:
+            return self._decision(ticker, LIGHT, f'skipped {self.max_skips} updates in a row', recent_ape, baseline)
+        return self._decision(ticker, SKIP, f'recent APE {recent_ape:.2f}% within {self.tolerance:.0%} of MAPE {baseline:.2f}%',
+                              recent_ape, baseline)
+    #------------------------------------------------#
+
+    #--- Function: One-line summary of this run's decisions ---#
+    def summary(self):
+        counts = Counter(d.mode for d in self.decisions)
+        return ', '.join(f"{mode}: {counts.get(mode, 0)}" for mode in (FULL, LIGHT, SKIP))
+    #----------------------------------------------------------#
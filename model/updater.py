@@ -1,4 +1,13 @@
 import os
+import sys
+import json
+import time
+import fcntl
+import argparse
+import threading
+import datetime
+from zoneinfo import ZoneInfo
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pandas as pd
 # logging.getLogger('tensorflow').setLevel(logging.ERROR) # Set tf logs to error only
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'    # Suppresses INFO and WARNING messages
@@ -6,194 +15,464 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'   # Turn off oneDNN custom operations
 
 from model.db_interface import DBInterface
 from model.yf_interface import YFInterface
-from model.model import Model
+from model import data_quality, rss
+from model.model_pool import ModelPool, WARM_MODELS
+from model.jobs import JobRunner
+from model.train_policy import TrainingPolicy, TrainingDecision, SKIP, FULL_EPOCHS
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.normpath(os.path.join(BASE_DIR, '..'))
 MODELS_PATH = os.path.join(BASE_DIR, 'static', 'models')
 IMG_PATH = os.path.join(BASE_DIR, 'static', 'images')
+START_DATE = '2017-01-01'
 
-print("*** Beginning Scheduled Update ***")
-
-# Instantiate classes and key variables
-error_occurred = False
-db = DBInterface(MODELS_PATH)
-tickers = db.get_tickers()
-yf = YFInterface(tickers, '2017-01-01')
-db.populate_dates(yf.get_all_dates()) # Ensure dates table is populated
-db.prepare_daily_acc(tickers)  # Add new dates
-today = db.today_num()
-models = []
-for ticker in tickers:
-    model = Model(ticker, db, yf, IMG_PATH)
-    models.append(model)
-
-# Set all tickers to 'completed' status in case you killed the updater halfway through
-for ticker in tickers:
-    db.set_status(ticker, 'completed')
-
-# Check if an updater is already running
-if db.is_updater_running():
-    print("Another updater instance is already running. Exiting.")
-    exit()
-# Set the first ticker to 'in_progress' to indicate updater is running
-db.set_status(tickers[0], 'in_progress')
-
-# Make sure all actual prices are saved
-missing = db.double_check_actual_prices(today)
-if missing:
-    print("WARNING: Some actual prices are still missing. Attempting to save...")
-    for ticker, days in missing.items():
-        for day in days:
-            try:
-                # print(f"\tWARNING: Actual price for {ticker} on day {day} is missing. Attempting to save...")
-                db.save_actual_price(ticker, day, yf.get_price(ticker, db.get_day_string(day)))
-                # print("saved successfully!")
-            except ValueError as e:
-                error_occurred = True
-                print(f"\tError saving actual price for {ticker} on {day}: {e}")
-    print("Done checking actual prices.")
-else:
-    print("All actual prices are saved.")
-
-# Train models and calculate daily accuracy
-print()
-last_model = None # Keep track of last model so there's always one set to in_progress
-for model in models:
-    print(f"Updater: Training model for {model.ticker}...")
-    try:
-        # Manage status, which acts as a lock to prevent multiple updaters running simultaneously
-        new = False
-        if model._lstm.status == 'new':
-            new = True
-        model.set_status(2) # in_progress 
-        if last_model is not None:
-            last_model.set_status(3)
-        
-        # Train every day since last update
-        # TODO 0.9 do initial training since the LSTM's start date (2017-01-01)
-        model.train(epochs=15, threshold=0.0002)
-        
-        # Calculate Daily Accuracy for any missing days
-        ticker = model.ticker
-        blank_entries = db.daily_acc_empty_cells(ticker)
-        if not blank_entries or len(blank_entries) == 0:
-            print(f"{ticker} already has all daily accuracy calculations completed.")
-            last_model = model
-            continue
+# Daemon schedule: the updater wakes this long after the NYSE close on weekdays
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_CLOSE = datetime.time(16, 0)
+CLOSE_DELAY = datetime.timedelta(minutes=int(os.environ.get('FS_UPDATE_DELAY_MINUTES', 30)))
+RETRY_DELAY = datetime.timedelta(minutes=30)   # yfinance hasn't published today's close yet
+HEALTH_PORT = int(os.environ.get('FS_UPDATER_HEALTH_PORT', 8081))
+# One shared network for all tickers instead of one per ticker (see model/global_model.py)
+GLOBAL_MODEL = os.environ.get('FS_GLOBAL_MODEL', '0') == '1'
+# Roll predictions older than FS_RETENTION_DAYS into summaries after each run (model/compaction.py)
+COMPACT = os.environ.get('FS_COMPACT', '1') == '1'
+
+
+#--- Function: Save any actual prices that were missed ---#
+def check_actual_prices(db, yf, today):
+    error_occurred = False
+    missing = db.double_check_actual_prices(today)
+    if missing:
+        print("WARNING: Some actual prices are still missing. Attempting to save...")
+        for ticker, days in missing.items():
+            for day in days:
+                try:
+                    # print(f"\tWARNING: Actual price for {ticker} on day {day} is missing. Attempting to save...")
+                    db.save_actual_price(ticker, day, yf.get_price(ticker, db.get_day_string(day)))
+                    # print("saved successfully!")
+                except ValueError as e:
+                    error_occurred = True
+                    print(f"\tError saving actual price for {ticker} on {day}: {e}")
+        print("Done checking actual prices.")
+    else:
+        print("All actual prices are saved.")
+    return error_occurred
+#---------------------------------------------------------#
 
-        # For each day that is missing for this ticker, calculate and save the daily accuracy
+#--- Function: Calculate daily accuracy for any missing days ---#
+def update_daily_accuracy(db, yf, ticker, today):
+    blank_entries = db.daily_acc_empty_cells(ticker)
+    if not blank_entries or len(blank_entries) == 0:
+        print(f"{ticker} already has all daily accuracy calculations completed.")
+        return
+
+    # For each day that is missing for this ticker, calculate and save the daily accuracy
+    print(f"Calculating daily accuracy for {ticker}...")
+    for day in blank_entries:
+        mape = None
+        ape = None
+        buy_acc = None
+        balance = 100.0 # Start with $100 (which also means 100%)
+
+        # Save generic first day values
+        if day == 1:
+            db.save_accuracy(ticker, day, ape, mape, buy_acc, balance)
+
+        # Calculate values since previous day
         else:
-            print(f"Calculating daily accuracy for {ticker}...")
-            for day in blank_entries:
-                mape = None
-                ape = None
-                buy_acc = None
-                balance = 100.0 # Start with $100 (which also means 100%)
-
-                # Save generic first day values
-                if day == 1:
-                    db.save_accuracy(ticker, day, ape, mape, buy_acc, balance)
-                
-                # Calculate values since previous day
+            # Get all predictions up to today
+            df = db.get_predictions(ticker, day) # why is the ape Nan for AAPL and None for AMZN??
+
+            # Calculate today's Absolute Percentage Errors (APE) and store them
+            ape_df = df[df['ape'].isna()]
+            ape_df = ape_df[ape_df['for_day'] <= day]
+            ape_df['ape'] = abs((ape_df['actual_price'] - ape_df['predicted_price']) / ape_df['actual_price']) * 100
+            # Save the newly calculated apes, addressed by (from_day, for_day)
+            today_apes = ape_df[['from_day', 'for_day', 'ape']].to_dict(orient='records')
+            for entry in today_apes:
+                ape = entry['ape']
+                db.save_ape(ticker, int(entry['from_day']), int(entry['for_day']), ape)
+
+            # Calculate Mean Absolute Percentage Error (MAPE) up to today
+            ape_sum, ape_count = db.get_ape_stats(ticker, day) # Includes newly saved and compacted apes
+            if ape_count:   # None until a prediction has been scored (e.g. a global-mode ticker's first days)
+                mape = round(ape_sum / ape_count, 2)
+
+            # Calculate buy accuracy
+            today_price = yf.get_price(ticker, db.get_day_string(day))
+            yesterday = day - 1
+            yesterday_price = yf.get_price(ticker, db.get_day_string(yesterday))
+            stock_went_up = today_price > yesterday_price
+
+            # Get yesterday's buy prediction for today
+            row = df.loc[(df['from_day'] == yesterday)]
+            yesterday_buy = row['buy'].iloc[0] if not row.empty else None
+            buy_acc = db.get_buy_accuracy(ticker)
+            if yesterday_buy == stock_went_up:
+                buy_acc += 1
+
+            # Calculate simulated profit
+            balance = db.get_simulated_profit(ticker, yesterday)
+            if yesterday_buy: # If the model recommended buying yesterday
+                percentage = (today_price - yesterday_price) / yesterday_price
+                profit = balance * percentage
+                balance += profit
+                balance = round(balance, 2)
+
+            # Debug Prints
+            if yesterday_buy is None:   # Day left unpredicted (see Model.train)
+                print(f"\tNo prediction from day {yesterday}. Balance remains: ${balance}.")
+            elif yesterday_buy == stock_went_up:
+                if stock_went_up:
+                    print(f"\tGOOD: Made a profit of ${profit}! New balance: ${balance}.")
+                else:
+                    # this is a repetitive calculation, optimize if you want to keep these prints
+                    percentage = (today_price - yesterday_price) / yesterday_price
+                    profit = balance * percentage
+                    profit = round(profit, 2)
+                    print(f"\tGOOD: Avoided a loss of ${-profit}! Balance remains: ${balance}.")
+            else:
+                if stock_went_up:
+                    # this is a repetitive calculation, optimize if you want to keep these prints
+                    percentage = (today_price - yesterday_price) / yesterday_price
+                    profit = balance * percentage
+                    profit = round(profit, 2)
+                    print(f"\tFAIL: Missed a profit of ${profit}. Balance remains: ${balance}.")
                 else:
-                    # Get all predictions up to today
-                    df = db.get_predictions(ticker, day) # why is the ape Nan for AAPL and None for AMZN??
-                    
-                    # Calculate today's Absolute Percentage Errors (APE) and store them
-                    ape_df = df[df['ape'].isna()]
-                    ape_df = ape_df[ape_df['for_day'] <= day]
-                    ape_df['ape'] = abs((ape_df['actual_price'] - ape_df['predicted_price']) / ape_df['actual_price']) * 100
-                    # Create dictionary of ids -> newly calculated apes
-                    today_apes = ape_df[['predict_id', 'ape']].to_dict(orient='records')
-                    for entry in today_apes:
-                        id = entry['predict_id']
-                        ape = entry['ape']
-                        db.save_ape(id, ape)
-                    
-                    # Calculate Mean Absolute Percentage Error (MAPE) up to today
-                    apes = db.get_apes(ticker, day) # Refresh df to include newly saved apes
-                    mape = sum(apes) / len(apes)
-                    mape = round(mape, 2)
-
-                    # Calculate buy accuracy
-                    today_price = yf.get_price(ticker, db.get_day_string(day))
-                    yesterday = day - 1
-                    yesterday_price = yf.get_price(ticker, db.get_day_string(yesterday))
-                    stock_went_up = today_price > yesterday_price
-
-                    # Get yesterday's buy prediction for today
-                    row = df.loc[(df['from_day'] == yesterday)]
-                    yesterday_buy = row['buy'].iloc[0] if not row.empty else None
-                    buy_acc = db.get_buy_accuracy(ticker)
-                    if yesterday_buy == stock_went_up:
-                        buy_acc += 1
-
-                    # Calculate simulated profit
-                    balance = db.get_simulated_profit(ticker, yesterday)
-                    if yesterday_buy: # If the model recommended buying yesterday
-                        percentage = (today_price - yesterday_price) / yesterday_price
-                        profit = balance * percentage
-                        balance += profit
-                        balance = round(balance, 2)
-                    
-                    # Debug Prints
-                    if yesterday_buy == stock_went_up:
-                        if stock_went_up:
-                            print(f"\tGOOD: Made a profit of ${profit}! New balance: ${balance}.")
-                        else:
-                            # this is a repetitive calculation, optimize if you want to keep these prints
-                            percentage = (today_price - yesterday_price) / yesterday_price
-                            profit = balance * percentage
-                            profit = round(profit, 2)
-                            print(f"\tGOOD: Avoided a loss of ${-profit}! Balance remains: ${balance}.")
-                    else:
-                        if stock_went_up:
-                            # this is a repetitive calculation, optimize if you want to keep these prints
-                            percentage = (today_price - yesterday_price) / yesterday_price
-                            profit = balance * percentage
-                            profit = round(profit, 2)
-                            print(f"\tFAIL: Missed a profit of ${profit}. Balance remains: ${balance}.")
-                        else:
-                            print(f"\tFAIL: Incurred a loss of ${-profit}. New balance: ${balance}.")
-
-                    
-                    # Save to DB
-                    print(f"\tDay {day}: MAPE: {mape}, Buy Accuracy: {buy_acc}, Balance: {balance}")
-                    db.save_accuracy(ticker, day, ape, mape, buy_acc, balance)
-
-            # Calculate all-time MAPE; get previous values as well as today's
-            print(f"Calculating and saving to model table...")
-            mape = db.get_mape(ticker, day)
-
-            # Calculate the model's all-time buy accuracy
-            max_acc = db.get_buy_accuracy(ticker)
-            all_time_acc = max_acc * 100 / (today - 1) # Exclude day 1 since no prediction was made for it
-            all_time_acc = round(all_time_acc, 2)
-
-            # Save all_time data to DB
-            print(f"\tMAPE: {mape}, Accuracy: {all_time_acc}, Balance: {balance}")
-            db.save_model_acc(ticker, mape, all_time_acc, balance)
-            print("done.")
-
-        last_model = model
-
-    except ValueError as e:
-        error_occurred = True
-        print(f"ValueError updating model for {model.ticker}: {e}")
-        print(yf.get_close_prices(model.ticker, '2017-01-01'))
-        continue
-
-    print(f"Model for {model.ticker} updated.\n")
-
-# Wrap up updates
-if last_model is not None:
-    last_model.set_status(3) # completed
-if error_occurred:
-    erroneous_tickers = db.finish_update()
-    print(f"Errors occurred on tickers {erroneous_tickers}.")
-else:
-    print("No errors occurred!")
-
-# TODO 0.8 It might be nice to have the updater do a once-over of data on the weekends
-print("***Update complete!***")
\ No newline at end of file
+                    print(f"\tFAIL: Incurred a loss of ${-profit}. New balance: ${balance}.")
+
+
+            # Save to DB
+            print(f"\tDay {day}: MAPE: {mape}, Buy Accuracy: {buy_acc}, Balance: {balance}")
+            db.save_accuracy(ticker, day, ape, mape, buy_acc, balance)
+
+    # Calculate all-time MAPE; get previous values as well as today's
+    print(f"Calculating and saving to model table...")
+    mape = db.get_mape(ticker, day)
+
+    # Calculate the model's all-time buy accuracy
+    max_acc = db.get_buy_accuracy(ticker)
+    all_time_acc = max_acc * 100 / (today - 1) # Exclude day 1 since no prediction was made for it
+    all_time_acc = round(all_time_acc, 2)
+
+    # Save all_time data to DB
+    print(f"\tMAPE: {mape}, Accuracy: {all_time_acc}, Balance: {balance}")
+    db.save_model_acc(ticker, mape, all_time_acc, balance)
+    print("done.")
+#---------------------------------------------------------------#
+
+#--- Function: Load the shared model, if global mode is on ---#
+def load_global_model(enabled=GLOBAL_MODEL):
+    if not enabled:
+        return None
+    from model.global_model import GlobalLSTMModel
+    return GlobalLSTMModel(MODELS_PATH)
+#-------------------------------------------------------------#
+
+#--- Function: One incremental update over all models ---#
+def run_update(db, yf, pool, tickers, global_model=None):
+    """Train every ticker through the latest close and refresh accuracy. Returns True on errors.
+
+    Tickers are streamed through `pool` (model/model_pool.py): loaded, trained, saved and freed
+    one at a time, so memory doesn't grow with the number of tickers.
+    """
+    # One updater at a time; the lock is released when the file closes, even if we're killed
+    with open(db.lock_path('updater'), 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("Another updater instance is already running. Exiting.")
+            return False
+        return _run_update(db, yf, pool, tickers, global_model)
+#--------------------------------------------------------#
+
+#--- Function: The update itself, run under the updater lock ---#
+def _run_update(db, yf, pool, tickers, global_model):
+    pool.sync(tickers)
+    tickers = pool.order(tickers)
+    # Repair or drop bad price series now, not halfway through a ticker's backfill
+    data_quality.validate(yf, tickers)
+    db.populate_dates(yf.get_all_dates()) # Ensure dates table is populated
+    db.prepare_daily_acc(tickers)  # Add new dates
+    today = db.today_num()
+
+    # Release tickers left 'in_progress' in case you killed the updater halfway through (training
+    # resumes from each model's last checkpoint, not from scratch); tickers held by a job keep theirs
+    db.reset_in_progress()
+
+    # Make sure all actual prices are saved
+    error_occurred = check_actual_prices(db, yf, today)
+
+    # Global mode: one fit for every ticker, then per-ticker inference only
+    if global_model is not None:
+        try:
+            global_model.update(yf, db.get_ticker_ids(tickers))
+        except ValueError as e:
+            error_occurred = True
+            print(f"ValueError updating the global model: {e}")
+
+    # Train models and calculate daily accuracy
+    print()
+    policy = TrainingPolicy(db)
+    last_ticker = None # Keep track of last ticker so there's always one set to in_progress
+    for ticker in tickers:
+        if yf.error(ticker) is not None:
+            # Failed download or data-quality check: skip before paying for a model load
+            error_occurred = True
+            print(f"Updater: Skipping {ticker}: {yf.error(ticker)}\n")
+            continue
+        # Claim it before loading: an add-ticker job may be writing this ticker's model right now
+        previous = db.claim_ticker(ticker)
+        if previous is None:
+            print(f"Updater: Skipping {ticker}: an add-ticker job is training it.\n")
+            continue
+        print(f"Updater: Training model for {ticker}...")
+        new = previous == 'new'
+        model = None
+        try:
+            model = pool.get(ticker)
+            model.set_status(2) # in_progress (claimed above; keeps a warm model's status in step)
+            if last_ticker is not None:
+                db.set_status(last_ticker, 'completed')
+                db.publish_snapshot(IMG_PATH)  # The web tier sees each ticker as soon as it's done
+
+            # Train every day since last update, as hard as recent accuracy drift calls for
+            # TODO 0.9 do initial training since the LSTM's start date (2017-01-01)
+            if global_model is not None:
+                decision = TrainingDecision(model.ticker, SKIP, 0, 0, 'global model')
+            else:
+                decision = policy.decide(model.ticker, 'new' if new else None)
+            print(f"Training policy for {model.ticker}: {decision.mode} ({decision.reason})")
+            model.train(epochs=decision.epochs, threshold=decision.threshold, full_history=decision.full_history)
+            db.save_train_decision(model.ticker, today, decision)
+            if new:
+                db.save_epochs_saved(model.ticker, FULL_EPOCHS)
+
+            # Calculate Daily Accuracy for any missing days
+            update_daily_accuracy(db, yf, model.ticker, today)
+            last_ticker = ticker
+
+        except ValueError as e:
+            error_occurred = True
+            print(f"ValueError updating model for {ticker}: {e}")
+            db.set_status(ticker, 'new' if new else 'completed')   # Release the claim
+            continue
+        finally:
+            if model is not None:
+                peak = pool.release(model)   # Free its data; evict it unless the warm set keeps it
+
+        print(f"Model for {ticker} updated (peak RSS {peak / 2**20:.0f} MiB).\n")
+
+    # Wrap up updates
+    if last_ticker is not None:
+        db.set_status(last_ticker, 'completed')
+    db.mark_published() # Let running web servers reload their workers
+    if COMPACT:
+        try:
+            db.compact()
+        except Exception as e:
+            print(f"Compaction failed (will retry next run): {e}")
+    print(f"Training decisions: {policy.summary()}")
+    print(f"Peak RSS: {pool.report()}")
+    for ticker, (planned, spent, seconds) in db.get_epoch_totals().items():
+        if ticker in pool.peak_rss and planned:
+            print(f"\t{ticker}: {spent}/{planned} epochs used overall ({seconds:.0f}s)")
+    if error_occurred:
+        erroneous_tickers = db.finish_update()
+        print(f"Errors occurred on tickers {erroneous_tickers}.")
+    else:
+        print("No errors occurred!")
+
+    # TODO 0.8 It might be nice to have the updater do a once-over of data on the weekends
+    return error_occurred
+#--------------------------------------------------------#
+
+#--- Function: Single run (cron) ---#
+def run_once():
+    print("*** Beginning Scheduled Update ***")
+    db = DBInterface(MODELS_PATH)   # Also applies any pending schema migrations
+    tickers = db.get_tickers()
+    yf = YFInterface(tickers, START_DATE)
+    global_model = load_global_model()
+    pool = ModelPool(db, yf, IMG_PATH, global_model=global_model)   # Nothing stays loaded between tickers
+    run_update(db, yf, pool, tickers, global_model)
+    print("***Update complete!***")
+#-----------------------------------#
+
+
+#--- Function: Next time the daemon should wake up ---#
+def next_market_run(now=None):
+    """The next weekday market close plus CLOSE_DELAY, as an aware datetime."""
+    now = now or datetime.datetime.now(MARKET_TZ)
+    candidate = datetime.datetime.combine(now.date(), MARKET_CLOSE, tzinfo=MARKET_TZ) + CLOSE_DELAY
+    while candidate <= now or candidate.weekday() >= 5:    # Skip past times and weekends
+        candidate = datetime.datetime.combine(candidate.date() + datetime.timedelta(days=1),
+                                              MARKET_CLOSE, tzinfo=MARKET_TZ) + CLOSE_DELAY
+    return candidate
+#-----------------------------------------------------#
+
+
+class UpdaterDaemon:
+    """Keeps prices and compiled models in memory and updates after each market close."""
+
+    def __init__(self, health_port=HEALTH_PORT):
+        self._db = None
+        self._yf = None
+        self._pool = None
+        self._global_model = None
+        self._jobs = None
+        self._stop = threading.Event()
+        self._health_port = health_port
+        self._health = {
+            'state': 'starting',
+            'pid': os.getpid(),
+            'started_at': time.time(),
+            'last_run_started': None,
+            'last_run_finished': None,
+            'last_run_seconds': None,
+            'last_run_errors': None,
+            'last_error': None,
+            'last_close': None,
+            'next_run': None,
+            'models_loaded': 0,
+            'rss_mb': None,
+            'last_run_peak_rss_mb': None,
+        }
+        self._lock = threading.Lock()
+
+    #--- Function: Update the health record ---#
+    def _set_health(self, **values):
+        with self._lock:
+            self._health.update(values)
+    #------------------------------------------#
+
+    #--- Function: Snapshot of the health record ---#
+    def health(self):
+        with self._lock:
+            health = dict(self._health)
+        health['jobs_running'] = self._jobs.running() if self._jobs is not None else 0
+        return health
+    #-----------------------------------------------#
+
+    #--- Function: Serve /health as JSON on localhost ---#
+    def _start_health_server(self):
+        daemon = self
+
+        class HealthHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/health'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(daemon.health()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass    # Keep health checks out of the updater log
+
+        server = ThreadingHTTPServer(('127.0.0.1', self._health_port), HealthHandler)
+        threading.Thread(target=server.serve_forever, name='updater-health', daemon=True).start()
+        print(f"Health endpoint at http://127.0.0.1:{self._health_port}/health")
+    #----------------------------------------------------#
+
+    #--- Function: Load everything once ---#
+    def warm_up(self):
+        self._set_health(state='warming_up')
+        self._db = DBInterface(MODELS_PATH)
+        tickers = self._db.get_tickers()
+        self._yf = YFInterface(tickers, START_DATE)
+        self._global_model = load_global_model()
+        # Warm set: as many models as WARM_MODELS and the memory budget allow; the rest stream
+        self._pool = ModelPool(self._db, self._yf, IMG_PATH, capacity=WARM_MODELS, global_model=self._global_model)
+        self._pool.preload(tickers)
+        self._set_health(state='idle', models_loaded=len(self._pool), last_close=self._yf.last_close(),
+                         rss_mb=round(rss.process_rss_bytes() / 2**20))
+    #--------------------------------------#
+
+    #--- Function: Incremental update with warm state ---#
+    def update(self):
+        """Fetch only new prices, load only new tickers, then train. Returns False if no new close."""
+        tickers = self._db.get_tickers()
+        previous_close = self._yf.last_close()
+        self._yf.refresh(tickers)
+        if self._yf.last_close() == previous_close and self.health()['last_run_finished'] is not None:
+            print(f"No new close since {previous_close}; market holiday or data not published yet.")
+            return False
+
+        start = time.time()
+        self._set_health(state='updating', last_run_started=start, models_loaded=len(self._pool))
+        print(f"*** Beginning Scheduled Update ({self._yf.last_close()}) ***")
+        self._pool.peak_rss.clear()
+        errors = run_update(self._db, self._yf, self._pool, tickers, self._global_model)
+        finished = time.time()
+        peak = max(self._pool.peak_rss.values(), default=0)
+        self._set_health(state='idle', last_run_finished=finished, last_run_seconds=round(finished - start, 1),
+                         last_run_errors=bool(errors), last_close=self._yf.last_close(),
+                         models_loaded=len(self._pool), rss_mb=round(rss.process_rss_bytes() / 2**20),
+                         last_run_peak_rss_mb=round(peak / 2**20))
+        print("***Update complete!***")
+        return True
+    #----------------------------------------------------#
+
+    #--- Function: Main loop ---#
+    def run(self):
+        self._start_health_server()
+        # Add-ticker jobs train here, on one bounded pool, not in the web workers
+        self._jobs = JobRunner(MODELS_PATH, IMG_PATH, global_mode=GLOBAL_MODEL)
+        if not self._jobs.start():
+            self._jobs = None   # A standalone `python -m model.jobs` already runs them
+        self.warm_up()
+        # Catch up immediately in case we were down over a close
+        next_run = datetime.datetime.now(MARKET_TZ)
+        while not self._stop.is_set():
+            self._set_health(next_run=next_run.isoformat())
+            wait = (next_run - datetime.datetime.now(MARKET_TZ)).total_seconds()
+            if wait > 0 and self._stop.wait(wait):
+                break
+            try:
+                ran = self.update()
+                now = datetime.datetime.now(MARKET_TZ)
+                if not ran and now.weekday() < 5 and now.time() >= MARKET_CLOSE:
+                    # Today's close isn't out yet; check back shortly
+                    next_run = now + RETRY_DELAY
+                else:
+                    next_run = next_market_run(now)
+            except Exception as e:
+                print(f"Updater daemon run failed: {e}")
+                self._set_health(state='error', last_error=str(e))
+                next_run = datetime.datetime.now(MARKET_TZ) + RETRY_DELAY
+        self._set_health(state='stopped')
+    #---------------------------#
+
+    #--- Function: Stop after the current run ---#
+    def stop(self):
+        self._stop.set()
+        if self._jobs is not None:
+            self._jobs.stop()
+    #--------------------------------------------#
+
+
+#--- Entry point ---#
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='FutureStock model updater.')
+    parser.add_argument('--daemon', action='store_true',
+                        help='stay resident and update after every market close')
+    parser.add_argument('--health-port', type=int, default=HEALTH_PORT,
+                        help='port for the daemon health endpoint (localhost only)')
+    args = parser.parse_args(argv)
+
+    if args.daemon:
+        daemon = UpdaterDaemon(health_port=args.health_port)
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            daemon.stop()
+    else:
+        run_once()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
+#-------------------#
@@ -0,0 +1,114 @@
+import os
+import numpy as np
+
+# Transfer-learning bootstrap for new tickers.
+# Instead of a randomly initialised network, a new ticker starts from the weights of a trained
+# donor model (or the average of several) and only needs a short fine-tune per day.
+#   donor   - of the CORRELATION_CANDIDATES lowest-MAPE completed models, the one whose recent
+#             returns track the new ticker best (lowest MAPE if no candidate's prices can be fetched)
+#   average - element-wise mean of the best AVERAGE_DONORS completed models
+#   off     - cold start, as before
+# The donor is recorded in model.donor; model.epochs_saved is filled in after initial training,
+# measured against what cold-started tickers actually spent (see DBInterface.save_epochs_saved).
+
+WARM_START = os.environ.get('FS_WARM_START', 'donor')   # 'donor' | 'average' | 'off'
+WARM_EPOCHS = 4             # Per-day epoch budget for a warm-started ticker (cold start: 15)
+WARM_THRESHOLD = 0.0002
+AVERAGE_DONORS = 5
+CORRELATION_DAYS = 250      # Recent trading days compared when ranking donors
+CORRELATION_CANDIDATES = 50 # Best-MAPE candidates whose prices are fetched for the comparison
+
+
+#--- Function: Completed models that can donate weights, best MAPE first ---#
+def donor_candidates(db, ticker):
+    rows = db.get_model_rows().values()
+    candidates = [row for row in rows
+                  if row['ticker'] != ticker and row['status'] == 'completed'
+                  and os.path.exists(db.get_lstm_path(row['ticker']))]
+    # Unscored models sort last
+    candidates.sort(key=lambda row: (row['mape'] is None, row['mape'] or 0.0))
+    return [row['ticker'] for row in candidates]
+#---------------------------------------------------------------------------#
+
+#--- Function: Correlation of recent daily returns ---#
+def _return_correlation(yf, ticker, other, start_date):
+    try:
+        a = np.asarray(yf.get_close_prices(ticker, start_date), dtype=np.float64)[-CORRELATION_DAYS:]
+        b = np.asarray(yf.get_close_prices(other, start_date), dtype=np.float64)[-CORRELATION_DAYS:]
+    except ValueError:
+        return None     # Not in the price cache
+    n = min(len(a), len(b))
+    if n < 20:
+        return None
+    ra, rb = np.diff(np.log(a[-n:])), np.diff(np.log(b[-n:]))
+    if not (np.isfinite(ra).all() and np.isfinite(rb).all()):
+        return None
+    return float(np.corrcoef(ra, rb)[0, 1])
+#-----------------------------------------------------#
+
+#--- Function: Pick the donor for a new ticker ---#
+def pick_donor(db, ticker, yf=None, start_date='2017-01-01'):
+    candidates = donor_candidates(db, ticker)
+    if not candidates:
+        return None
+    if yf is not None:
+        # An add-ticker job's price cache only holds the new ticker: fetch the candidates' recent closes
+        candidates = candidates[:CORRELATION_CANDIDATES]
+        missing = [c for c in candidates if yf.series(c) is None]
+        if missing:
+            # ~1.6 calendar days per trading day, plus room for holidays
+            since = np.datetime64('today', 'D') - np.timedelta64(int(CORRELATION_DAYS * 1.6), 'D')
+            yf.refresh(missing, start_date=str(since))
+        scored = [(c, _return_correlation(yf, ticker, c, start_date)) for c in candidates]
+        scored = [(c, r) for c, r in scored if r is not None and np.isfinite(r)]
+        if scored:
+            return max(scored, key=lambda item: item[1])[0]
+    return candidates[0]
+#-------------------------------------------------#
+
+#--- Function: Average the weights of several models ---#
+def average_model(db, tickers):
+    """Load each donor and average weights; donors with a different architecture are skipped."""
+    base, weights, used = None, None, []
+    for donor in tickers:
+        model = db.load_model(donor)[0]
+        donor_weights = model.get_weights()
+        if base is None:
+            base, weights = model, [w.astype(np.float64) for w in donor_weights]
+        elif [w.shape for w in donor_weights] == [w.shape for w in weights]:
+            weights = [total + w for total, w in zip(weights, donor_weights)]
+        else:
+            continue
+        used.append(donor)
+    if base is None:
+        return None, []
+    base.set_weights([(w / len(used)).astype(np.float32) for w in weights])
+    return base, used
+#-------------------------------------------------------#
+
+#--- Function: Initial network for a new ticker ---#
+def base_model(db, ticker, yf=None, mode=WARM_START, donor=None):
+    """Return (keras_model, donor_label), or (None, None) for a cold start."""
+    if mode == 'off' and donor is None:
+        return None, None
+    try:
+        if mode == 'average' and donor is None:
+            model, used = average_model(db, donor_candidates(db, ticker)[:AVERAGE_DONORS])
+            if model is None:
+                return None, None
+            return model, 'average:' + ','.join(used)
+        donor = donor or pick_donor(db, ticker, yf)
+        if donor is None:
+            return None, None
+        return db.load_model(donor)[0], donor
+    except Exception as e:
+        print(f"Warm start for {ticker} unavailable ({e}); starting cold.")
+        return None, None
+#--------------------------------------------------#
+
+#--- Function: Epochs/threshold for a ticker's first training ---#
+def initial_budget(db, ticker, cold_epochs, cold_threshold):
+    if db.get_donor(ticker):
+        return WARM_EPOCHS, WARM_THRESHOLD
+    return cold_epochs, cold_threshold
+#----------------------------------------------------------------#
@@ -1,37 +1,276 @@
-import yfinance as yf
-import pandas as pd
+import os
+import json
+import time
+import random
+import datetime
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+
+# Price ingestion.
+# Tickers are fetched in chunks by a small thread pool. A shared rate limiter spaces out
+# requests, and failed chunks are retried with exponential backoff. Any ticker a chunk still
+# couldn't deliver is retried on its own, so one bad or slow symbol only costs itself. Each
+# ticker's closes are stored as they arrive as two compact arrays (datetime64[D] dates,
+# float64 closes) instead of one wide OHLCV frame for the whole universe.
+#
+# The source is pluggable: Yahoo Finance by default, or any HTTP server that speaks
+#   GET {FS_PRICE_SOURCE_URL}/prices?tickers=A,B&start=YYYY-MM-DD[&end=YYYY-MM-DD]
+#   -> {"A": {"dates": ["2017-01-03", ...], "close": [115.8, ...]}, ...}     (end exclusive)
+# e.g. the stand-in server in benchmarks/price_server.py.
+
+PRICE_SOURCE_URL = os.environ.get('FS_PRICE_SOURCE_URL')
+CHUNK_SIZE = int(os.environ.get('FS_PRICE_CHUNK', 50))         # Tickers per request
+MAX_WORKERS = int(os.environ.get('FS_PRICE_WORKERS', 4))       # Concurrent requests
+RATE_LIMIT = float(os.environ.get('FS_PRICE_RATE', 2.0))       # Requests per second, all threads
+MAX_RETRIES = 3
+BACKOFF = 1.0               # Seconds before the first retry, doubled on each further one
+
+
+class YahooSource:
+    """Closes from yfinance, one download per chunk."""
+
+    #--- Function: {ticker: (dates, closes)} for the tickers that have data ---#
+    def fetch(self, tickers, start, end=None):
+        import yfinance
+        import pandas as pd
+        df = yfinance.download(tickers=list(tickers), start=start, end=end, interval='1d', progress=False,
+                               group_by='ticker', auto_adjust=True, threads=False)
+        prices = {}
+        if df is None or df.empty:
+            return prices
+        for ticker in tickers:
+            if isinstance(df.columns, pd.MultiIndex):
+                if ticker not in df.columns.get_level_values(0):
+                    continue
+                close = df[ticker]['Close']
+            else:
+                close = df['Close']     # Only one ticker
+            if isinstance(close, pd.DataFrame):
+                close = close.iloc[:, 0]
+            # NaN rows are where other tickers in the chunk traded and this one has no row
+            close = close.dropna()
+            if close.empty:
+                continue
+            index = close.index.tz_localize(None) if close.index.tz is not None else close.index
+            prices[ticker] = (index.values.astype('datetime64[D]'), close.to_numpy(dtype=np.float64))
+        return prices
+    #--------------------------------------------------------------------------#
+
+
+class HTTPSource:
+    """Closes from an HTTP price service (see the protocol at the top of this file)."""
+
+    def __init__(self, base_url, timeout=30):
+        self._base_url = base_url.rstrip('/')
+        self._timeout = timeout
+
+    #--- Function: {ticker: (dates, closes)} for the tickers that have data ---#
+    def fetch(self, tickers, start, end=None):
+        query = {'tickers': ','.join(tickers), 'start': start}
+        if end is not None:
+            query['end'] = end
+        url = f"{self._base_url}/prices?{urllib.parse.urlencode(query)}"
+        with urllib.request.urlopen(url, timeout=self._timeout) as response:    # 4xx/5xx raise HTTPError
+            payload = json.load(response)
+        prices = {}
+        for ticker in tickers:
+            series = payload.get(ticker)
+            if series and series.get('dates'):
+                prices[ticker] = (np.array(series['dates'], dtype='datetime64[D]'),
+                                  np.array(series['close'], dtype=np.float64))     # null -> NaN
+        return prices
+    #--------------------------------------------------------------------------#
+
+
+#--- Function: Source chosen by the environment ---#
+def default_source():
+    return HTTPSource(PRICE_SOURCE_URL) if PRICE_SOURCE_URL else YahooSource()
+#--------------------------------------------------#
+
+
+class _RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
 
 class YFInterface:
-    # Create a global dictionary to store prices
-    _prices = {}
 
     #--- Constructor ---#
-    def __init__(self, tickers, start_date, end_date=None):
+    def __init__(self, tickers, start_date, end_date=None, source=None, chunk_size=CHUNK_SIZE,
+                 max_workers=MAX_WORKERS, rate_limit=RATE_LIMIT):
         """
         Download and cache price data for all tickers between start_date and end_date.
         """
         if not tickers:
             raise ValueError("No tickers found in the database.")
 
-        params = {
-            "tickers": tickers,
-            "start": start_date,
-            "interval": "1d",
-            "progress": False,
-            "group_by": "ticker",
-            "auto_adjust": True
-        }
-
-        if end_date is not None:
-            params["end"] = end_date
-
-        df = yf.download(**params)
-        if isinstance(df.columns, pd.MultiIndex):
-            for ticker in tickers:
-                self._prices[ticker] = df.xs(ticker, axis=1, level=0)
-        else:
-            self._prices[tickers[0]] = df  # only one ticker
-    
+        self._start_date = start_date
+        self._source = source or default_source()
+        self._chunk_size = chunk_size
+        self._max_workers = max_workers
+        self._limiter = _RateLimiter(rate_limit)
+        self._lock = threading.Lock()
+        self._prices = {}   # ticker -> (dates, closes); per instance, so the web jobs and the updater don't share it
+        self.failed = {}    # ticker -> last error, for tickers no attempt could fetch
+
+        self._ingest(list(tickers), start_date, end_date)
+        if not any(t in self._prices for t in tickers):
+            raise ConnectionError(f"No prices could be downloaded ({len(self.failed)} tickers failed).")
+
+    #--- Function: One request, retried with backoff ---#
+    def _fetch(self, tickers, start, end):
+        for attempt in range(MAX_RETRIES + 1):
+            self._limiter.wait()
+            try:
+                return self._source.fetch(tickers, start, end)
+            except Exception as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                # Honor Retry-After on 429/503, otherwise back off exponentially with jitter
+                retry_after = getattr(e, 'headers', None) and e.headers.get('Retry-After')
+                delay = float(retry_after) if retry_after and retry_after.isdigit() \
+                    else BACKOFF * 2 ** attempt * random.uniform(0.5, 1.0)
+                time.sleep(delay)
+    #----------------------------------------------------#
+
+    #--- Function: Fetch a chunk, then retry whatever it missed one ticker at a time ---#
+    def _fetch_chunk(self, chunk, start, end, merge):
+        try:
+            prices = self._fetch(chunk, start, end)
+        except Exception as e:
+            if len(chunk) == 1:
+                self._fail(chunk[0], str(e))
+                return 1
+            print(f"[YF] Chunk of {len(chunk)} failed ({e}); retrying tickers individually.")
+            prices = {}
+        self._store(prices, merge)
+
+        missing = [ticker for ticker in chunk if ticker not in prices]
+        if len(chunk) == 1:
+            for ticker in missing:
+                self._fail(ticker, 'no price data returned')
+            return 1
+        for ticker in missing:
+            try:
+                single = self._fetch([ticker], start, end)
+            except Exception as e:
+                self._fail(ticker, str(e))
+                continue
+            if ticker in single:
+                self._store(single, merge)
+            else:
+                self._fail(ticker, 'no price data returned')
+        return len(chunk)
+    #-----------------------------------------------------------------------------------#
+
+    #--- Function: Save one chunk's results as they arrive ---#
+    def _store(self, prices, merge):
+        with self._lock:
+            for ticker, (dates, closes) in prices.items():
+                if merge and ticker in self._prices:
+                    dates, closes = self._merge(self._prices[ticker], (dates, closes))
+                self._prices[ticker] = (dates, closes)
+                self.failed.pop(ticker, None)
+    #---------------------------------------------------------#
+
+    #--- Function: Record a ticker that couldn't be fetched ---#
+    def _fail(self, ticker, reason):
+        with self._lock:
+            self.failed[ticker] = reason
+        print(f"[YF] No prices for {ticker}: {reason}")
+    #----------------------------------------------------------#
+
+    #--- Function: Newer rows replace older ones for the same date ---#
+    @staticmethod
+    def _merge(old, new):
+        dates = np.concatenate([old[0], new[0]])
+        closes = np.concatenate([old[1], new[1]])
+        # np.unique on the reversed dates keeps each date's last occurrence, sorted
+        _, reversed_index = np.unique(dates[::-1], return_index=True)
+        keep = len(dates) - 1 - reversed_index
+        return dates[keep], closes[keep]
+    #-----------------------------------------------------------------#
+
+    #--- Function: Fetch many tickers through the pool ---#
+    def _ingest(self, tickers, start, end=None, merge=False):
+        started = time.perf_counter()
+        chunks = [tickers[i:i + self._chunk_size] for i in range(0, len(tickers), self._chunk_size)]
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(chunks)) or 1,
+                                thread_name_prefix='prices') as pool:
+            futures = [pool.submit(self._fetch_chunk, chunk, start, end, merge) for chunk in chunks]
+            for future in as_completed(futures):
+                future.result()
+        failed = [t for t in tickers if t in self.failed]
+        print(f"[YF] Fetched {len(tickers) - len(failed)}/{len(tickers)} tickers in {len(chunks)} chunk(s), "
+              f"{time.perf_counter() - started:.1f}s" + (f"; failed: {', '.join(failed[:20])}" if failed else ""))
+    #-----------------------------------------------------#
+
+    #--- Function: Fetch only what's new since the cached data ---#
+    def refresh(self, tickers, start_date=None):
+        """Append recent closes for cached tickers and download history for new ones
+        (from start_date, default the instance's start date)."""
+        known = [t for t in tickers if t in self._prices]
+        unknown = [t for t in tickers if t not in self._prices]
+
+        # Each ticker from its own last close, overlapping a few days so late corrections are
+        # picked up; tickers that are up to date share a start date and so share chunks
+        by_since = {}
+        for ticker in known:
+            since = str(self._prices[ticker][0][-1] - np.timedelta64(7, 'D'))
+            by_since.setdefault(since, []).append(ticker)
+        for since, group in sorted(by_since.items()):
+            self._ingest(group, since, merge=True)
+        if unknown:
+            self._ingest(unknown, start_date or self._start_date)
+    #-------------------------------------------------------------#
+
+    #--- Function: Why a ticker has no prices (None if it has them) ---#
+    def error(self, ticker):
+        return self.failed.get(ticker)
+    #------------------------------------------------------------------#
+
+    #--- Function: Raw (dates, closes) for a ticker, or None ---#
+    def series(self, ticker):
+        return self._prices.get(ticker)
+    #-----------------------------------------------------------#
+
+    #--- Function: Replace a ticker's series (repairs from model/data_quality.py) ---#
+    def set_series(self, ticker, dates, closes):
+        with self._lock:
+            self._prices[ticker] = (dates, closes)
+    #--------------------------------------------------------------------------------#
+
+    #--- Function: Forget a ticker's prices, recording why ---#
+    def drop(self, ticker, reason):
+        with self._lock:
+            self._prices.pop(ticker, None)
+            self.failed[ticker] = reason
+    #---------------------------------------------------------#
+
+    #--- Function: Dates of the most up-to-date, longest series ---#
+    def _reference_dates(self):
+        if not self._prices:
+            raise ValueError("No prices have been downloaded.")
+        return max((dates for dates, _ in self._prices.values()), key=lambda d: (d[-1], len(d)))
+    #--------------------------------------------------------------#
+
     #--- Function: Get all dates since a given date ---#
     def get_all_dates(self, since_date="2025-10-01"):
         """
@@ -39,40 +278,26 @@ class YFInterface:
         :param since_date: The date to start from in 'YYYY-MM-DD' format.
         :return: A list of dates as strings in 'YYYY-MM-DD' format.
         """
-        any_df = next(iter(self._prices.values()))
-        data = any_df.index
+        data = self._reference_dates()
+        since = np.datetime64(since_date, 'D')
 
-        # Convert since_date to a pandas Timestamp
-        since_timestamp = pd.Timestamp(since_date)
-
-        # Get index location
-        index = data.get_indexer([since_timestamp], method='pad')[0]
+        # Last date on or before since_date
+        index = int(np.searchsorted(data, since, side='right')) - 1
 
         # Deal with dates that aren't in the program by trying to find up to 10 days after it
         if index == -1:
-            counter = 0
-            while index == -1:
-                since_timestamp += pd.Timedelta(days=1)
-                index = data.get_indexer([since_timestamp], method='pad')[0]
-                # print("Trying "+ str(since_timestamp.date()))
-                counter += 1
-                if counter == 10:
-                    raise ValueError(f"No index found on {since_date} or 10 days after.")
-            
+            if data[0] > since + np.timedelta64(10, 'D'):
+                raise ValueError(f"No index found on {since_date} or 10 days after.")
+            index = 0
 
         # Get all dates from since_date to the end of the index
-        data = data[index:]
-        dates = data.strftime('%Y-%m-%d').tolist()
-        return dates
+        return np.datetime_as_string(data[index:], unit='D').tolist()
     #---------------------------------------------------#
 
     #--- Function: Check if the market is closed today ---#
     def last_close(self):
         """ Check if the market is closed today by checking if yfinance has a close date for today."""
-        any_df = next(iter(self._prices.values()))
-        data = any_df.index[-1]  # Get the last date in the index
-        date = data.strftime('%Y-%m-%d')
-        return date
+        return str(self._reference_dates()[-1])
     #------------------------------------------------------#
 
     #--- Function: Get the latest close prices for a ticker ---#
@@ -80,10 +305,10 @@ class YFInterface:
         """ Get the latest close prices for a ticker from yfinance."""
         if ticker not in self._prices:
             raise ValueError(f"Ticker {ticker} not found in the cached prices.")
-        df = self._prices[ticker]
-        df = df.loc[start_date:end_date] if end_date else df.loc[start_date:]
-        prices = df['Close'].values
-        return prices
+        dates, closes = self._prices[ticker]
+        start = np.searchsorted(dates, np.datetime64(start_date, 'D'), side='left')
+        end = np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right') if end_date else len(dates)
+        return closes[start:end]
     #------------------------------------------------------#
 
     #--- Function: Get the latest close prices for a ticker ---#
@@ -91,16 +316,22 @@ class YFInterface:
         """Return the closing price for the given date."""
         if ticker not in self._prices:
             raise ValueError(f"Ticker {ticker} not found in the cached prices.")
-        
-        df = self._prices[ticker]
-        # Get index of start_date
-        index = df.index.get_indexer([pd.Timestamp(start_date)], method='pad')[0]
+
+        dates, closes = self._prices[ticker]
+        # Last close on or before start_date
+        index = int(np.searchsorted(dates, np.datetime64(start_date, 'D'), side='right')) - 1
         if index == -1:
             raise ValueError(f"No price data found for {ticker} on or before {start_date}.")
-        start_index = df.index[index]
-        row = df.loc[start_index]
-        price = row['Close']
-        return price
+        return closes[index]
     #------------------------------------------------------#
 
-    # TODO 0.8 add function to check ticker validity when front-end is ready
\ No newline at end of file
+    #--- Function: Check that the price source knows a ticker ---#
+    @staticmethod
+    def is_valid_ticker(ticker, source=None):
+        """Return True if the price source has recent closing prices for the ticker."""
+        start = (datetime.date.today() - datetime.timedelta(days=31)).isoformat()
+        prices = (source or default_source()).fetch([ticker], start)
+        if ticker not in prices:
+            return False
+        return bool(np.isfinite(prices[ticker][1]).any())
+    #------------------------------------------------------#
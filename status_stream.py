@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+from model import snapshot
+
+# Pushes model status changes to browsers over Server-Sent Events.
+# One watcher thread per process stats the published snapshot file (model/snapshot.py);
+# snapshots are swapped in with os.replace, so a new inode/mtime means a new publish. Only
+# then does it re-read ticker/status/version and fan out the changed rows to subscriber queues.
+
+#
+# Under gthread every open stream holds a worker thread, so streams are bounded: each one ends
+# after STREAM_SECONDS and EventSource reconnects by itself (getting the current state again on
+# subscribe), and past MAX_STREAMS open streams a process answers with the current state only and
+# a longer retry, which turns extra tabs into slow polling and leaves threads for /predict.
+
+POLL_INTERVAL = 1.0         # seconds between change checks
+HEARTBEAT_INTERVAL = 15.0   # seconds between keep-alive comments on idle streams
+MAX_QUEUED_EVENTS = 16      # slow clients drop old events instead of growing memory
+STREAM_SECONDS = float(os.environ.get('FS_SSE_SECONDS', 30))    # longest a stream holds a thread
+# Streams per process before falling back to polling: half the worker's threads by default
+MAX_STREAMS = int(os.environ.get('FS_SSE_STREAMS', max(int(os.environ.get('FS_THREADS', 8)) // 2, 1)))
+RETRY_MS = 5000             # reconnect delay after a stream ends
+BUSY_RETRY_MS = 15000       # reconnect delay when the process is at MAX_STREAMS
+
+
+class StatusWatcher:
+    """Single change-detection loop that fans model status events out to subscribers."""
+
+    def __init__(self, snapshot_path, poll_interval=POLL_INTERVAL):
+        self._snapshot_path = snapshot_path
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = {}      # ticker -> set of queues
+        self._state = {}            # ticker -> (status, version)
+        self._thread = None
+        self._stop = threading.Event()
+
+    #--- Function: Start the watcher thread if it isn't running ---#
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='status-watcher', daemon=True)
+            self._thread.start()
+    #--------------------------------------------------------------#
+
+    #--- Function: Stop the watcher thread ---#
+    def stop(self):
+        self._stop.set()
+    #-----------------------------------------#
+
+    #--- Function: Register a queue for one ticker ---#
+    def subscribe(self, ticker):
+        q = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+        with self._lock:
+            self._subscribers.setdefault(ticker, set()).add(q)
+            current = self._state.get(ticker)
+        self.start()
+        # Send the current state straight away so the client never misses a flip
+        if current is not None:
+            q.put_nowait(self._event(ticker, current))
+        return q
+    #-------------------------------------------------#
+
+    #--- Function: Remove a subscriber queue ---#
+    def unsubscribe(self, ticker, q):
+        with self._lock:
+            queues = self._subscribers.get(ticker)
+            if queues is not None:
+                queues.discard(q)
+                if not queues:
+                    del self._subscribers[ticker]
+    #-------------------------------------------#
+
+    #--- Function: Number of open subscriptions ---#
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+    #----------------------------------------------#
+
+    #--- Function: Build the event payload ---#
+    @staticmethod
+    def _event(ticker, state):
+        status, version = state
+        return {'ticker': ticker, 'status': status, 'version': version}
+    #-----------------------------------------#
+
+    #--- Function: Read every ticker's status and version ---#
+    def _read_state(self):
+        conn = snapshot.connect(self._snapshot_path)
+        try:
+            cursor = conn.execute('SELECT ticker, status, version FROM model')
+            return {ticker: (status, version) for ticker, status, version in cursor.fetchall()}
+        finally:
+            conn.close()
+    #--------------------------------------------------------#
+
+    #--- Function: Publish changed tickers to their subscribers ---#
+    def _publish(self, new_state):
+        with self._lock:
+            old_state = self._state
+            self._state = new_state
+            targets = []
+            for ticker, state in new_state.items():
+                if old_state.get(ticker) != state and ticker in self._subscribers:
+                    targets.append((ticker, state, list(self._subscribers[ticker])))
+
+        for ticker, state, queues in targets:
+            event = self._event(ticker, state)
+            for q in queues:
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    # Drop the oldest event; only the latest state matters
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+                    q.put_nowait(event)
+    #--------------------------------------------------------------#
+
+    #--- Function: Change-detection loop ---#
+    def _run(self):
+        last_seen = None
+        while not self._stop.is_set():
+            try:
+                stat = os.stat(self._snapshot_path)
+                seen = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if seen != last_seen:
+                    self._publish(self._read_state())
+                    last_seen = seen
+            except FileNotFoundError:
+                pass    # Nothing published yet
+            except (OSError, sqlite3.Error) as e:
+                print(f"[StatusWatcher] Couldn't read model status: {e}")
+                last_seen = None
+            self._stop.wait(self._poll_interval)
+    #---------------------------------------#
+
+
+#--- Function: Server-Sent Events generator for one ticker ---#
+def event_stream(watcher, ticker, heartbeat=HEARTBEAT_INTERVAL, duration=STREAM_SECONDS,
+                 max_streams=MAX_STREAMS):
+    """Yield SSE frames for a ticker until the client disconnects or `duration` seconds pass."""
+    busy = watcher.subscriber_count() >= max_streams
+    q = watcher.subscribe(ticker)
+    deadline = time.monotonic() + (0 if busy else duration)
+    try:
+        # Let EventSource back off reconnects instead of hammering the server
+        yield f'retry: {BUSY_RETRY_MS if busy else RETRY_MS}\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                event = q.get(timeout=min(heartbeat, remaining)) if remaining > 0 else q.get_nowait()
+            except queue.Empty:
+                if deadline - time.monotonic() <= 0:
+                    return      # Client reconnects after the retry delay
+                yield ': keep-alive\n\n'
+                continue
+            yield f"event: status\ndata: {json.dumps(event)}\n\n"
+    finally:
+        watcher.unsubscribe(ticker, q)
+#-------------------------------------------------------------#
@@ -0,0 +1,10 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:application
+# With preload_app (see gunicorn.conf.py) this module is imported once in the master, so the
+# version update runs once per deploy and the warmed state is shared by forked workers.
+from app import app, init_app, warm_state
+
+if not init_app():
+    raise SystemExit("Update failed, not starting workers.")
+warm_state()
+
+application = app